@@ -0,0 +1,67 @@
+from nmigen import *
+from nmigen.build import *
+from nmigen_boards.blackice_mx import *
+
+from synth import *
+from sigma_delta import *
+from readint import *
+
+audio_pmod= [
+    Resource("audio", 0,
+            Subsignal("ain",      Pins("1", dir="o", conn=("pmod",5)), Attrs(IO_STANDARD="SB_LVCMOS")),
+            Subsignal("shutdown", Pins("4", dir="o", conn=("pmod",5)), Attrs(IO_STANDARD="SB_LVCMOS")))
+]
+
+class Music5(Elaboratable):
+    def elaborate(self, platform):
+        audio  = platform.request("audio")
+
+        m = Module()
+
+        led = [platform.request("led", i) for i in range(4)]
+        leds = Cat([i.o for i in led])
+
+        m.d.comb += audio.shutdown.eq(1)
+
+        # Each line of the tune has one note per channel
+        tune = readtune("tune_poly.mem")
+        channels = len(tune[0])
+        music_rom = Memory(width=6 * channels, depth=256,
+                           init=[sum(n << (6 * c) for c, n in enumerate(row)) for row in tune])
+        waves = [SINE, TRIANGLE, SAW, SQUARE]
+
+        m.submodules.synth = synth = Synth(voices=8)
+        m.submodules.dac = dac = SigmaDelta()
+        m.submodules.mr = mr = music_rom.read_port()
+
+        tone = Signal(30)
+        chan = Signal(range(channels))
+        note = Signal(6)
+
+        m.d.sync += [
+            tone.eq(tone + 1),
+            chan.eq(Mux(chan == channels - 1, 0, chan + 1))
+        ]
+
+        m.d.comb += [
+            mr.addr.eq(tone[22:]),
+            note.eq(mr.data.word_select(chan, 6)),
+            # Update one channel every cycle
+            synth.voice.eq(chan),
+            synth.note.eq(note),
+            synth.wave.eq(Array(waves[c % len(waves)] for c in range(channels))[chan]),
+            # Release notes for the last eighth of each step, so repeated notes are retriggered
+            synth.gate.eq((note != 0) & (tone[19:22] != 7)),
+            synth.we.eq(1),
+            dac.din.eq(synth.sample),
+            audio.ain.eq(dac.dout),
+            leds.eq(mr.data[:4])
+        ]
+
+        return m
+
+if __name__ == "__main__":
+    platform = BlackIceMXPlatform()
+    platform.add_resources(audio_pmod)
+    platform.build(Music5(), do_program=True)
+
@@ -11,3 +11,16 @@ def readint(filename):
     f.close()
     return l
 
+
+def readtune(filename):
+    f = open(filename,"r")
+    l = []
+    while True:
+        s = f.readline()
+        if s:
+            if s[0] != "/" and s.strip():
+                l.append([int(n,10) for n in s.split()])
+        else:
+            break
+    f.close()
+    return l
@@ -0,0 +1,24 @@
+from nmigen import *
+
+class SigmaDelta(Elaboratable):
+    def __init__(self, width=16):
+        # parameters
+        self.width = width
+
+        # inputs
+        self.din  = Signal(signed(width))
+
+        # outputs
+        self.dout = Signal()
+
+    def elaborate(self, platform):
+        acc = Signal(self.width + 1)
+
+        m = Module()
+
+        # First order modulator, as in audio_stream, with the signed sample converted to offset binary
+        m.d.sync += acc.eq(acc[:self.width] + Cat(self.din[:-1], ~self.din[-1]))
+        m.d.comb += self.dout.eq(acc[-1])
+
+        return m
+
@@ -0,0 +1,213 @@
+from nmigen import *
+
+from math import sin, pi
+
+# Envelope states
+IDLE    = 0
+ATTACK  = 1
+DECAY   = 2
+SUSTAIN = 3
+RELEASE = 4
+
+# Waveforms
+SQUARE   = 0
+SAW      = 1
+TRIANGLE = 2
+SINE     = 3
+
+class Synth(Elaboratable):
+    def __init__(self, voices=8, sample_cycles=512):
+        # parameters
+        assert 1 <= voices <= 32
+        # Pipeline needs 3 cycles to drain after the last voice is read
+        assert voices + 4 <= sample_cycles
+        self.voices        = voices
+        self.sample_cycles = sample_cycles
+
+        # inputs, used to write the control of one voice
+        self.voice    = Signal(range(voices))
+        self.note     = Signal(6)
+        self.gate     = Signal()
+        self.wave     = Signal(2)
+        self.we       = Signal()
+
+        # inputs, envelope rates shared by all voices
+        self.attack   = Signal(8, reset=32)
+        self.decay    = Signal(8, reset=4)
+        self.sustain  = Signal(8, reset=160)
+        self.release  = Signal(8, reset=2)
+
+        # outputs
+        self.sample       = Signal(signed(16))
+        self.sample_valid = Signal()
+
+    def elaborate(self, platform):
+        # Phase increments give the same pitches as music4 at any clock frequency
+        notes = [512,483,456,431,406,384,362,342,323,304,287,271]
+        incs = []
+        for n in range(64):
+            octave, note = divmod(n, 12)
+            incs.append(((1 << 24) * self.sample_cycles) // (2 * notes[note] * (256 >> octave)))
+
+        waves = []
+        for i in range(256):
+            waves.append(127 if i < 128 else -127)                          # square
+        for i in range(256):
+            waves.append(i - 128)                                           # saw
+        for i in range(256):
+            waves.append(2 * i - 128 if i < 128 else 383 - 2 * i)           # triangle
+        for i in range(256):
+            waves.append(round(127 * sin(2 * pi * i / 256)))                # sine
+
+        inc_rom  = Memory(width=24, depth=64, init=incs)
+        wave_rom = Memory(width=8, depth=1024, init=[w & 0xff for w in waves])
+
+        # Per-voice control: phase increment, gate and waveform
+        ctrl  = Memory(width=27, depth=self.voices)
+        # Per-voice state: phase, envelope level and envelope state
+        state = Memory(width=43, depth=self.voices)
+
+        m = Module()
+
+        m.submodules.ir = ir = inc_rom.read_port()
+        m.submodules.wr = wr = wave_rom.read_port()
+        m.submodules.cr = cr = ctrl.read_port(transparent=False)
+        m.submodules.cw = cw = ctrl.write_port()
+        m.submodules.sr = sr = state.read_port(transparent=False)
+        m.submodules.sw = sw = state.write_port()
+
+        # Write side: look up the phase increment for the note, then write the control word
+        voice_d = Signal.like(self.voice)
+        gate_d  = Signal()
+        wave_d  = Signal(2)
+        we_d    = Signal()
+
+        m.d.comb += ir.addr.eq(self.note)
+
+        m.d.sync += [
+            voice_d.eq(self.voice),
+            gate_d.eq(self.gate),
+            wave_d.eq(self.wave),
+            we_d.eq(self.we)
+        ]
+
+        m.d.comb += [
+            cw.addr.eq(voice_d),
+            cw.data.eq(Cat(ir.data, gate_d, wave_d)),
+            cw.en.eq(we_d)
+        ]
+
+        # Shared datapath: one voice per cycle, all voices every sample period
+        cnt    = Signal(range(self.sample_cycles))
+        v1     = Signal(range(self.voices))
+        valid1 = Signal()
+        env2   = Signal(8)
+        valid2 = Signal()
+        prod3  = Signal(signed(16))
+        valid3 = Signal()
+        mix    = Signal(signed(16 + (self.voices - 1).bit_length()))
+
+        m.d.sync += cnt.eq(Mux(cnt == self.sample_cycles - 1, 0, cnt + 1))
+
+        # Stage 0: read voice control and state
+        m.d.comb += [
+            cr.addr.eq(cnt),
+            sr.addr.eq(cnt)
+        ]
+
+        m.d.sync += [
+            v1.eq(cnt),
+            valid1.eq(cnt < self.voices)
+        ]
+
+        # Stage 1: advance phase and envelope, write back state, look up waveform
+        inc       = cr.data[:24]
+        gate      = cr.data[24]
+        wave      = cr.data[25:27]
+        phase     = sr.data[:24]
+        env       = sr.data[24:40]
+        env_state = sr.data[40:43]
+
+        new_env    = Signal(16)
+        new_state  = Signal(3)
+        env_up     = Signal(17)
+        env_down   = Signal(17)
+        sustain16  = Cat(Const(0, 8), self.sustain)
+
+        m.d.comb += [
+            new_env.eq(env),
+            new_state.eq(env_state),
+            env_up.eq(env + self.attack),
+            env_down.eq(env - Mux(env_state == DECAY, self.decay, self.release))
+        ]
+
+        with m.If(~gate):
+            with m.If((env_state == IDLE) | (env_state == RELEASE)):
+                # A borrow means the envelope has reached zero
+                with m.If(env_down[16] | (env_down == 0)):
+                    m.d.comb += [
+                        new_env.eq(0),
+                        new_state.eq(IDLE)
+                    ]
+                with m.Else():
+                    m.d.comb += [
+                        new_env.eq(env_down),
+                        new_state.eq(RELEASE)
+                    ]
+            with m.Else():
+                m.d.comb += new_state.eq(RELEASE)
+        with m.Else():
+            with m.Switch(env_state):
+                with m.Case(ATTACK):
+                    with m.If(env_up[16]):
+                        m.d.comb += [
+                            new_env.eq(0xffff),
+                            new_state.eq(DECAY)
+                        ]
+                    with m.Else():
+                        m.d.comb += new_env.eq(env_up)
+                with m.Case(DECAY):
+                    with m.If(env_down[16] | (env_down[:16] <= sustain16)):
+                        m.d.comb += [
+                            new_env.eq(sustain16),
+                            new_state.eq(SUSTAIN)
+                        ]
+                    with m.Else():
+                        m.d.comb += new_env.eq(env_down)
+                with m.Case(SUSTAIN):
+                    m.d.comb += new_env.eq(sustain16)
+                with m.Default():
+                    # Retrigger from idle or release
+                    m.d.comb += new_state.eq(ATTACK)
+
+        m.d.comb += [
+            sw.addr.eq(v1),
+            sw.data.eq(Cat((phase + inc)[:24], new_env, new_state)),
+            sw.en.eq(valid1),
+            wr.addr.eq(Cat(phase[16:], wave))
+        ]
+
+        m.d.sync += [
+            env2.eq(env[8:]),
+            valid2.eq(valid1)
+        ]
+
+        # Stage 2: scale the waveform by the envelope
+        m.d.sync += [
+            prod3.eq(wr.data.as_signed() * env2),
+            valid3.eq(valid2)
+        ]
+
+        # Stage 3: mix
+        m.d.sync += self.sample_valid.eq(cnt == self.sample_cycles - 1)
+
+        with m.If(cnt == self.sample_cycles - 1):
+            m.d.sync += [
+                self.sample.eq(mix >> (self.voices - 1).bit_length()),
+                mix.eq(0)
+            ]
+        with m.Elif(valid3):
+            m.d.sync += mix.eq(mix + prod3)
+
+        return m
+
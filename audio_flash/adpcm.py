@@ -0,0 +1,73 @@
+from nmigen import *
+
+# IMA ADPCM tables, shared with the host-side encoder in wav2flash.py
+step_table = [
+    7, 8, 9, 10, 11, 12, 13, 14, 16, 17, 19, 21, 23, 25, 28, 31, 34, 37, 41, 45,
+    50, 55, 60, 66, 73, 80, 88, 97, 107, 118, 130, 143, 157, 173, 190, 209, 230,
+    253, 279, 307, 337, 371, 408, 449, 494, 544, 598, 658, 724, 796, 876, 963,
+    1060, 1166, 1282, 1411, 1552, 1707, 1878, 2066, 2272, 2499, 2749, 3024, 3327,
+    3660, 4026, 4428, 4871, 5358, 5894, 6484, 7132, 7845, 8630, 9493, 10442,
+    11487, 12635, 13899, 15289, 16818, 18500, 20350, 22385, 24623, 27086, 29794,
+    32767
+]
+
+index_table = [-1, -1, -1, -1, 2, 4, 6, 8]
+
+class ADPCMDecoder(Elaboratable):
+    def __init__(self):
+        # inputs
+        self.code   = Signal(4)
+        self.en     = Signal()
+        self.clear  = Signal()
+
+        # outputs
+        self.sample = Signal(signed(16))
+
+    def elaborate(self, platform):
+        step_rom = Memory(width=15, depth=len(step_table), init=step_table)
+
+        m = Module()
+
+        index     = Signal(range(len(step_table)))
+        cur_index = Signal.like(index)
+        cur       = Signal(signed(16))
+        step      = Signal(15)
+        diff      = Signal(17)
+        pred      = Signal(signed(18))
+        new_index = Signal(signed(8))
+
+        # Clear resets the decoder state before the code is decoded
+        m.d.comb += [
+            cur_index.eq(Mux(self.clear, 0, index)),
+            cur.eq(Mux(self.clear, 0, self.sample)),
+            step.eq(step_rom[cur_index]),
+            diff.eq((step >> 3) +
+                    Mux(self.code[2], step, 0) +
+                    Mux(self.code[1], step >> 1, 0) +
+                    Mux(self.code[0], step >> 2, 0)),
+            pred.eq(Mux(self.code[3], cur - diff, cur + diff)),
+            new_index.eq(cur_index + Array(Const(i, signed(5)) for i in index_table)[self.code[:3]])
+        ]
+
+        with m.If(self.en):
+            with m.If(pred > 32767):
+                m.d.sync += self.sample.eq(32767)
+            with m.Elif(pred < -32768):
+                m.d.sync += self.sample.eq(-32768)
+            with m.Else():
+                m.d.sync += self.sample.eq(pred)
+
+            with m.If(new_index < 0):
+                m.d.sync += index.eq(0)
+            with m.Elif(new_index > len(step_table) - 1):
+                m.d.sync += index.eq(len(step_table) - 1)
+            with m.Else():
+                m.d.sync += index.eq(new_index)
+        with m.Elif(self.clear):
+            m.d.sync += [
+                self.sample.eq(0),
+                index.eq(0)
+            ]
+
+        return m
+
@@ -0,0 +1,38 @@
+from nmigen import *
+from nmigen.build import *
+from nmigen_boards.blackice_mx import *
+
+from sample_player import SamplePlayer
+from sigma_delta import SigmaDelta
+
+audio_pmod= [
+    Resource("audio", 0,
+            Subsignal("ain",      Pins("1", dir="o", conn=("pmod",5)), Attrs(IO_STANDARD="SB_LVCMOS")),
+            Subsignal("shutdown", Pins("4", dir="o", conn=("pmod",5)), Attrs(IO_STANDARD="SB_LVCMOS")))
+]
+
+class Play(Elaboratable):
+    def elaborate(self, platform):
+        audio  = platform.request("audio")
+        leds   = Cat([platform.request("led", i) for i in range(4)])
+
+        m = Module()
+
+        m.submodules.player = player = SamplePlayer(base=0x100000, sample_rate=16000)
+        m.submodules.dac = dac = SigmaDelta()
+
+        m.d.comb += [
+            audio.shutdown.eq(1),
+            dac.din.eq(player.sample),
+            audio.ain.eq(dac.dout),
+            # Show playing on the blue led and the underrun count on the others
+            leds.eq(Cat(player.playing, player.underruns[:3]))
+        ]
+
+        return m
+
+if __name__ == "__main__":
+    platform = BlackIceMXPlatform()
+    platform.add_resources(audio_pmod)
+    platform.build(Play(), do_program=True)
+
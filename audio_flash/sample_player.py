@@ -0,0 +1,169 @@
+from nmigen import *
+
+from xip_controller import XipController
+from adpcm import ADPCMDecoder
+
+# Plays audio streamed from flash memory.
+# The audio starts with a 32-bit big-endian header: the top byte is the format (0=PCM, 1=ADPCM)
+# and the other 24 bits are the length of the data in bytes.
+# PCM data is 8-bit signed, ADPCM data is 4-bit IMA ADPCM, most significant nibble first.
+# Words are read from flash into one half of a ping-pong buffer while the other half is played.
+class SamplePlayer(Elaboratable):
+    def __init__(self, base=0x100000, sample_rate=16000, buf_words=256):
+        # parameters
+        self.base        = base
+        self.sample_rate = sample_rate
+        self.buf_words   = buf_words
+
+        # outputs
+        self.sample    = Signal(signed(16))
+        self.playing   = Signal()
+        self.underruns = Signal(16)
+
+    def elaborate(self, platform):
+        divisor = int(platform.default_clk_frequency // self.sample_rate)
+        bits    = (self.buf_words - 1).bit_length()
+
+        # Each entry has a flag for the first word of the audio, to reset the decoder
+        buf = Memory(width=17, depth=2 * self.buf_words)
+
+        m = Module()
+
+        m.submodules.xip = xip = XipController(width=16)
+        m.submodules.adpcm = adpcm = ADPCMDecoder()
+        m.submodules.r = r = buf.read_port()
+        m.submodules.w = w = buf.write_port()
+
+        adpcm_mode = Signal()
+        length     = Signal(24)
+        remaining  = Signal(23)
+        first      = Signal()
+        filled     = Signal(2)
+        fill_half  = Signal()
+        fill_idx   = Signal(bits)
+        play_half  = Signal()
+        play_idx   = Signal(bits)
+
+        # Unset valid when transaction accepted
+        with m.If(xip.ready & xip.valid):
+            m.d.sync += xip.valid.eq(0)
+
+        m.d.comb += [
+            w.addr.eq(Cat(fill_idx, fill_half)),
+            w.data.eq(Cat(xip.dout, first)),
+            w.en.eq(0)
+        ]
+
+        # Fill side: stream words from flash into the half that is not being played
+        with m.FSM():
+            with m.State("START"):
+                m.d.sync += [
+                    xip.addr.eq(self.base),
+                    xip.valid.eq(1)
+                ]
+                m.next = "LEN_HI"
+            with m.State("LEN_HI"):
+                with m.If(xip.dout_valid):
+                    m.d.sync += [
+                        adpcm_mode.eq(xip.dout[8:] == 1),
+                        length[16:].eq(xip.dout[:8]),
+                        xip.addr.eq(xip.addr + 2),
+                        xip.valid.eq(1)
+                    ]
+                    m.next = "LEN_LO"
+            with m.State("LEN_LO"):
+                with m.If(xip.dout_valid):
+                    m.d.sync += [
+                        length[:16].eq(xip.dout),
+                        remaining.eq((Cat(xip.dout, length[16:]) + 1) >> 1),
+                        xip.addr.eq(xip.addr + 2),
+                        first.eq(1)
+                    ]
+                    m.next = "FILL"
+            with m.State("FILL"):
+                with m.If(~filled.bit_select(fill_half, 1)):
+                    m.d.sync += xip.valid.eq(1)
+                    m.next = "READ"
+            with m.State("READ"):
+                with m.If(xip.dout_valid):
+                    m.d.comb += w.en.eq(1)
+                    m.d.sync += [
+                        first.eq(0),
+                        fill_idx.eq(fill_idx + 1),
+                        xip.addr.eq(xip.addr + 2),
+                        remaining.eq(remaining - 1)
+                    ]
+                    with m.If(fill_idx.all()):
+                        m.d.sync += [
+                            filled.bit_select(fill_half, 1).eq(1),
+                            fill_half.eq(~fill_half),
+                            # Start playing when the first half is filled
+                            self.playing.eq(1)
+                        ]
+                    # Loop back to the start of the audio. This starts a new flash transaction.
+                    with m.If(remaining == 1):
+                        m.d.sync += [
+                            xip.addr.eq(self.base + 4),
+                            remaining.eq((length + 1) >> 1),
+                            first.eq(1)
+                        ]
+                    m.next = "FILL"
+
+        # Play side: one sample per tick, 2 PCM or 4 ADPCM samples per word
+        tick  = Signal()
+        cnt   = Signal(range(divisor))
+        sub   = Signal(2)
+        shift = Signal(16)
+        code  = Signal(8)
+        avail = Signal()
+        pcm   = Signal(signed(16))
+
+        m.d.sync += [
+            cnt.eq(Mux(cnt == divisor - 1, 0, cnt + 1)),
+            tick.eq(cnt == 0)
+        ]
+
+        m.d.comb += [
+            r.addr.eq(Cat(play_idx, play_half)),
+            avail.eq(filled.bit_select(play_half, 1)),
+            adpcm.code.eq(code[4:]),
+            adpcm.en.eq(0),
+            adpcm.clear.eq(0)
+        ]
+
+        with m.If(tick & self.playing):
+            with m.If(sub == 0):
+                with m.If(avail):
+                    m.d.comb += [
+                        code.eq(r.data[8:16]),
+                        adpcm.clear.eq(r.data[16]),
+                        adpcm.en.eq(adpcm_mode)
+                    ]
+                    m.d.sync += [
+                        shift.eq(r.data[:16] << Mux(adpcm_mode, 4, 8)),
+                        sub.eq(Mux(adpcm_mode, 3, 1)),
+                        play_idx.eq(play_idx + 1)
+                    ]
+                    with m.If(play_idx.all()):
+                        m.d.sync += [
+                            filled.bit_select(play_half, 1).eq(0),
+                            play_half.eq(~play_half)
+                        ]
+                with m.Else():
+                    m.d.sync += self.underruns.eq(self.underruns + 1)
+            with m.Else():
+                m.d.comb += [
+                    code.eq(shift[8:]),
+                    adpcm.en.eq(adpcm_mode)
+                ]
+                m.d.sync += [
+                    shift.eq(shift << Mux(adpcm_mode, 4, 8)),
+                    sub.eq(sub - 1)
+                ]
+            with m.If(~adpcm_mode & ((sub != 0) | avail)):
+                m.d.sync += pcm.eq(Cat(Const(0, 8), code))
+
+        m.d.comb += self.sample.eq(Mux(adpcm_mode, adpcm.sample, pcm))
+
+        return m
+
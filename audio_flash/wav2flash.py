@@ -0,0 +1,90 @@
+import argparse
+import wave
+import struct
+
+from adpcm import step_table, index_table
+
+# Converts a wav file to the format played by SamplePlayer:
+# a 32-bit big-endian header with the format in the top byte and the data length in the other 24 bits,
+# followed by 8-bit signed PCM samples or 4-bit IMA ADPCM codes, most significant nibble first.
+
+def read_wav(filename, rate):
+    w = wave.open(filename, "rb")
+    channels = w.getnchannels()
+    width = w.getsampwidth()
+    in_rate = w.getframerate()
+    frames = w.readframes(w.getnframes())
+    w.close()
+
+    if width == 1:
+        values = [b - 128 << 8 for b in frames]
+    elif width == 2:
+        values = list(struct.unpack("<%dh" % (len(frames) // 2), frames))
+    else:
+        raise ValueError("Only 8 and 16-bit wav files are supported")
+
+    # Mix down to mono
+    mono = [sum(values[i:i + channels]) // channels for i in range(0, len(values), channels)]
+
+    # Nearest sample resampling
+    n = len(mono) * rate // in_rate
+    return [mono[i * in_rate // rate] for i in range(n)]
+
+def encode_adpcm(samples):
+    pred = 0
+    index = 0
+    codes = []
+    for s in samples:
+        step = step_table[index]
+        diff = s - pred
+        code = 0
+        if diff < 0:
+            code = 8
+            diff = -diff
+        if diff >= step:
+            code |= 4
+            diff -= step
+        if diff >= step >> 1:
+            code |= 2
+            diff -= step >> 1
+        if diff >= step >> 2:
+            code |= 1
+
+        # Track the decoder exactly, so that errors do not accumulate
+        d = (step >> 3)
+        if code & 4: d += step
+        if code & 2: d += step >> 1
+        if code & 1: d += step >> 2
+        pred = pred - d if code & 8 else pred + d
+        pred = max(-32768, min(32767, pred))
+        index = max(0, min(len(step_table) - 1, index + index_table[code & 7]))
+        codes.append(code)
+
+    if len(codes) % 2:
+        codes.append(0)
+    return bytes([(codes[i] << 4) | codes[i + 1] for i in range(0, len(codes), 2)])
+
+def encode_pcm(samples):
+    return bytes([(s >> 8) & 0xff for s in samples])
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("wav", help="Input wav file")
+    parser.add_argument("out", help="Output binary file, to be written to flash")
+    parser.add_argument("--rate", type=int, default=16000, help="Sample rate of the player")
+    parser.add_argument("--pcm", action="store_true", help="Write 8-bit PCM rather than ADPCM")
+    args = parser.parse_args()
+
+    samples = read_wav(args.wav, args.rate)
+    data = encode_pcm(samples) if args.pcm else encode_adpcm(samples)
+
+    # Pad to a whole number of 16-bit words
+    if len(data) % 2:
+        data += bytes(1)
+
+    with open(args.out, "wb") as f:
+        f.write(struct.pack(">I", ((0 if args.pcm else 1) << 24) | len(data)))
+        f.write(data)
+
+    print("%d samples, %d bytes, %.1f seconds" % (len(samples), len(data) + 4, len(samples) / args.rate))
+
@@ -0,0 +1,120 @@
+import os
+import sys
+
+from nmigen import *
+from nmigen.build import *
+from nmigen_boards.blackice_mx import *
+
+# Use the shared video package in the top level directory
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from video_common import *
+
+# DVI on a pmod, as pseudo-differential pairs: p on pins 1-4, n on pins 7-10.
+# Pair 0 is blue, 1 is green, 2 is red and 3 is the TMDS clock.
+dvi_pmod = [
+    Resource("dvi", 0,
+             Subsignal("p", Pins("1 2 3 4", dir="o", conn=("pmod", 2)), Attrs(IO_STANDARD="SB_LVCMOS")),
+             Subsignal("n", Pins("7 8 9 10", dir="o", conn=("pmod", 2)), Attrs(IO_STANDARD="SB_LVCMOS")))
+]
+
+# The serial data is sent with SB_IO DDR outputs, 2 bits per shift clock,
+# so the shift clock is 5 times the pixel clock. The PLL generates the shift
+# clock and the pixel clock is divided down from it, so the two are in phase.
+#
+# The iCE40 PLL tops out at 275MHz, so the fastest pixel clock is 55MHz.
+# That covers 640x480, 800x600 and 1024x768 reduced blanking.
+# 1280x720@60Hz needs a 371.25MHz shift clock, which needs an ECP5 (see retro).
+class TopDVITest(Elaboratable):
+    def __init__(self, timing: VGATiming):
+        self.o_led = Signal(4)
+        # Configuration
+        self.timing = timing
+
+    def elaborate(self, platform: Platform) -> Module:
+        m = Module()
+
+        clk_in = platform.request(platform.default_clk, dir='-')[0]
+
+        # Clock generator.
+        m.domains.sync = cd_sync = ClockDomain("sync")
+        m.d.comb += ClockSignal().eq(clk_in)
+
+        m.submodules.pll = pll = PLL(int(platform.default_clk_frequency / 1000000),
+                                     5 * self.timing.pixel_freq / 1e6, domain_name="shift")
+
+        m.domains.shift = cd_shift = pll.domain
+        m.d.comb += pll.clk_pin.eq(clk_in)
+
+        # Divide by 5 to get the pixel clock.
+        # The pixel clock comes from a shift register, so it rises a fixed delay after a shift
+        # clock edge. VGA2DVID loads the encoded pixel every fifth shift clock, at edges 1, 6, ...,
+        # so the ring is started to rise at edges 3, 8, ..., and the load is 3 shift clocks after
+        # the pixel registers change and 2 before they change again. The two clocks are
+        # constrained separately, as the tools do not time the crossing between them.
+        m.domains.pixel = cd_pixel = ClockDomain("pixel")
+        pixel_ring = Signal(5, reset=0b11001)
+        m.d.shift += pixel_ring.eq(Cat(pixel_ring[1:], pixel_ring[0]))
+        m.d.comb += [
+            cd_pixel.clk.eq(pixel_ring[0]),
+            cd_pixel.rst.eq(cd_shift.rst)
+        ]
+
+        platform.add_clock_constraint(cd_shift.clk, pll.freq_actual * 1e6)
+        platform.add_clock_constraint(cd_pixel.clk, pll.freq_actual * 1e6 / 5)
+
+        # VGA signal generator.
+        m.submodules.vga = vga = VGA.from_timing(self.timing)
+        m.d.comb += [
+            vga.i_clk_en.eq(1),
+            vga.i_test_picture.eq(1)
+        ]
+
+        # VGA to digital video converter.
+        tmds = [Signal(2) for i in range(4)]
+        m.submodules.vga2dvid = vga2dvid = VGA2DVID(ddr=True, shift_clock_synchronizer=False)
+        m.d.comb += [
+            vga2dvid.i_red.eq(vga.o_vga_r),
+            vga2dvid.i_green.eq(vga.o_vga_g),
+            vga2dvid.i_blue.eq(vga.o_vga_b),
+            vga2dvid.i_hsync.eq(vga.o_vga_hsync),
+            vga2dvid.i_vsync.eq(vga.o_vga_vsync),
+            vga2dvid.i_blank.eq(vga.o_vga_blank),
+            tmds[3].eq(vga2dvid.o_clk),
+            tmds[2].eq(vga2dvid.o_red),
+            tmds[1].eq(vga2dvid.o_green),
+            tmds[0].eq(vga2dvid.o_blue),
+        ]
+
+        # SB_IO in registered DDR output mode: D_OUT_0 is sent on the rising edge
+        # and D_OUT_1 on the falling edge. The n pins get the inverted bits.
+        dvi = platform.request("dvi", 0, dir={"p": "-", "n": "-"})
+        for i in range(4):
+            for pin, invert in ((dvi.p, False), (dvi.n, True)):
+                d = ~tmds[i] if invert else tmds[i]
+                m.submodules += Instance("SB_IO",
+                    p_PIN_TYPE    = C(0b010000, 6),
+                    p_IO_STANDARD = "SB_LVCMOS",
+                    io_PACKAGE_PIN = pin.io[i],
+                    i_OUTPUT_CLK  = ClockSignal("shift"),
+                    i_D_OUT_0     = d[0],
+                    i_D_OUT_1     = d[1])
+
+        m.d.comb += self.o_led.eq(Cat(vga.o_vga_vsync, vga.o_vga_hsync, vga.o_vga_blank, pll.locked))
+
+        return m
+
+
+if __name__ == "__main__":
+    platform = BlackIceMXPlatform()
+    platform.add_resources(dvi_pmod)
+
+    m = Module()
+    m.submodules.top = top = TopDVITest(timing=vga_timings['640x480@60Hz'])
+
+    leds = [platform.request("led", i) for i in range(4)]
+
+    for i in range(len(leds)):
+        m.d.comb += leds[i].eq(top.o_led[i])
+
+    platform.build(m, do_program=True)
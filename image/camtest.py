@@ -1,3 +1,6 @@
+import os
+import sys
+
 from nmigen import *
 from nmigen.build import *
 from nmigen_boards.blackice_mx import *
@@ -7,9 +10,10 @@ from camconfig import *
 from image_stream import *
 from debouncer import *
 
-from vga import VGA
-from vga_timings import *
-from pll import PLL
+# Use the shared video package in the top level directory
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from video_common import VGA, VGATiming, vga_timings
 
 vga_pmod = [
     Resource("vga", 0,
@@ -79,12 +83,6 @@ class CamTest(Elaboratable):
     def elaborate(self, platform):
         # Constants
         pixel_f     = self.timing.pixel_freq
-        hsync_front_porch = self.timing.h_front_porch
-        hsync_pulse_width = self.timing.h_sync_pulse
-        hsync_back_porch  = self.timing.h_back_porch
-        vsync_front_porch = self.timing.v_front_porch
-        vsync_pulse_width = self.timing.v_sync_pulse
-        vsync_back_porch  = self.timing.v_back_porch
 
         m = Module()
         
@@ -238,18 +236,7 @@ class CamTest(Elaboratable):
         psum = Signal(8)
 
         # Add VGA generator
-        m.submodules.vga = vga = VGA(
-           resolution_x      = self.timing.x,
-           hsync_front_porch = hsync_front_porch,
-           hsync_pulse       = hsync_pulse_width,
-           hsync_back_porch  = hsync_back_porch,
-           resolution_y      = self.timing.y,
-           vsync_front_porch = vsync_front_porch,
-           vsync_pulse       = vsync_pulse_width,
-           vsync_back_porch  = vsync_back_porch,
-           bits_x            = 16, # Play around with the sizes because sometimes
-           bits_y            = 16  # a smaller/larger value will make it pass timing.
-        )
+        m.submodules.vga = vga = VGA.from_timing(self.timing)
 
         # Connect frame buffer
         m.d.comb += [
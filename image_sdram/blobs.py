@@ -0,0 +1,346 @@
+from nmigen import *
+
+# Finds up to n blobs of pixels with hit set in a stream, and their area,
+# bounding box and centroid.
+#
+# The hits on each line are made into runs. When a run ends, it is added to the blobs
+# that touch it on the line before, with 8-connectivity; if it touches more than one, they
+# are merged into the first. A blob is compared by the extent of its runs on each line, rather
+# than each run, so a blob with a hole or a U shape may take a little more than it should.
+# If there is no blob to add it to, it starts a new one, if there is a free slot.
+#
+# The camera may send each x and y more than once when it is being scaled down,
+# so repeated pixels, and lines that are sent again, are ignored.
+#
+# At frame_done a run that is still open is added, and the cycle after the blobs of the frame
+# are kept for reading, and their centroids are worked out with a serial divider, during
+# vertical blanking; updated is set when they are ready.
+# Blob sel is read with the outputs, and largest is the one with the biggest area;
+# its centroid is also always output.
+class Blobs(Elaboratable):
+    def __init__(self, n=4):
+        # parameters
+        self.n          = n
+
+        # inputs
+        self.valid      = Signal()
+        self.x          = Signal(10)
+        self.y          = Signal(10)
+        self.hit        = Signal()
+        self.frame_done = Signal()
+        self.sel        = Signal(range(n))
+
+        # outputs
+        self.updated    = Signal()
+        self.count      = Signal(range(n + 1))
+        self.overflows  = Signal(8)    # Runs with no free slot, last frame
+        self.largest    = Signal(range(n))
+        self.largest_cx = Signal(10)
+        self.largest_cy = Signal(10)
+        self.active     = Signal()
+        self.area       = Signal(17)
+        self.min_x      = Signal(10)
+        self.max_x      = Signal(10)
+        self.min_y      = Signal(10)
+        self.max_y      = Signal(10)
+        self.cx         = Signal(10)
+        self.cy         = Signal(10)
+
+    def elaborate(self, platform):
+        m = Module()
+
+        n = self.n
+
+        # Ignore repeated pixels and lines
+        l_x     = Signal(10)
+        l_y     = Signal(10)
+        start_x = Signal(10)
+        repeat  = Signal()
+        new_px  = Signal()
+
+        m.d.comb += new_px.eq(self.valid & ((self.x != l_x) | (self.y != l_y)) &
+                              ~(repeat | ((self.y == l_y) & (self.x == start_x))))
+
+        with m.If(self.valid):
+            m.d.sync += [
+                l_x.eq(self.x),
+                l_y.eq(self.y)
+            ]
+            with m.If(self.y != l_y):
+                m.d.sync += [
+                    start_x.eq(self.x),
+                    repeat.eq(0)
+                ]
+            with m.Elif((self.x == start_x) & (self.x != l_x)):
+                m.d.sync += repeat.eq(1)
+
+        # Current run
+        in_run = Signal()
+        r_x0   = Signal(10)
+        r_x1   = Signal(10)
+        r_y    = Signal(10)
+        r_len  = Signal(17)
+        r_sx   = Signal(25)
+        r_sy   = Signal(25)
+        end    = Signal()
+
+        # Results of the last frame are copied the cycle after frame_done
+        old_done = Signal()
+        done     = Signal()
+        copy     = Signal()
+
+        m.d.sync += [
+            old_done.eq(self.frame_done),
+            copy.eq(done)
+        ]
+        m.d.comb += done.eq(self.frame_done & ~old_done)
+
+        # A run ends at a pixel without a hit, a new line, or the end of the frame
+        m.d.comb += end.eq(in_run & ((new_px & (~self.hit | (self.y != r_y))) | done))
+
+        with m.If(new_px):
+            with m.If(self.hit):
+                with m.If(in_run & (self.y == r_y)):
+                    m.d.sync += [
+                        r_x0.eq(Mux(self.x < r_x0, self.x, r_x0)),
+                        r_x1.eq(Mux(self.x > r_x1, self.x, r_x1)),
+                        r_len.eq(r_len + 1),
+                        r_sx.eq(r_sx + self.x),
+                        r_sy.eq(r_sy + self.y)
+                    ]
+                with m.Else():
+                    m.d.sync += [
+                        in_run.eq(1),
+                        r_x0.eq(self.x),
+                        r_x1.eq(self.x),
+                        r_y.eq(self.y),
+                        r_len.eq(1),
+                        r_sx.eq(self.x),
+                        r_sy.eq(self.y)
+                    ]
+            with m.Else():
+                m.d.sync += in_run.eq(0)
+
+        # Blob slots
+        def slots(bits, name):
+            return [Signal(bits, name=name + str(i)) for i in range(n)]
+
+        act  = slots(1, "act")
+        area = slots(17, "area")
+        x0   = slots(10, "x0")
+        x1   = slots(10, "x1")
+        y0   = slots(10, "y0")
+        y1   = slots(10, "y1")
+        sx   = slots(25, "sx")
+        sy   = slots(25, "sy")
+        ly   = slots(10, "ly")  # Last line with a run
+        e0   = slots(10, "e0")  # Extent of the runs on line ly
+        e1   = slots(10, "e1")
+        p0   = slots(10, "p0")  # Extent of the runs on line ly - 1
+        p1   = slots(10, "p1")
+        pv   = slots(1, "pv")   # p0 and p1 are valid
+
+        # Slots touching the run
+        match = Signal(n)
+        same  = Signal(n)   # Slots that already have a run on this line
+        for i in range(n):
+            a0 = Signal(10, name="a0_" + str(i))
+            a1 = Signal(10, name="a1_" + str(i))
+            av = Signal(name="av_" + str(i))
+            m.d.comb += [
+                same[i].eq(ly[i] == r_y),
+                # Extent on the line before the run, which is above it, or below it when flipped
+                a0.eq(Mux(same[i], p0[i], e0[i])),
+                a1.eq(Mux(same[i], p1[i], e1[i])),
+                av.eq(Mux(same[i], pv[i], (ly[i] + 1 == r_y) | (ly[i] == r_y + 1))),
+                match[i].eq(act[i] & av & (r_x0 <= a1 + 1) & (r_x1 + 1 >= a0))
+            ]
+
+        # First matching slot, and first free slot
+        first = Signal(range(n))
+        free  = Signal(range(n))
+        for i in reversed(range(n)):
+            with m.If(match[i]):
+                m.d.comb += first.eq(i)
+            with m.If(~act[i]):
+                m.d.comb += free.eq(i)
+
+        # Merged values of the run and the matching slots
+        def merge(vals, init, f):
+            r = init
+            for i in range(n):
+                r = Mux(match[i], f(r, vals[i]), r)
+            return r
+
+        def lo(a, b):
+            return Mux(a < b, a, b)
+
+        def hi(a, b):
+            return Mux(a > b, a, b)
+
+        def same_merge(vals, init, f):
+            r = init
+            for i in range(n):
+                r = Mux(match[i] & same[i], f(r, vals[i]), r)
+            return r
+
+        # Extent on the line before: p of slots already on this line, e of the others
+        a_lo = C(1023, 10)
+        a_hi = C(0, 10)
+        for i in range(n):
+            a_lo = Mux(match[i], lo(a_lo, Mux(same[i], p0[i], e0[i])), a_lo)
+            a_hi = Mux(match[i], hi(a_hi, Mux(same[i], p1[i], e1[i])), a_hi)
+
+        overflow = Signal(8)
+
+        with m.If(end):
+            with m.If(match.any()):
+                for i in range(n):
+                    with m.If(first == i):
+                        m.d.sync += [
+                            area[i].eq(merge(area, r_len, lambda r, v: r + v)),
+                            x0[i].eq(merge(x0, r_x0, lo)),
+                            x1[i].eq(merge(x1, r_x1, hi)),
+                            y0[i].eq(merge(y0, r_y, lo)),
+                            y1[i].eq(merge(y1, r_y, hi)),
+                            sx[i].eq(merge(sx, r_sx, lambda r, v: r + v)),
+                            sy[i].eq(merge(sy, r_sy, lambda r, v: r + v)),
+                            ly[i].eq(r_y),
+                            e0[i].eq(same_merge(e0, r_x0, lo)),
+                            e1[i].eq(same_merge(e1, r_x1, hi)),
+                            p0[i].eq(a_lo),
+                            p1[i].eq(a_hi),
+                            pv[i].eq(1)
+                        ]
+                    with m.Elif(match[i]):
+                        # Merged into the first
+                        m.d.sync += act[i].eq(0)
+            with m.Elif(~Cat(*act).all()):
+                for i in range(n):
+                    with m.If(free == i):
+                        m.d.sync += [
+                            act[i].eq(1),
+                            area[i].eq(r_len),
+                            x0[i].eq(r_x0),
+                            x1[i].eq(r_x1),
+                            y0[i].eq(r_y),
+                            y1[i].eq(r_y),
+                            sx[i].eq(r_sx),
+                            sy[i].eq(r_sy),
+                            ly[i].eq(r_y),
+                            e0[i].eq(r_x0),
+                            e1[i].eq(r_x1),
+                            pv[i].eq(0)
+                        ]
+            with m.Else():
+                m.d.sync += overflow.eq(overflow + 1)
+
+        o_act  = Array(slots(1, "o_act"))
+        o_area = Array(slots(17, "o_area"))
+        o_x0   = Array(slots(10, "o_x0"))
+        o_x1   = Array(slots(10, "o_x1"))
+        o_y0   = Array(slots(10, "o_y0"))
+        o_y1   = Array(slots(10, "o_y1"))
+        o_sx   = Array(slots(25, "o_sx"))
+        o_sy   = Array(slots(25, "o_sy"))
+        o_cx   = Array(slots(10, "o_cx"))
+        o_cy   = Array(slots(10, "o_cy"))
+
+        m.d.comb += [
+            self.active.eq(o_act[self.sel]),
+            self.area.eq(o_area[self.sel]),
+            self.min_x.eq(o_x0[self.sel]),
+            self.max_x.eq(o_x1[self.sel]),
+            self.min_y.eq(o_y0[self.sel]),
+            self.max_y.eq(o_y1[self.sel]),
+            self.cx.eq(o_cx[self.sel]),
+            self.cy.eq(o_cy[self.sel]),
+            self.largest_cx.eq(o_cx[self.largest]),
+            self.largest_cy.eq(o_cy[self.largest])
+        ]
+
+        with m.If(done):
+            m.d.sync += in_run.eq(0)
+
+        with m.If(copy):
+            m.d.sync += [
+                self.count.eq(sum(act)),
+                self.overflows.eq(overflow),
+                overflow.eq(0)
+            ]
+            for i in range(n):
+                m.d.sync += [
+                    o_act[i].eq(act[i]),
+                    o_area[i].eq(Mux(act[i], area[i], 0)),
+                    o_x0[i].eq(x0[i]),
+                    o_x1[i].eq(x1[i]),
+                    o_y0[i].eq(y0[i]),
+                    o_y1[i].eq(y1[i]),
+                    o_sx[i].eq(sx[i]),
+                    o_sy[i].eq(sy[i]),
+                    act[i].eq(0)
+                ]
+
+        # Centroids, by restoring division of the sums by the area, one bit a cycle,
+        # and the largest blob
+        blob = Signal(range(n))
+        axis = Signal()
+        k    = Signal(4)
+        rem  = Signal(25)
+        div  = Signal(27)
+        q    = Signal(10)
+        best = Signal(17)
+
+        m.d.sync += self.updated.eq(0)
+
+        with m.FSM():
+            with m.State("IDLE"):
+                with m.If(copy):
+                    m.d.sync += [
+                        blob.eq(0),
+                        best.eq(0),
+                        self.largest.eq(0)
+                    ]
+                    m.next = "START"
+            with m.State("START"):
+                m.d.sync += [
+                    rem.eq(Mux(axis, o_sy[blob], o_sx[blob])),
+                    div.eq(o_area[blob] << 9),
+                    k.eq(9),
+                    q.eq(0)
+                ]
+                with m.If(~axis & (o_area[blob] > best)):
+                    m.d.sync += [
+                        best.eq(o_area[blob]),
+                        self.largest.eq(blob)
+                    ]
+                m.next = "DIVIDE"
+            with m.State("DIVIDE"):
+                with m.If((rem >= div) & (div != 0)):
+                    m.d.sync += [
+                        rem.eq(rem - div),
+                        q.eq(Cat(C(1, 1), q))
+                    ]
+                with m.Else():
+                    m.d.sync += q.eq(Cat(C(0, 1), q))
+                m.d.sync += [
+                    div.eq(div >> 1),
+                    k.eq(k - 1)
+                ]
+                with m.If(k == 0):
+                    m.next = "STORE"
+            with m.State("STORE"):
+                with m.If(axis):
+                    m.d.sync += o_cy[blob].eq(q)
+                with m.Else():
+                    m.d.sync += o_cx[blob].eq(q)
+                m.d.sync += axis.eq(~axis)
+                with m.If(axis & (blob == n - 1)):
+                    m.d.sync += self.updated.eq(1)
+                    m.next = "IDLE"
+                with m.Else():
+                    with m.If(axis):
+                        m.d.sync += blob.eq(blob + 1)
+                    m.next = "START"
+
+        return m
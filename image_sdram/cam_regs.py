@@ -0,0 +1,82 @@
+import argparse
+import serial
+
+from osd_text import write
+
+# Reads and writes OV7670 registers, and the camera config, on camtest.py over the uart,
+# so the camera can be tuned without building it again.
+#
+# --dump prints the registers as lines of register and value, like config.mem, and
+# --load writes a config.mem file to the camera config and sends it to the camera.
+# The camera config has 256 entries, and ends with ffff.
+#
+# Each register is read back as it is configured, unless that is turned off with
+# --verify off, and --status shows how many did not match.
+
+REGS = 0xCA
+
+def read_regs(ser, reg, count):
+    write(ser, 0x40C, reg)
+    write(ser, 0x40E, count & 0xFF)
+    data = ser.read(count)
+    if len(data) != count:
+        raise SystemExit("Read {} of {} registers".format(len(data), count))
+    return data
+
+# Waits for each write to be done, as camtest.py takes one request at a time
+def write_reg(ser, reg, val):
+    write(ser, 0x40C, reg)
+    write(ser, 0x40D, val)
+    if len(ser.read(1)) != 1:
+        raise SystemExit("No reply to the write of register {:02x}".format(reg))
+
+def load_config(ser, name):
+    with open(name) as f:
+        entries = [int(s, 16) for s in f if s.strip() and s[0] != "/"]
+    assert len(entries) <= 256, "Too many entries in " + name
+    for i, e in enumerate(entries):
+        write(ser, 0x600 + i * 2, e & 0xFF)
+        write(ser, 0x601 + i * 2, e >> 8)
+    write(ser, 0x40F, 1)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("port", help="Serial port, e.g. /dev/ttyACM0")
+    parser.add_argument("--baud", type=int, default=1000000)
+    parser.add_argument("--write", type=lambda v: int(v, 0), nargs=2, action="append", default=[],
+                        metavar=("REG", "VALUE"), help="Write a register")
+    parser.add_argument("--read", type=lambda v: int(v, 0), action="append", default=[],
+                        metavar="REG", help="Read a register")
+    parser.add_argument("--dump", action="store_true", help="Read all the registers")
+    parser.add_argument("--load", metavar="FILE", help="Load the camera config from a file like config.mem")
+    parser.add_argument("--replay", action="store_true", help="Send the camera config to the camera again")
+    parser.add_argument("--verify", choices=["on", "off"], help="Check each register as the config is sent")
+    parser.add_argument("--status", action="store_true", help="Show the registers that did not match")
+    args = parser.parse_args()
+
+    ser = serial.Serial(args.port, args.baud, timeout=1)
+
+    if args.verify:
+        write(ser, 0x410, 1 if args.verify == "on" else 0)
+    if args.load:
+        load_config(ser, args.load)
+    elif args.replay:
+        write(ser, 0x40F, 1)
+    for reg, val in args.write:
+        write_reg(ser, reg, val)
+    for reg in args.read:
+        print("{:02x}: {:02x}".format(reg, read_regs(ser, reg, 1)[0]))
+    if args.status:
+        write(ser, 0x411, 1)
+        data = ser.read(4)
+        if len(data) != 4:
+            raise SystemExit("No status")
+        errors, reg, val, got = data
+        print("{} registers did not match".format(errors))
+        if errors:
+            print("last {:02x}: wrote {:02x}, read {:02x}".format(reg, val, got))
+    if args.dump:
+        for reg, val in enumerate(read_regs(ser, 0, REGS)):
+            print("{:02x}{:02x}".format(reg, val))
+
+    ser.close()
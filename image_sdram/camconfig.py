@@ -4,39 +4,151 @@ from ov7670_config import *
 from sccb import *
 from readhex import *
 
+# Configures the camera from a RAM, loaded with config.mem, that the host can rewrite,
+# and reads and writes camera registers for the host.
+#
+# The RAM is written a byte at a time with cfg_addr = index * 2 + byte, low byte first;
+# each entry is the register and the value, as in config.mem. start sends the entries
+# to the camera again.
+#
+# reg_write writes reg_data to the register at reg_addr. reg_read reads reg_count
+# registers from reg_addr, 0 for 256, and each value is in reg_rdata while reg_rdy
+# is set, until reg_ack. A write sends back the value written when it is done, so the
+# host can wait for it. These wait for the configuration to finish, and are only taken
+# when busy is clear.
+#
+# With verify set, each register is read back as it is configured. status_read sends
+# the result the same way, as four bytes: the number of registers that did not match,
+# and the last of them, the value written and the value read back.
 class CamConfig(Elaboratable):
-    def __init__(self):
-        self.start = Signal()
-        self.sioc = Signal()
-        self.siod = Signal()
-        self.done = Signal()
-        self.rom_addr = Signal(8)
+    def __init__(self, sccb_freq=400000):
+        # parameters
+        self.sccb_freq = sccb_freq
+
+        # inputs
+        self.start     = Signal()
+        self.verify    = Signal()
+        self.siod_i    = Signal()
+        self.cfg_addr  = Signal(9)
+        self.cfg_data  = Signal(8)
+        self.cfg_we    = Signal()
+        self.reg_addr  = Signal(8)
+        self.reg_data  = Signal(8)
+        self.reg_count = Signal(8)
+        self.reg_write = Signal()
+        self.reg_read  = Signal()
+        self.status_read = Signal()
+        self.reg_ack   = Signal()
+
+        # outputs
+        self.sioc      = Signal()
+        self.siod      = Signal()
+        self.siod_en   = Signal()
+        self.done      = Signal()
+        self.errors    = Signal(8)
+        self.rom_addr  = Signal(8)
+        self.reg_rdata = Signal(8)
+        self.reg_rdy   = Signal()
+        self.busy      = Signal()
 
     def elaborate(self, platform):
         m = Module()
 
         config_data = readhex("config.mem")
-        config_rom = Memory(width=16, depth=len(config_data), init=config_data)
-        m.submodules.r = r = config_rom.read_port()
+        config_ram = Memory(width=16, depth=256, init=config_data)
+        m.submodules.r = r = config_ram.read_port()
+        m.submodules.w = w = config_ram.write_port(granularity=8)
 
         ov7670_config = OV7670Config()
         m.submodules.ov7670_config = ov7670_config
 
-        sccb = SCCB()
+        sccb = SCCB(freq=self.sccb_freq)
         m.submodules.sccb = sccb
 
         m.d.comb += [
             self.sioc.eq(~sccb.sioc_oe),
             self.siod.eq(~sccb.siod_oe),
+            self.siod_en.eq(~sccb.siod_in),
+            sccb.siod_i.eq(self.siod_i),
             self.done.eq(ov7670_config.done),
+            self.errors.eq(ov7670_config.errors),
+            ov7670_config.verify.eq(self.verify),
+            ov7670_config.sccb_rdata.eq(sccb.rdata),
             r.addr.eq(ov7670_config.rom_addr),
+            w.addr.eq(self.cfg_addr[1:]),
+            w.data.eq(Repl(self.cfg_data, 2)),
+            w.en.eq(Mux(self.cfg_we, Mux(self.cfg_addr[0], 0b10, 0b01), 0)),
             ov7670_config.sccb_ready.eq(sccb.ready),
             ov7670_config.start.eq(self.start),
             ov7670_config.rom_data.eq(r.data),
-            sccb.address.eq(ov7670_config.sccb_addr),
-            sccb.data.eq(ov7670_config.sccb_data),
-            sccb.start.eq(ov7670_config.sccb_start),
             self.rom_addr.eq(ov7670_config.rom_addr)
         ]
 
+        # Host register accesses, between configurations
+        addr    = Signal(8)
+        data    = Signal(8)
+        left    = Signal(8)
+        reading = Signal()
+        status  = Signal(2)
+
+        with m.If(self.reg_ack):
+            m.d.sync += self.reg_rdy.eq(0)
+
+        with m.FSM():
+            with m.State("IDLE"):
+                with m.If(self.status_read):
+                    m.d.sync += status.eq(0)
+                    m.next = "STATUS"
+                with m.Elif(self.reg_write | self.reg_read):
+                    m.d.sync += [
+                        addr.eq(self.reg_addr),
+                        data.eq(self.reg_data),
+                        left.eq(self.reg_count - 1),
+                        reading.eq(self.reg_read)
+                    ]
+                    m.next = "WAIT"
+            with m.State("WAIT"):
+                m.d.comb += self.busy.eq(1)
+                with m.If(~ov7670_config.busy & ~ov7670_config.start & sccb.ready & ~self.reg_rdy):
+                    m.d.comb += sccb.start.eq(1)
+                    m.next = "ACCESS"
+            with m.State("ACCESS"):
+                m.d.comb += self.busy.eq(1)
+                with m.If(sccb.ready):
+                    m.d.sync += [
+                        self.reg_rdata.eq(Mux(reading, sccb.rdata, data)),
+                        self.reg_rdy.eq(1),
+                        addr.eq(addr + 1),
+                        left.eq(left - 1)
+                    ]
+                    with m.If(reading & (left != 0)):
+                        m.next = "WAIT"
+                    with m.Else():
+                        m.next = "IDLE"
+            with m.State("STATUS"):
+                m.d.comb += self.busy.eq(1)
+                with m.If(~ov7670_config.busy & ~self.reg_rdy):
+                    m.d.sync += [
+                        self.reg_rdata.eq(Array([ov7670_config.errors, ov7670_config.err_addr,
+                                                 ov7670_config.err_data, ov7670_config.err_rdata])[status]),
+                        self.reg_rdy.eq(1),
+                        status.eq(status + 1)
+                    ]
+                    with m.If(status == 3):
+                        m.next = "IDLE"
+
+        with m.If(ov7670_config.busy):
+            m.d.comb += [
+                sccb.address.eq(ov7670_config.sccb_addr),
+                sccb.data.eq(ov7670_config.sccb_data),
+                sccb.start.eq(ov7670_config.sccb_start),
+                sccb.read.eq(ov7670_config.sccb_read)
+            ]
+        with m.Else():
+            m.d.comb += [
+                sccb.address.eq(addr),
+                sccb.data.eq(data),
+                sccb.read.eq(reading)
+            ]
+
         return m
@@ -0,0 +1,137 @@
+import argparse
+import time
+
+import numpy as np
+
+from nmigen import *
+from nmigen.sim import Simulator, Settle
+
+from camread import *
+from image_stream import *
+from pixel_format import *
+from ov7670_model import *
+from image_stream_sim import read_image
+import image_model
+
+# Simulates the camera pipeline of camtest.py, CamRead -> ImageStream -> PixelPacker, with
+# the OV7670 model sending an image or color bars, and writes each captured frame as
+# frameN.png, or frameN.ppm if PIL is not installed.
+#
+# The camera frames are halved in each direction, as in camtest.py, so a 640x480
+# camera gives 320x240 frames. The simulation runs at about 4k PCLK cycles a second, so a
+# full VGA frame, 800k cycles with its blanking, takes over 3 minutes. Smaller frames,
+# with --size, simulate much faster; the blanking is scaled down with them.
+
+def write_frame(name, r, g, b):
+    rgb = np.stack([(r << 3) | (r >> 2), (g << 2) | (g >> 4), (b << 3) | (b >> 2)], axis=2).astype(np.uint8)
+    try:
+        from PIL import Image
+        Image.fromarray(rgb).save(name + ".png")
+        return name + ".png"
+    except ImportError:
+        with open(name + ".ppm", "wb") as f:
+            f.write(b"P6\n%d %d\n255\n" % (rgb.shape[1], rgb.shape[0]))
+            f.write(rgb.tobytes())
+        return name + ".ppm"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("image", nargs="?", help="PPM or PNG image of the camera size, or color bars if not given")
+    parser.add_argument("--size", default="640x480", help="Camera frame size")
+    parser.add_argument("--frames", type=int, default=2, help="Frames to send")
+    parser.add_argument("--pclk", type=float, default=25, help="PCLK in MHz")
+    parser.add_argument("--sys", type=float, default=25, help="System clock in MHz")
+    parser.add_argument("--fifo", type=int, default=16, help="CamRead FIFO depth")
+    parser.add_argument("--set", action="append", default=[], metavar="NAME=VALUE",
+                        help="Set an ImageStream control, e.g. --set gamma=1")
+    args = parser.parse_args()
+
+    w, h = (int(v) for v in args.size.split("x"))
+
+    if args.image:
+        image = read_image(args.image)
+        frames = lambda n: image
+    else:
+        frames = color_bars(w, h)
+
+    # Blanking scaled down with the frame
+    cam = OV7670Model(frames, width=w, height=h, h_blank=288 * w // 640,
+                      v_sync=3, v_back=max(17 * h // 480, 1), v_front=max(10 * h // 480, 1))
+
+    ow, oh = w // 2, h // 2
+
+    m = Module()
+    m.domains.cam = ClockDomain("cam")
+    m.domains.camdata = ClockDomain("camdata")
+
+    m.submodules.camread = camread = CamRead(fifo_depth=args.fifo)
+    m.submodules.ims = ims = ImageStream(res_x=ow, res_y=oh)
+    m.submodules.packer = packer = PixelPacker(fmt=RGB565, res_x=ow)
+
+    href   = Signal()
+    vsync  = Signal()
+    p_data = Signal(8)
+
+    m.d.comb += [
+        camread.p_clock.eq(ClockSignal("cam")),
+        camread.href.eq(href),
+        camread.vsync.eq(vsync),
+        camread.p_data.eq(p_data),
+        ims.valid.eq(camread.pixel_valid),
+        ims.i_x.eq(camread.row[1:]),
+        ims.i_y.eq(camread.col[1:]),
+        ims.i_r.eq(camread.pixel_data[11:]),
+        ims.i_g.eq(camread.pixel_data[5:11]),
+        ims.i_b.eq(camread.pixel_data[0:5]),
+        ims.frame_done.eq(camread.frame_done),
+        packer.valid.eq(ims.ready),
+        packer.x.eq(ims.o_x),
+        packer.y.eq(ims.o_y),
+        packer.r.eq(ims.o_r),
+        packer.g.eq(ims.o_g),
+        packer.b.eq(ims.o_b)
+    ]
+
+    controls = {}
+    for s in args.set:
+        name, val = s.split("=")
+        assert name in image_model.CONTROLS, "Unknown control " + name
+        controls[name] = int(val, 0)
+
+    # The frame buffer
+    fb = np.zeros(ow * oh, dtype=np.int64)
+    saved = []
+
+    def capture():
+        for name, val in controls.items():
+            yield getattr(ims, name).eq(val)
+        old_done = 0
+        while True:
+            yield
+            yield Settle()
+            if (yield packer.we):
+                addr = yield packer.addr
+                if addr < len(fb):
+                    fb[addr] = yield packer.data
+            done = yield ims.o_frame_done
+            if done and not old_done:
+                p = fb.reshape(oh, ow)
+                saved.append(write_frame("frame" + str(len(saved)), p >> 11, (p >> 5) & 0x3f, p & 0x1f))
+            old_done = done
+
+    sim = Simulator(m)
+    sim.add_clock(1e-6 / args.sys)
+    sim.add_clock(1e-6 / args.pclk, domain="cam")
+    sim.add_clock(1e-6 / args.pclk, domain="camdata", phase=0.5e-6 / args.pclk)
+    sim.add_sync_process(lambda: (yield from cam.process(href, vsync, p_data, args.frames)), domain="camdata")
+    sim.add_sync_process(capture)
+
+    # Each frame, and a little of the next, so the last frame is done
+    cycles = (cam.line * (cam.v_sync + cam.v_back + h + cam.v_front)) * args.frames + cam.line
+    start = time.time()
+    sim.run_until(cycles * 1e-6 / args.pclk)
+    elapsed = time.time() - start
+
+    for name in saved:
+        print("Wrote", name)
+    print("{} PCLK cycles in {:.1f}s, {:.0f} cycles/s".format(cycles, elapsed, cycles / elapsed))
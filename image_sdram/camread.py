@@ -1,23 +1,113 @@
 from nmigen import *
+from nmigen.lib.fifo import AsyncFIFO
+from nmigen.lib.cdc import FFSynchronizer
+from nmigen.lib.coding import GrayEncoder, GrayDecoder
 
+# Reads pixels from the OV7670 camera, in its own pclock domain.
+#
+# With fifo_depth set, the pixels are passed to the sync domain through an AsyncFIFO, so
+# the outputs are in the sync domain, whatever the ratio of the clocks. Each entry is a
+# pixel with its row and col, or the end of a frame, which sets frame_done for a cycle.
+# With the FIFO, frame_start is set with the first pixel of each frame.
+# Pixels that arrive when the FIFO is full are dropped: dropped counts them, and
+# overflows counts the times it happened. If the end of a frame is dropped, the frame
+# runs on into the next one.
 class CamRead(Elaboratable):
     WAIT_FRAME_START = 0
     ROW_CAPTURE      = 1
 
-    def __init__(self):
+    def __init__(self, fifo_depth=0):
+        # parameters
+        self.fifo_depth  = fifo_depth
+
+        # inputs
         self.p_clock     = Signal()
         self.vsync       = Signal()
         self.href        = Signal()
         self.p_data      = Signal(8)
+
+        # outputs
         self.pixel_data  = Signal(16)
         self.pixel_valid = Signal()
         self.frame_done  = Signal()
+        self.frame_start = Signal()
         self.row         = Signal(10)
         self.col         = Signal(9)
+        self.overflows   = Signal(16)
+        self.dropped     = Signal(16)
 
     def elaborate(self, platform):
         m = Module()
 
+        if self.fifo_depth:
+            # Read the camera into signals in its pclock domain
+            m.submodules.cam = cam = CamRead()
+            m.d.comb += [
+                cam.p_clock.eq(self.p_clock),
+                cam.vsync.eq(self.vsync),
+                cam.href.eq(self.href),
+                cam.p_data.eq(self.p_data)
+            ]
+
+            # Entries are the pixel, row, col, frame start, pixels lost before it, and frame end
+            m.submodules.fifo = fifo = AsyncFIFO(width=38, depth=self.fifo_depth,
+                                                 r_domain="sync", w_domain="pclock")
+
+            first   = Signal(reset=1)
+            lost    = Signal()
+            dropped = Signal(16)
+
+            m.d.comb += [
+                fifo.w_data.eq(Cat(cam.pixel_data, cam.row, cam.col,
+                                   first & ~cam.frame_done, lost, cam.frame_done)),
+                fifo.w_en.eq(cam.pixel_valid | cam.frame_done)
+            ]
+
+            with m.If(fifo.w_en):
+                with m.If(fifo.w_rdy):
+                    m.d.pclock += lost.eq(0)
+                    with m.If(cam.frame_done):
+                        m.d.pclock += first.eq(1)
+                    with m.Else():
+                        m.d.pclock += first.eq(0)
+                with m.Else():
+                    m.d.pclock += [
+                        lost.eq(1),
+                        dropped.eq(dropped + cam.pixel_valid)
+                    ]
+
+            # The drop count is passed to the sync domain in Gray code
+            m.submodules.genc = genc = GrayEncoder(16)
+            m.submodules.gdec = gdec = GrayDecoder(16)
+
+            gray   = Signal(16)
+            s_gray = Signal(16)
+
+            m.d.comb += genc.i.eq(dropped)
+            m.d.pclock += gray.eq(genc.o)
+            m.submodules.dsync = FFSynchronizer(gray, s_gray, o_domain="sync")
+            m.d.comb += gdec.i.eq(s_gray)
+            m.d.sync += self.dropped.eq(gdec.o)
+
+            # The system never waits
+            eof = Signal()
+
+            m.d.comb += [
+                fifo.r_en.eq(1),
+                eof.eq(fifo.r_data[37]),
+                self.pixel_valid.eq(fifo.r_rdy & ~eof),
+                self.frame_done.eq(fifo.r_rdy & eof),
+                self.frame_start.eq(fifo.r_rdy & fifo.r_data[35]),
+                self.pixel_data.eq(fifo.r_data[:16]),
+                self.row.eq(fifo.r_data[16:26]),
+                self.col.eq(fifo.r_data[26:35])
+            ]
+
+            with m.If(fifo.r_rdy & fifo.r_data[36]):
+                m.d.sync += self.overflows.eq(self.overflows + 1)
+
+            return m
+
         # Create pclock domain
         pclock = ClockDomain("pclock")
         m.domains += pclock
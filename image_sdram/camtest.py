@@ -1,17 +1,29 @@
+import os
+import sys
+
 from nmigen import *
 from nmigen.build import *
 from nmigen_boards.blackice_mx import *
+from nmigen_stdio.serial import AsyncSerial
 
 from camread import *
 from camconfig import *
 from image_stream import *
 from debouncer import *
 
-from vga import VGA
-from vga_timings import *
-from pll import PLL
+# Use the shared video package in the top level directory
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from video_common import VGA, VGATiming, vga_timings, PLL
 from sdram_controller16 import sdram_controller
 from osd import OSD
+from text_osd import TextOSD
+from frame_stats import FrameStats, AutoExposure
+from frame_buffers import FrameBuffers
+from motion import MotionDetect
+from frame_grabber import FrameGrabber
+from scaler import Scaler
+from pixel_format import *
 
 # Digilent 4-bit per color VGA Pmod
 vga_pmod = [
@@ -35,7 +47,7 @@ btn_led_pmod = [
 ov7670_pmod = [
     Resource("ov7670", 0,
              Subsignal("cam_data", Pins("2 17 3 18 4 19 10 25", dir="i", conn=("mixmod", 0)), Attrs(IO_STANDARD="SB_LVCMOS")),
-             Subsignal("cam_SIOD", Pins("13", dir="o", conn=("mixmod", 0)), Attrs(IO_STANDARD="SB_LVCMOS")),
+             Subsignal("cam_SIOD", Pins("13", dir="io", conn=("mixmod", 0)), Attrs(IO_STANDARD="SB_LVCMOS")),
              Subsignal("cam_SIOC", Pins("28", dir="o", conn=("mixmod", 0)), Attrs(IO_STANDARD="SB_LVCMOS")),
              Subsignal("cam_HREF", Pins("12", dir="i", conn=("mixmod", 0)), Attrs(IO_STANDARD="SB_LVCMOS")),
              Subsignal("cam_VSYNC", Pins("27", dir="i", conn=("mixmod", 0)), Attrs(IO_STANDARD="SB_LVCMOS")),
@@ -48,9 +60,17 @@ class CamTest(Elaboratable):
     def __init__(self,
                  timing: VGATiming, # VGATiming class
                  xadjustf=0, # adjust -3..3 if no picture
-                 yadjustf=0): # or to fine-tune f
+                 yadjustf=0, # or to fine-tune f
+                 frame_slots=3, # 2 for double buffering, 3 for triple buffering
+                 bilinear=True, # bilinear or nearest scaling
+                 fmt=RGB565, # frame buffer pixel format, see pixel_format.py
+                 baud=1000000): # uart baud rate, for the text OSD and frame grabs
         # Configuration
+        self.baud = baud
         self.timing = timing
+        self.frame_slots = frame_slots
+        self.bilinear = bilinear
+        self.fmt = fmt
         self.x = timing.x
         self.y = timing.y
         self.f = timing.pixel_freq
@@ -58,15 +78,6 @@ class CamTest(Elaboratable):
         self.yadjustf = yadjustf
 
     def elaborate(self, platform):
-        # Constants
-        pixel_f     = self.timing.pixel_freq
-        hsync_front_porch = self.timing.h_front_porch
-        hsync_pulse_width = self.timing.h_sync_pulse
-        hsync_back_porch  = self.timing.h_back_porch
-        vsync_front_porch = self.timing.v_front_porch
-        vsync_pulse_width = self.timing.v_sync_pulse
-        vsync_back_porch  = self.timing.v_back_porch
-
         m = Module()
        
         # Get pins
@@ -104,21 +115,18 @@ class CamTest(Elaboratable):
         m.d.comb += ResetSignal().eq(~reset.all())
         m.d.comb += ClockSignal().eq(div[1])
 
-        # Add the SDRAM controller
-        m.submodules.mem = mem = sdram_controller()
+        # Add the SDRAM controller, reading bursts of 4 words
+        BURST = 4
+        m.submodules.mem = mem = sdram_controller(burst_length=BURST)
 
         m.domains.pixel = cd_pixel = ClockDomain("pixel")
         m.d.comb += ClockSignal("pixel").eq(div[1])
 
-        lb = Memory(width=16, depth=320)
-        m.submodules.r = r = lb.read_port()
-        m.submodules.w = w = lb.write_port()
-
-        # Add CamRead submodule
-        camread = CamRead()
+        # Add CamRead submodule, passing the pixels to the sync domain through a FIFO
+        camread = CamRead(fifo_depth=16)
         m.submodules.camread = camread
 
-        # Camera config
+        # Camera config, which can be changed and read over the uart
         camconfig = CamConfig()
         m.submodules.camconfig = camconfig
 
@@ -126,8 +134,9 @@ class CamTest(Elaboratable):
         m.d.comb += [
             ov7670.cam_XCLK.eq(ClockSignal()),
             ov7670.cam_SIOC.eq(camconfig.sioc),
-            ov7670.cam_SIOD.eq(camconfig.siod),
-            camconfig.start.eq(btn1),
+            ov7670.cam_SIOD.o.eq(camconfig.siod),
+            ov7670.cam_SIOD.oe.eq(camconfig.siod_en),
+            camconfig.siod_i.eq(ov7670.cam_SIOD.i),
             camread.p_data.eq(Cat([ov7670.cam_data[i] for i in range(8)])),
             camread.href.eq(ov7670.cam_HREF),
             camread.vsync.eq(ov7670.cam_VSYNC),
@@ -161,14 +170,16 @@ class CamTest(Elaboratable):
         blueness = Signal(signed(7), reset=0)
         edge_thresh = Signal(signed(7), reset=0)
         filt_thresh = Signal(signed(7), reset=0)
+        kernel = Signal(3, reset=0) # Conv3x3 kernel, set over the uart
+        auto = Signal(2, reset=0)   # Auto exposure and auto white balance, set over the uart
+        motion_thresh = Signal(7, reset=0) # Motion detection threshold, 0 for off, set over the uart
 
         m.d.comb += [
             debup.btn.eq(up),
             debdown.btn.eq(down),
             debosd.btn.eq(btn2),
             debsel.btn.eq(sel),
-            ledfeat.eq(Cat([mono, xflip, yflip, border])),
-            led_r.eq(edge)
+            ledfeat.eq(Cat([mono, xflip, yflip, border]))
         ]
 
         # OSD control
@@ -233,10 +244,6 @@ class CamTest(Elaboratable):
                         m.d.sync += filt_thresh.eq(filt_thresh-1)
 
         # Image stream
-        max_r = Signal(5)
-        max_g = Signal(6)
-        max_b = Signal(5)
-
         ims = ImageStream(res_x=320, res_y=240)
         m.submodules.image_stream = ims
 
@@ -245,8 +252,9 @@ class CamTest(Elaboratable):
             ims.i_x.eq(camread.row[1:]),
             ims.i_y.eq(camread.col[1:]),
             ims.i_r.eq(camread.pixel_data[11:]),
-            ims.i_g.eq(camread.pixel_data[6:11]),
+            ims.i_g.eq(camread.pixel_data[5:11]),
             ims.i_b.eq(camread.pixel_data[0:5]),
+            ims.frame_done.eq(camread.frame_done),
             ims.edge.eq(edge_thresh != 0),
             ims.invert.eq(invert),
             ims.border.eq(border),
@@ -257,27 +265,37 @@ class CamTest(Elaboratable):
             ims.y_flip.eq(yflip),
             ims.edge_thresh.eq(edge_thresh),
             ims.filt_thresh.eq(filt_thresh),
-            ims.redness.eq(redness),
-            ims.greenness.eq(greenness),
-            ims.blueness.eq(blueness),
-            ims.brightness.eq(brightness)
+            ims.kernel.eq(kernel)
         ]
 
-        # Frame-level statistics
-        with m.If(ims.i_r > max_r):
-            m.d.sync += max_r.eq(ims.i_r) 
-        with m.If(ims.i_g > max_g):
-            m.d.sync += max_g.eq(ims.i_g) 
-        with m.If(ims.i_b > max_b):
-            m.d.sync += max_b.eq(ims.i_b) 
+        # Frame-level statistics of the processed image, and auto exposure and white balance.
+        # The automatic offsets are added to the ones set with the buttons, saturating.
+        m.submodules.stats = stats = FrameStats(bins=32)
+        m.submodules.ae = ae = AutoExposure()
 
-        with m.If(camread.frame_done):
-            m.d.sync += [
-                max_r.eq(0),
-                max_g.eq(0),
-                max_b.eq(0),
-                #leds.eq(leds+1)
-            ]
+        def offset(manual, auto):
+            s = Signal(signed(8))
+            m.d.comb += s.eq(manual + auto)
+            return Mux(s > 63, 63, Mux(s < -64, -64, s))
+
+        m.d.comb += [
+            stats.valid.eq(ims.ready),
+            stats.r.eq(ims.o_r),
+            stats.g.eq(ims.o_g),
+            stats.b.eq(ims.o_b),
+            stats.frame_done.eq(ims.o_frame_done),
+            ae.updated.eq(stats.updated),
+            ae.mean_y.eq(stats.mean_y),
+            ae.mean_r.eq(stats.mean_r),
+            ae.mean_g.eq(stats.mean_g),
+            ae.mean_b.eq(stats.mean_b),
+            ae.ae.eq(auto[0]),
+            ae.awb.eq(auto[1]),
+            ims.redness.eq(offset(redness, ae.redness)),
+            ims.greenness.eq(offset(greenness, ae.greenness)),
+            ims.blueness.eq(offset(blueness, ae.blueness)),
+            ims.brightness.eq(offset(brightness, ae.brightness))
+        ]
 
         # VGA signal generator.
         vga_r = Signal(8)
@@ -290,61 +308,184 @@ class CamTest(Elaboratable):
         psum = Signal(8)
 
         # Add VGA generator
-        m.submodules.vga = vga = VGA(
-           resolution_x      = self.timing.x,
-           hsync_front_porch = hsync_front_porch,
-           hsync_pulse       = hsync_pulse_width,
-           hsync_back_porch  = hsync_back_porch,
-           resolution_y      = self.timing.y,
-           vsync_front_porch = vsync_front_porch,
-           vsync_pulse       = vsync_pulse_width,
-           vsync_back_porch  = vsync_back_porch,
-           bits_x            = 16, # Play around with the sizes because sometimes
-           bits_y            = 16  # a smaller/larger value will make it pass timing.
-        )
+        m.submodules.vga = vga = VGA.from_timing(self.timing)
+
+        # Frame buffer words per line
+        words = 320 // PIXELS_PER_WORD[self.fmt]
+
+        # Frame buffers, so the camera never writes the frame being displayed
+        m.submodules.fb = fb = FrameBuffers(slots=self.frame_slots, frame_words=words * 240)
+
+        m.d.comb += [
+            fb.frame_done.eq(ims.o_frame_done),
+            fb.vblank.eq(vga.o_vga_vblank),
+            # Show dropped and repeated frames
+            leds.eq(Cat(fb.drops[0], fb.repeats[0]))
+        ]
+
+        # Convert and pack the pixels into SDRAM words
+        m.submodules.packer = packer = PixelPacker(fmt=self.fmt)
 
         # Write to SDRAM
-        raddr = Signal(20)    # SDRAM read address
         waddr = Signal(20)    # SDRAM write address
-        read_pixel = Signal() # Set when pixel is being read from SDRAM
-        x = Signal(10)        # VGA x co-ordinate
-        x1 = Signal(10)       # VGA x + 1
-        x2 = Signal(10)       # VGA X + 2
-        xm2 = Signal(10)      # VGA x - 1
-        y = Signal(10)        # VGA y
+        x = Signal(11)        # VGA x co-ordinate
+        y = Signal(11)        # VGA y
 
         m.d.comb += [
             x.eq(vga.o_beam_x),
-            x1.eq(x + 1),
-            x2.eq(x + 2),
-            xm2.eq(x - 2),
             y.eq(vga.o_beam_y),
-            raddr.eq((y[1:] * 320) + x2[1:]), # 2 cycles to read
-            waddr.eq((ims.o_y * 320) + ims.o_x),
-            read_pixel.eq(~vga_blank & x[1] & ~y[0]),
+            waddr.eq(fb.write_base + packer.addr),
+        ]
+
+        m.d.comb += [
+            packer.valid.eq(ims.ready),
+            packer.x.eq(ims.o_x),
+            packer.y.eq(ims.o_y),
+            packer.r.eq(ims.o_r),
+            packer.g.eq(ims.o_g),
+            packer.b.eq(ims.o_b)
+        ]
+
+        # Scale the 320x240 image to the display resolution
+        m.submodules.scaler = scaler = Scaler(self.timing, write_domain="sdram", fmt=self.fmt)
+
+        m.d.comb += [
+            scaler.x.eq(x),
+            scaler.y.eq(y),
+            scaler.bilinear.eq(self.bilinear)
+        ]
+
+        # Fetch camera lines into the scaler's line buffers with burst reads during blanking.
+        # Each line is read once, as far ahead as the line buffers allow.
+        # Line 0 onwards are fetched again from the start of vertical blanking.
+        fetch_line = Signal(9)                       # Camera line to fetch
+        fetch_addr = Signal(20)                      # SDRAM address of next burst
+        fetch_left = Signal(range(words // BURST + 1)) # Bursts left to read
+        fetch_idx  = Signal(9)                       # Next word of the line
+        read_line  = Signal()                        # Set when reads are requested
+        m_words    = Signal()                        # Read words that are for motion detection
+        g_words    = Signal()                        # Read words that are for the frame grabber
+        restart    = Signal()
+        old_vblank = Signal()
+
+        m.d.sdram += old_vblank.eq(vga.o_vga_vblank)
+
+        with m.If(vga.o_vga_vblank & ~old_vblank):
+            m.d.sdram += restart.eq(1)
+
+        with m.If(mem.ack & read_line):
+            m.d.sdram += [
+                fetch_addr.eq(fetch_addr + BURST),
+                fetch_left.eq(fetch_left - 1)
+            ]
+
+        with m.FSM(domain="sdram"):
+            with m.State("IDLE"):
+                with m.If(restart):
+                    m.d.sdram += [
+                        restart.eq(0),
+                        fetch_line.eq(0)
+                    ]
+                with m.Elif((fetch_line < 240) & (fetch_line <= scaler.line + 3)):
+                    m.d.sdram += [
+                        fetch_addr.eq(fb.read_base + fetch_line * words),
+                        fetch_left.eq(words // BURST),
+                        fetch_idx.eq(0)
+                    ]
+                    m.next = "FETCH"
+            with m.State("FETCH"):
+                with m.If(mem.data_valid & ~m_words & ~g_words):
+                    m.d.sdram += fetch_idx.eq(fetch_idx + 1)
+                    with m.If(fetch_idx == words - 1):
+                        m.d.sdram += fetch_line.eq(fetch_line + 1)
+                        m.next = "IDLE"
+
+        # Motion detection, against the last frame the camera finished.
+        # Its lines are read with bursts in the slots that the display and the camera leave free.
+        m.submodules.motion = motion = MotionDetect(burst=BURST, fetch_domain="sdram")
+
+        # Frame grabs to the uart, of the last frame the camera finished, with the reads
+        # that motion detection leaves
+        m.submodules.grab = grab = FrameGrabber(burst=BURST, fetch_domain="sdram")
+
+        write  = Signal()
+        m_read = Signal()
+        g_read = Signal()
+
+        m.d.comb += [
+            motion.valid.eq(ims.ready),
+            motion.x.eq(ims.o_x),
+            motion.y.eq(ims.o_y),
+            motion.r.eq(ims.o_r),
+            motion.g.eq(ims.o_g),
+            motion.b.eq(ims.o_b),
+            motion.thresh.eq(motion_thresh),
+            motion.frame_done.eq(ims.o_frame_done),
+            motion.prev_base.eq(fb.last_base),
+            grab.base.eq(fb.last_base),
+            write.eq(~div[2] & ~read_line & packer.we & fb.write_en), # Don't write when reading
+            m_read.eq(motion.req & ~read_line & ~write & (motion_thresh != 0) & C(self.fmt == RGB565)),
+            g_read.eq(grab.req & ~read_line & ~write & ~m_read & C(self.fmt == RGB565)),
+            # Show motion in the last frame, or edge detection when it is off
+            led_r.eq(Mux(motion_thresh != 0, motion.total[10:] != 0, edge))
+        ]
+
+        # The words of a burst arrive 6 to 9 sdram cycles after it is accepted, overlapping
+        # the next access, so keep who asked for each one
+        rd_hist = Signal(6)
+        m_hist  = Signal(6)
+        g_hist  = Signal(6)
+        m_owner = Signal()
+        g_owner = Signal()
+
+        m.d.sdram += [
+            rd_hist.eq(Cat(mem.ack & mem.req_read, rd_hist[:5])),
+            m_hist.eq(Cat(mem.ack & m_read, m_hist[:5])),
+            g_hist.eq(Cat(mem.ack & g_read, g_hist[:5]))
+        ]
+
+        with m.If(rd_hist[5]):
+            m.d.sdram += [
+                m_owner.eq(m_hist[5]),
+                g_owner.eq(g_hist[5])
+            ]
+
+        m.d.comb += [
+            m_words.eq(mem.data_valid & Mux(rd_hist[5], m_hist[5], m_owner)),
+            g_words.eq(mem.data_valid & Mux(rd_hist[5], g_hist[5], g_owner)),
+            motion.ack.eq(mem.ack & m_read),
+            motion.data_valid.eq(m_words),
+            motion.data.eq(mem.data_out),
+            grab.ack.eq(mem.ack & g_read),
+            grab.data_valid.eq(g_words),
+            grab.data.eq(mem.data_out)
+        ]
+
+        m.d.comb += [
+            read_line.eq(vga_blank & (fetch_left != 0)),
             mem.init.eq(~pll.locked), # Use pll not locked as signal to initialise SDRAM
             mem.sync.eq(~div[2]),      # Sync with 25MHz clock
-            mem.address.eq(Mux(read_pixel, raddr, waddr)),
-            mem.data_in.eq(Cat(ims.o_b, ims.o_g, ims.o_r)),
-            mem.req_read.eq(~div[2] & read_pixel), # Always read when pixel requested
-            mem.req_write.eq(~div[2] & ~read_pixel & ims.ready) # Don't write when reading
+            mem.address.eq(Mux(read_line, fetch_addr, Mux(m_read, motion.addr, Mux(g_read, grab.addr, waddr)))),
+            mem.data_in.eq(packer.data),
+            mem.req_read.eq(read_line | m_read | g_read),
+            mem.req_write.eq(write)
         ]
 
-        # Duplicate lines in line buffer
+        # Write bursts to the line buffers
         m.d.comb += [
-            w.addr.eq(xm2[1:]),         # 0 - 319, SDRAM data is 2 cycles late
-            r.addr.eq(x1[1:]),          # 1 cycle to read
-            w.data.eq(mem.data_out),    # Write data just read from SDRAM
-            w.en.eq(~vga_blank & ~y[0]) # Write if first of 2 vertical lines
+            scaler.w_slot.eq(fetch_line[:2]),
+            scaler.w_idx.eq(fetch_idx),
+            scaler.w_data.eq(mem.data_out),
+            scaler.w_en.eq(mem.data_valid & ~m_words & ~g_words)
         ]
 
         # Generate VGA signals
         m.d.comb += [
             vga.i_clk_en.eq(1),
             vga.i_test_picture.eq(0),
-            vga.i_r.eq(Cat(Const(0, unsigned(3)), Mux(y[0], r.data[11:], mem.data_out[11:]))), 
-            vga.i_g.eq(Cat(Const(0, unsigned(2)), Mux(y[0], r.data[5:11], mem.data_out[5:11]))), 
-            vga.i_b.eq(Cat(Const(0, unsigned(3)), Mux(y[0], r.data[0:5], mem.data_out[0:5]))), 
+            vga.i_r.eq(Cat(Const(0, unsigned(3)), scaler.o_r)),
+            vga.i_g.eq(Cat(Const(0, unsigned(2)), scaler.o_g)),
+            vga.i_b.eq(Cat(Const(0, unsigned(3)), scaler.o_b)),
             vga_r.eq(vga.o_vga_r),
             vga_g.eq(vga.o_vga_g),
             vga_b.eq(vga.o_vga_b),
@@ -359,6 +500,190 @@ class CamTest(Elaboratable):
         # OSD
         m.submodules.osd = osd = OSD()
 
+        # Text OSD and CLUT, written from the host over the uart (see osd_text.py)
+        m.submodules.tosd = tosd = TextOSD(text="OV7670 SDRAM")
+
+        uart = platform.request("uart")
+        divisor = int(platform.default_clk_frequency // self.baud)
+        m.submodules.serial = serial = AsyncSerial(divisor=divisor, pins=uart)
+
+        # Each write is 3 bytes: address high, address low and data.
+        # Addresses from 0x800 are the CLUT.
+        # 0x408 is the convolution kernel, after the text OSD registers,
+        # 0x409 turns on auto exposure (bit 0) and auto white balance (bit 1),
+        # 0x40A is the motion detection threshold, and 0x40B grabs frames to the uart
+        # (1 for one, 2 for continuous, 0 to stop; see frame_grab.py).
+        # 0x40C is a camera register address, 0x40D writes the camera register and sends
+        # the value back when it is done, so the host can wait for it before the next one,
+        # 0x40E reads that many camera registers (0 for 256) and sends them back,
+        # and 0x40F sends the camera config again. 0x410 turns on checking each camera
+        # register as it is configured, and 0x411 sends back the result. 0x600 to 0x7FF
+        # are the camera config, two bytes for each entry, low byte first (see cam_regs.py).
+        # 0x412 sends back a histogram of the last frame (0 y, 1 r, 2 g, 3 b), 3 bytes
+        # for each bin, low byte first. 0x413 sends back a blob of the last frame (0 to 3), as
+        # 3 bytes for each of: the number of blobs, the runs with no free slot, the largest blob,
+        # and the blob's active, area, min x, min y, max x, max y, centroid x and y.
+        # 0x414 sends back the moving pixels in each 32x32 tile of the last frame, 2 bytes
+        # for each, for 16 tiles across, of which 10 are used, and 8 down.
+        osd_addr = Signal(12)
+        cam_reg = Signal(8)
+        replay = Signal()
+        verify = Signal(reset=1)
+
+        # Results reads, an item at a time, each sent low byte first.
+        # Each source has a number of items, which are read with res_item, valid the cycle after,
+        # and a number of bytes for each item.
+        res_start = Signal()
+        res_req   = Signal(2) # Source asked for
+        res_src   = Signal(2)
+        res_sel   = Signal(2)
+        res_item  = Signal(7)
+        res_last  = Signal()
+        res_bytes = Signal(2)
+        res_data  = Signal(24)
+        res_word  = Signal(24)
+        res_byte  = Signal(2)
+        res_rdy   = Signal()
+        res_ack   = Signal()
+
+        blobs = ims.blobs
+        blob_fields = [blobs.count, blobs.overflows, blobs.largest, blobs.active, blobs.area,
+                       blobs.min_x, blobs.min_y, blobs.max_x, blobs.max_y, blobs.cx, blobs.cy]
+
+        # Items, bytes and data of each source
+        sources = [
+            (stats.bins, 3, stats.hist_data),
+            (len(blob_fields), 3, Array(blob_fields)[res_item]),
+            (2 ** len(motion.tile_sel), 2, motion.tile_count)
+        ]
+
+        m.d.comb += [
+            stats.hist_sel.eq(res_sel),
+            stats.hist_bin.eq(res_item),
+            blobs.sel.eq(res_sel),
+            motion.tile_sel.eq(res_item)
+        ]
+
+        with m.Switch(res_src):
+            for i, (items, nbytes, data) in enumerate(sources):
+                with m.Case(i):
+                    m.d.comb += [
+                        res_last.eq(res_item == items - 1),
+                        res_bytes.eq(nbytes - 1),
+                        res_data.eq(data)
+                    ]
+
+        with m.FSM():
+            with m.State("IDLE"):
+                with m.If(res_start):
+                    m.d.sync += [
+                        res_src.eq(res_req),
+                        res_sel.eq(serial.rx.data),
+                        res_item.eq(0)
+                    ]
+                    m.next = "READ"
+            with m.State("READ"):
+                m.next = "LOAD"
+            with m.State("LOAD"):
+                m.d.sync += [
+                    res_word.eq(res_data),
+                    res_byte.eq(0)
+                ]
+                m.next = "SEND"
+            with m.State("SEND"):
+                m.d.comb += res_rdy.eq(1)
+                with m.If(res_ack):
+                    m.d.sync += [
+                        res_word.eq(res_word[8:]),
+                        res_byte.eq(res_byte + 1)
+                    ]
+                    with m.If(res_byte == res_bytes):
+                        m.d.sync += res_item.eq(res_item + 1)
+                        with m.If(res_last):
+                            m.next = "IDLE"
+                        with m.Else():
+                            m.next = "READ"
+
+        # Camera register values and results go back when no frame is being grabbed
+        reply = Signal()
+        res_reply = Signal()
+
+        m.d.comb += [
+            camconfig.start.eq(btn1 | replay),
+            camconfig.verify.eq(verify),
+            reply.eq(camconfig.reg_rdy & ~grab.busy & ~grab.tx_ack),
+            res_reply.eq(res_rdy & ~reply & ~grab.busy & ~grab.tx_ack),
+            serial.rx.ack.eq(1),
+            serial.tx.data.eq(Mux(reply, camconfig.reg_rdata, Mux(res_reply, res_word[:8], grab.tx_data))),
+            serial.tx.ack.eq(reply | res_reply | grab.tx_ack),
+            grab.tx_rdy.eq(serial.tx.rdy & ~reply & ~res_reply),
+            camconfig.reg_ack.eq(reply & serial.tx.rdy),
+            res_ack.eq(res_reply & serial.tx.rdy),
+            camconfig.reg_addr.eq(cam_reg),
+            camconfig.reg_data.eq(serial.rx.data),
+            camconfig.reg_count.eq(serial.rx.data),
+            camconfig.cfg_addr.eq(osd_addr[:9]),
+            camconfig.cfg_data.eq(serial.rx.data),
+            tosd.addr.eq(osd_addr),
+            tosd.data.eq(serial.rx.data),
+            scaler.clut_addr.eq(osd_addr),
+            scaler.clut_data.eq(serial.rx.data)
+        ]
+
+        with m.FSM():
+            with m.State("ADDR_HI"):
+                with m.If(serial.rx.rdy):
+                    m.d.sync += osd_addr[8:].eq(serial.rx.data)
+                    m.next = "ADDR_LO"
+            with m.State("ADDR_LO"):
+                with m.If(serial.rx.rdy):
+                    m.d.sync += osd_addr[:8].eq(serial.rx.data)
+                    m.next = "DATA"
+            with m.State("DATA"):
+                with m.If(serial.rx.rdy):
+                    m.d.comb += [
+                        tosd.we.eq(osd_addr < 0x408),
+                        scaler.clut_we.eq(osd_addr[11]),
+                        camconfig.cfg_we.eq(osd_addr[9:] == 0b011)
+                    ]
+                    with m.If(osd_addr == 0x408):
+                        m.d.sync += kernel.eq(serial.rx.data)
+                    with m.If(osd_addr == 0x409):
+                        m.d.sync += auto.eq(serial.rx.data)
+                    with m.If(osd_addr == 0x40A):
+                        m.d.sync += motion_thresh.eq(serial.rx.data)
+                    with m.If(osd_addr == 0x40B):
+                        m.d.comb += grab.start.eq(serial.rx.data == 1)
+                        m.d.sync += grab.continuous.eq(serial.rx.data == 2)
+                    with m.If(osd_addr == 0x40C):
+                        m.d.sync += cam_reg.eq(serial.rx.data)
+                    with m.If(osd_addr == 0x40D):
+                        m.d.comb += camconfig.reg_write.eq(1)
+                    with m.If(osd_addr == 0x40E):
+                        m.d.comb += camconfig.reg_read.eq(1)
+                    with m.If(osd_addr == 0x40F):
+                        m.d.comb += replay.eq(1)
+                    with m.If(osd_addr == 0x410):
+                        m.d.sync += verify.eq(serial.rx.data[0])
+                    with m.If(osd_addr == 0x411):
+                        m.d.comb += camconfig.status_read.eq(1)
+                    with m.If(osd_addr == 0x412):
+                        m.d.comb += [
+                            res_start.eq(1),
+                            res_req.eq(0)
+                        ]
+                    with m.If(osd_addr == 0x413):
+                        m.d.comb += [
+                            res_start.eq(1),
+                            res_req.eq(1)
+                        ]
+                    with m.If(osd_addr == 0x414):
+                        m.d.comb += [
+                            res_start.eq(1),
+                            res_req.eq(2)
+                        ]
+                    m.next = "ADDR_HI"
+
         with m.If(debosd.btn_down):
             m.d.sync += [
                 osd_on.eq(~osd_on),
@@ -378,9 +703,15 @@ class CamTest(Elaboratable):
             osd.osd_val.eq(osd_val),
             osd.sel.eq(osd_sel),
 
-            vga_out.red.eq(osd.o_r),
-            vga_out.green.eq(osd.o_g),
-            vga_out.blue.eq(osd.o_b),
+            tosd.x.eq(x),
+            tosd.y.eq(y),
+            tosd.i_r.eq(osd.o_r),
+            tosd.i_g.eq(osd.o_g),
+            tosd.i_b.eq(osd.o_b),
+
+            vga_out.red.eq(tosd.o_r),
+            vga_out.green.eq(tosd.o_g),
+            vga_out.blue.eq(tosd.o_b),
             vga_out.hs.eq(vga_hsync),
             vga_out.vs.eq(vga_vsync)
         ]
@@ -0,0 +1,118 @@
+from nmigen import *
+
+# Kernels
+CONV_OFF = 0
+SOBEL_X  = 1 # [-1 0 1; -2 0 2; -1 0 1], as grey
+SOBEL_Y  = 2 # [-1 -2 -1; 0 0 0; 1 2 1], as grey
+SOBEL    = 3 # |X| + |Y|, as grey
+GAUSSIAN = 4 # [1 2 1; 2 4 2; 1 2 1] / 16
+SHARPEN  = 5 # [0 -1 0; -1 5 -1; 0 -1 0]
+BOX      = 6 # All ones / 9
+
+# 3x3 window over a stream of RGB565 pixels.
+#
+# Each shift moves in a column of three pixels, top, mid and bot, from the line buffers.
+# The output is for the middle of the window, and only uses shifts and adds, so a
+# new column can be shifted in every clock.
+# Sobel kernels work on the sum of the colors and give a grey output;
+# the others are applied to each color.
+# With bypass set, the output is the middle pixel, for the edges of the image.
+class Conv3x3(Elaboratable):
+    def __init__(self):
+        # inputs
+        self.shift  = Signal()
+        self.top    = Signal(16)
+        self.mid    = Signal(16)
+        self.bot    = Signal(16)
+        self.kernel = Signal(3)
+        self.bypass = Signal()
+
+        # outputs
+        self.o_r    = Signal(5)
+        self.o_g    = Signal(6)
+        self.o_b    = Signal(5)
+
+    def elaborate(self, platform):
+        m = Module()
+
+        # Window of pixels, w[row][col], col 2 being the newest
+        w = [[Signal(16) for c in range(3)] for r in range(3)]
+        # Sums of colors, for the Sobel kernels
+        l = [[Signal(7) for c in range(3)] for r in range(3)]
+
+        column = [self.top, self.mid, self.bot]
+
+        with m.If(self.shift):
+            for r in range(3):
+                p = column[r]
+                m.d.sync += [
+                    w[r][0].eq(w[r][1]),
+                    w[r][1].eq(w[r][2]),
+                    w[r][2].eq(p),
+                    l[r][0].eq(l[r][1]),
+                    l[r][1].eq(l[r][2]),
+                    l[r][2].eq(p[:5] + p[5:11] + p[11:])
+                ]
+
+        # Sobel on the sums, with magnitude scaled to 5 bits
+        gx  = Signal(signed(11))
+        gy  = Signal(signed(11))
+        ax  = Signal(10)
+        ay  = Signal(10)
+        mag = Signal(11)
+        v   = Signal(5)
+
+        m.d.comb += [
+            gx.eq((l[0][2] + (l[1][2] << 1) + l[2][2]) - (l[0][0] + (l[1][0] << 1) + l[2][0])),
+            gy.eq((l[2][0] + (l[2][1] << 1) + l[2][2]) - (l[0][0] + (l[0][1] << 1) + l[0][2])),
+            ax.eq(Mux(gx < 0, -gx, gx)),
+            ay.eq(Mux(gy < 0, -gy, gy))
+        ]
+
+        with m.Switch(self.kernel):
+            with m.Case(SOBEL_X):
+                m.d.comb += mag.eq(ax)
+            with m.Case(SOBEL_Y):
+                m.d.comb += mag.eq(ay)
+            with m.Default():
+                m.d.comb += mag.eq(ax + ay)
+
+        m.d.comb += v.eq(Mux(mag[9:].any(), 0x1f, mag[4:9]))
+
+        # Color kernels, on one color at a time
+        def gaussian(p):
+            corners = p[0][0] + p[0][2] + p[2][0] + p[2][2]
+            sides   = p[0][1] + p[1][0] + p[1][2] + p[2][1]
+            return (corners + (sides << 1) + (p[1][1] << 2)) >> 4
+
+        def box(p, bits):
+            s = sum(p[r][c] for r in range(3) for c in range(3))
+            # s * 57 / 512 is close enough to s / 9
+            return ((s << 6) + s - (s << 3))[9:9 + bits]
+
+        def sharpen(p, bits, name):
+            t = Signal(signed(bits + 4), name=name)
+            m.d.comb += t.eq((p[1][1] << 2) + p[1][1] - (p[0][1] + p[1][0] + p[1][2] + p[2][1]))
+            return Mux(t < 0, 0, Mux(t > (1 << bits) - 1, (1 << bits) - 1, t))
+
+        colors = [("b", 0, 5), ("g", 5, 6), ("r", 11, 5)]
+        outs   = [self.o_b, self.o_g, self.o_r]
+
+        for (name, lo, bits), o in zip(colors, outs):
+            p = [[w[r][c][lo:lo + bits] for c in range(3)] for r in range(3)]
+            with m.If(self.bypass):
+                m.d.comb += o.eq(p[1][1])
+            with m.Else():
+                with m.Switch(self.kernel):
+                    with m.Case(SOBEL_X, SOBEL_Y, SOBEL):
+                        m.d.comb += o.eq(Cat(v[4], v) if bits == 6 else v)
+                    with m.Case(GAUSSIAN):
+                        m.d.comb += o.eq(gaussian(p))
+                    with m.Case(SHARPEN):
+                        m.d.comb += o.eq(sharpen(p, bits, "sharp_" + name))
+                    with m.Case(BOX):
+                        m.d.comb += o.eq(box(p, bits))
+                    with m.Default():
+                        m.d.comb += o.eq(p[1][1])
+
+        return m
@@ -0,0 +1,113 @@
+from nmigen import *
+
+# Manages 2 or 3 frame buffers in SDRAM, so that the camera and the display
+# never use the same frame and the picture does not tear.
+#
+# The camera writes to the write slot. When it finishes a frame, that frame becomes
+# pending and is shown from the next vertical blanking period.
+# With 3 slots the camera moves straight on to the free slot, and if it finishes another
+# frame before the display has taken the pending one, the pending one is dropped.
+# With 2 slots the camera has to wait for the swap, and the frame it was sending
+# while it waited is dropped.
+# If there is no new frame at vertical blanking, the current frame is repeated.
+# The last frame the camera finished stays in its slot until the next one is finished.
+class FrameBuffers(Elaboratable):
+    def __init__(self, slots=3, frame_words=320*240, addr_bits=20):
+        assert slots in (2, 3)
+        assert slots * frame_words <= 2**addr_bits
+
+        # parameters
+        self.slots       = slots
+        self.frame_words = frame_words
+
+        # inputs
+        self.frame_done = Signal() # From the camera
+        self.vblank     = Signal() # From the display
+
+        # outputs
+        self.write_base = Signal(addr_bits)
+        self.read_base  = Signal(addr_bits)
+        self.last_base  = Signal(addr_bits) # Last frame the camera finished
+        self.write_en   = Signal()
+        self.drops      = Signal(16)
+        self.repeats    = Signal(16)
+
+    def elaborate(self, platform):
+        m = Module()
+
+        bases = Array([C(i * self.frame_words, len(self.write_base)) for i in range(self.slots)])
+
+        w_slot       = Signal(2, reset=0)
+        r_slot       = Signal(2, reset=1)
+        p_slot       = Signal(2)
+        pending      = Signal()
+        r_next       = Signal(2)
+        pending_next = Signal()
+        old_done     = Signal()
+        old_vblank   = Signal()
+        done         = Signal()
+        swap         = Signal()
+
+        m.d.sync += [
+            old_done.eq(self.frame_done),
+            old_vblank.eq(self.vblank)
+        ]
+
+        m.d.comb += [
+            done.eq(self.frame_done & ~old_done),
+            swap.eq(self.vblank & ~old_vblank),
+            self.write_base.eq(bases[w_slot]),
+            self.read_base.eq(bases[r_slot]),
+            self.last_base.eq(bases[p_slot]),
+            # Pending frame and read slot after any swap in this cycle
+            r_next.eq(Mux(swap & pending, p_slot, r_slot)),
+            pending_next.eq(pending & ~swap)
+        ]
+
+        with m.If(swap & ~pending):
+            m.d.sync += self.repeats.eq(self.repeats + 1)
+
+        if self.slots == 3:
+            m.d.comb += self.write_en.eq(1)
+
+            m.d.sync += [
+                r_slot.eq(r_next),
+                pending.eq(pending_next)
+            ]
+
+            with m.If(done):
+                m.d.sync += [
+                    p_slot.eq(w_slot),
+                    pending.eq(1),
+                    # Move to the slot that is neither being read nor just written
+                    w_slot.eq(3 - r_next - w_slot)
+                ]
+                with m.If(pending_next):
+                    m.d.sync += self.drops.eq(self.drops + 1)
+        else:
+            hold = Signal()
+
+            m.d.comb += self.write_en.eq(~hold)
+
+            m.d.sync += pending.eq(pending_next)
+
+            with m.If(swap & pending):
+                m.d.sync += [
+                    r_slot.eq(w_slot),
+                    w_slot.eq(r_slot)
+                ]
+
+            with m.If(done):
+                with m.If(~hold):
+                    m.d.sync += [
+                        p_slot.eq(w_slot),
+                        pending.eq(1),
+                        hold.eq(1)
+                    ]
+                with m.Else():
+                    # Only start writing again at the start of a frame
+                    m.d.sync += self.drops.eq(self.drops + 1)
+                    with m.If(~pending_next):
+                        m.d.sync += hold.eq(0)
+
+        return m
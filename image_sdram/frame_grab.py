@@ -0,0 +1,126 @@
+import argparse
+import struct
+import zlib
+import serial
+
+from osd_text import write
+
+# Grabs frames from camtest.py over the uart, and writes them as PNG files.
+#
+# The frames are sent by frame_grabber.py as a SLIP packet for each line: the line number,
+# with the top bit set for the first line of a frame, and then tokens that code the pixels
+# against the line before and the pixel on the left.
+
+RES_X = 320
+RES_Y = 240
+
+SLIP_END     = 0xC0
+SLIP_ESC     = 0xDB
+SLIP_ESC_END = 0xDC
+SLIP_ESC_ESC = 0xDD
+
+# Reads SLIP packets
+def packets(ser):
+    packet = bytearray()
+    esc = False
+    while True:
+        data = ser.read(ser.in_waiting or 1)
+        for c in data:
+            if c == SLIP_END:
+                if packet:
+                    yield bytes(packet)
+                packet = bytearray()
+            elif esc:
+                packet.append(SLIP_END if c == SLIP_ESC_END else SLIP_ESC)
+                esc = False
+            elif c == SLIP_ESC:
+                esc = True
+            else:
+                packet.append(c)
+
+# Decodes the tokens of a line, or returns None if they are bad
+def decode_line(tokens, above):
+    line = []
+    i = 0
+    try:
+        while i < len(tokens):
+            t = tokens[i]
+            i += 1
+            x = len(line)
+            if t < 0x40:
+                line.extend(above[x:x + t + 1])
+            elif t < 0x7F:
+                line.extend([line[-1]] * (t - 0x40 + 1))
+            elif t == 0x7F:
+                line.append((tokens[i] << 8) | tokens[i + 1])
+                i += 2
+            else:
+                a = above[x]
+                r = (a >> 11) + ((t >> 5) & 3) - 2
+                g = ((a >> 5) & 0x3F) + ((t >> 2) & 7) - 4
+                b = (a & 0x1F) + (t & 3) - 2
+                line.append((r << 11) | (g << 5) | b)
+    except IndexError:
+        return None
+    return line if len(line) == RES_X else None
+
+def write_png(name, lines):
+    raw = b"".join(b"\x00" + bytes(c for p in line for c in
+                   (((p >> 11) << 3) | (p >> 13), (((p >> 5) & 0x3F) << 2) | ((p >> 9) & 3), ((p & 0x1F) << 3) | ((p >> 2) & 7)))
+                   for line in lines)
+
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    with open(name, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        f.write(chunk(b"IHDR", struct.pack(">IIBBBBB", RES_X, len(lines), 8, 2, 0, 0, 0)))
+        f.write(chunk(b"IDAT", zlib.compress(raw)))
+        f.write(chunk(b"IEND", b""))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("port", help="Serial port, e.g. /dev/ttyACM0")
+    parser.add_argument("--baud", type=int, default=1000000)
+    parser.add_argument("--frames", type=int, default=1, help="Frames to grab, 0 to keep going")
+    parser.add_argument("--prefix", default="grab", help="Start of the file names")
+    args = parser.parse_args()
+
+    ser = serial.Serial(args.port, args.baud)
+    write(ser, 0x40B, 1 if args.frames == 1 else 2)
+
+    frame = None
+    above = [0] * RES_X
+    count = 0
+    received = 0
+
+    try:
+        for packet in packets(ser):
+            received += len(packet) + 1
+            if len(packet) < 2:
+                continue
+            y = ((packet[0] & 3) << 8) | packet[1]
+            if packet[0] & 0x80:
+                frame = []
+                above = [0] * RES_X
+            if frame is None or y != len(frame):
+                # Lost a line, so wait for the next frame
+                frame = None
+                continue
+            line = decode_line(packet[2:], above)
+            if line is None:
+                frame = None
+                continue
+            frame.append(line)
+            above = line
+            if len(frame) == RES_Y:
+                name = "{}{:04d}.png".format(args.prefix, count)
+                write_png(name, frame)
+                print("Wrote {}, {:.1f}x compression".format(name, RES_X * RES_Y * 2 / received))
+                count += 1
+                received = 0
+                frame = None
+                if count == args.frames:
+                    break
+    finally:
+        write(ser, 0x40B, 0)
@@ -0,0 +1,280 @@
+from nmigen import *
+from nmigen.lib.fifo import SyncFIFOBuffered
+
+# Token bytes of the compressed lines
+RUN_ABOVE = 0x00 # + n - 1: n pixels the same as the ones above, up to 64
+RUN_LEFT  = 0x40 # + n - 1: n pixels the same as the one on the left, up to 63
+RAW       = 0x7F # Followed by the pixel, high byte first
+DELTA     = 0x80 # + (dr + 2) << 5 + (dg + 4) << 2 + (db + 2): the pixel above, changed a little
+
+# SLIP framing
+SLIP_END     = 0xC0
+SLIP_ESC     = 0xDB
+SLIP_ESC_END = 0xDC
+SLIP_ESC_ESC = 0xDD
+
+# Sends RGB565 frames from SDRAM to a uart, compressed line by line.
+#
+# Each line is read with burst reads into block RAM, next to the line before it, and sent as
+# a SLIP packet: two bytes with the line number, the top bit set for the first line of a frame,
+# then the tokens for the pixels. Runs and deltas are against the line before, which is black for
+# the first line. See frame_grab.py for the decoder.
+#
+# start sends the frame at base, and with continuous set, frames are sent until it is cleared.
+# Reads are done in fetch_domain, as for MotionDetect. The lines are read while they are sent,
+# so if the camera finishes frames during that, the lines can come from different frames.
+class FrameGrabber(Elaboratable):
+    def __init__(self, res_x=320, res_y=240, burst=4, fetch_domain="sync"):
+        assert res_x % burst == 0
+
+        # parameters
+        self.res_x        = res_x
+        self.res_y        = res_y
+        self.burst        = burst
+        self.fetch_domain = fetch_domain
+
+        # inputs
+        self.start        = Signal()
+        self.continuous   = Signal()
+        self.base         = Signal(20)
+        self.ack          = Signal()
+        self.data_valid   = Signal()
+        self.data         = Signal(16)
+        self.tx_rdy       = Signal()
+
+        # outputs
+        self.req          = Signal()
+        self.addr         = Signal(20)
+        self.tx_data      = Signal(8)
+        self.tx_ack       = Signal()
+        self.busy         = Signal()
+        self.frames       = Signal(16)
+
+    def elaborate(self, platform):
+        m = Module()
+
+        fetch = m.d[self.fetch_domain]
+        res_x = self.res_x
+
+        # This line and the one before it
+        buffer = Memory(width=16, depth=2 * res_x)
+        m.submodules.rc = rc = buffer.read_port(transparent=False)
+        m.submodules.ra = ra = buffer.read_port(transparent=False)
+        m.submodules.w = w = buffer.write_port(domain=self.fetch_domain)
+
+        y      = Signal(10)
+        x      = Signal(10)
+        frame  = Signal()
+        base   = Signal(20)
+        want   = Signal()
+        tag    = Signal(11)
+        loaded = Signal()
+
+        # Burst reads of line y
+        f_y     = Signal(10)
+        f_frame = Signal()
+        f_left  = Signal(range(res_x // self.burst + 1))
+        f_idx   = Signal(range(res_x))
+
+        m.d.comb += [
+            self.req.eq(f_left != 0),
+            w.addr.eq(f_y[0] * res_x + f_idx),
+            w.data.eq(self.data)
+        ]
+
+        with m.If(self.ack):
+            fetch += [
+                self.addr.eq(self.addr + self.burst),
+                f_left.eq(f_left - 1)
+            ]
+
+        with m.FSM(domain=self.fetch_domain):
+            with m.State("IDLE"):
+                with m.If(want & ~(loaded & (tag == Cat(y, frame)))):
+                    fetch += [
+                        f_y.eq(y),
+                        f_frame.eq(frame),
+                        f_left.eq(res_x // self.burst),
+                        f_idx.eq(0),
+                        self.addr.eq(base + y * res_x),
+                        loaded.eq(0)
+                    ]
+                    m.next = "FETCH"
+            with m.State("FETCH"):
+                with m.If(self.data_valid):
+                    m.d.comb += w.en.eq(1)
+                    fetch += f_idx.eq(f_idx + 1)
+                    with m.If(f_idx == res_x - 1):
+                        fetch += [
+                            tag.eq(Cat(f_y, f_frame)),
+                            loaded.eq(1)
+                        ]
+                        m.next = "IDLE"
+
+        # Bytes to send, with bit 8 set for the end of a packet
+        m.submodules.fifo = fifo = SyncFIFOBuffered(width=9, depth=16)
+
+        # The pixel, the one above it and the one on its left
+        p = Signal(16)
+        a = Signal(16)
+        l = Signal(16)
+
+        m.d.comb += [
+            rc.addr.eq(y[0] * res_x + x),
+            ra.addr.eq(~y[0] * res_x + x),
+            p.eq(rc.data),
+            a.eq(Mux(y == 0, 0, ra.data))
+        ]
+
+        # Differences from the pixel above
+        dr    = Signal(signed(6))
+        dg    = Signal(signed(7))
+        db    = Signal(signed(6))
+        small = Signal()
+        delta = Signal(8)
+
+        m.d.comb += [
+            dr.eq(p[11:16] - a[11:16]),
+            dg.eq(p[5:11] - a[5:11]),
+            db.eq(p[0:5] - a[0:5]),
+            small.eq((dr >= -2) & (dr <= 1) & (dg >= -4) & (dg <= 3) & (db >= -2) & (db <= 1)),
+            delta.eq(Cat((db + 2)[:2], (dg + 4)[:3], (dr + 2)[:2], C(1, 1)))
+        ]
+
+        # The current run
+        run_left = Signal()
+        run      = Signal(7)
+        same_a   = Signal()
+        same_l   = Signal()
+        flush    = Signal()
+
+        m.d.comb += [
+            same_a.eq(p == a),
+            same_l.eq((p == l) & (x != 0)),
+            # The run ends before this pixel
+            flush.eq((run != 0) & Mux(run_left, ~same_l | (run == 63), ~same_a | (run == 64)))
+        ]
+
+        def emit(data, end=0):
+            m.d.comb += [
+                fifo.w_data[:8].eq(data),
+                fifo.w_data[8].eq(end),
+                fifo.w_en.eq(1)
+            ]
+
+        run_token = Mux(run_left, RUN_LEFT, RUN_ABOVE) + run - 1
+
+        m.d.comb += self.busy.eq(want)
+
+        with m.FSM():
+            with m.State("IDLE"):
+                with m.If(self.start | self.continuous):
+                    m.d.sync += [
+                        base.eq(self.base),
+                        frame.eq(~frame),
+                        y.eq(0),
+                        want.eq(1)
+                    ]
+                    m.next = "WAIT"
+            with m.State("WAIT"):
+                m.d.sync += [
+                    x.eq(0),
+                    run.eq(0)
+                ]
+                with m.If(loaded & (tag == Cat(y, frame))):
+                    m.next = "HEADER_HI"
+            with m.State("HEADER_HI"):
+                emit(Cat(y[8:10], C(0, 5), y == 0))
+                with m.If(fifo.w_rdy):
+                    m.next = "HEADER_LO"
+            with m.State("HEADER_LO"):
+                emit(y[:8])
+                with m.If(fifo.w_rdy):
+                    m.next = "READ"
+            with m.State("READ"):
+                # The pixels are read from block RAM
+                m.next = "PIXEL"
+            with m.State("PIXEL"):
+                with m.If(flush):
+                    emit(run_token)
+                    with m.If(fifo.w_rdy):
+                        m.d.sync += run.eq(0)
+                with m.Elif(same_a | same_l):
+                    # Start a run, preferring the line above, or carry on with this one
+                    with m.If(run == 0):
+                        m.d.sync += run_left.eq(~same_a)
+                    m.d.sync += run.eq(run + 1)
+                    m.next = "NEXT"
+                with m.Elif(small):
+                    emit(delta)
+                    with m.If(fifo.w_rdy):
+                        m.next = "NEXT"
+                with m.Else():
+                    emit(RAW)
+                    with m.If(fifo.w_rdy):
+                        m.next = "RAW_HI"
+            with m.State("RAW_HI"):
+                emit(p[8:])
+                with m.If(fifo.w_rdy):
+                    m.next = "RAW_LO"
+            with m.State("RAW_LO"):
+                emit(p[:8])
+                with m.If(fifo.w_rdy):
+                    m.next = "NEXT"
+            with m.State("NEXT"):
+                m.d.sync += [
+                    l.eq(p),
+                    x.eq(x + 1)
+                ]
+                with m.If(x == res_x - 1):
+                    m.next = "FLUSH"
+                with m.Else():
+                    m.next = "READ"
+            with m.State("FLUSH"):
+                with m.If(run != 0):
+                    emit(run_token)
+                    with m.If(fifo.w_rdy):
+                        m.d.sync += run.eq(0)
+                with m.Else():
+                    emit(0, end=1)
+                    with m.If(fifo.w_rdy):
+                        with m.If(y == self.res_y - 1):
+                            m.d.sync += [
+                                want.eq(0),
+                                self.frames.eq(self.frames + 1)
+                            ]
+                            m.next = "IDLE"
+                        with m.Else():
+                            m.d.sync += y.eq(y + 1)
+                            m.next = "WAIT"
+
+        m.d.comb += [
+            rc.en.eq(1),
+            ra.en.eq(1)
+        ]
+
+        # SLIP framing to the uart
+        esc = Signal()
+
+        m.d.comb += [
+            fifo.r_en.eq(0),
+            self.tx_ack.eq(fifo.r_rdy)
+        ]
+
+        with m.If(fifo.r_data[8]):
+            m.d.comb += self.tx_data.eq(SLIP_END)
+        with m.Elif(esc):
+            m.d.comb += self.tx_data.eq(Mux(fifo.r_data[:8] == SLIP_END, SLIP_ESC_END, SLIP_ESC_ESC))
+        with m.Elif((fifo.r_data[:8] == SLIP_END) | (fifo.r_data[:8] == SLIP_ESC)):
+            m.d.comb += self.tx_data.eq(SLIP_ESC)
+        with m.Else():
+            m.d.comb += self.tx_data.eq(fifo.r_data[:8])
+
+        with m.If(fifo.r_rdy & self.tx_rdy):
+            with m.If(~fifo.r_data[8] & ~esc & ((fifo.r_data[:8] == SLIP_END) | (fifo.r_data[:8] == SLIP_ESC))):
+                m.d.sync += esc.eq(1)
+            with m.Else():
+                m.d.sync += esc.eq(0)
+                m.d.comb += fifo.r_en.eq(1)
+
+        return m
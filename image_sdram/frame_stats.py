@@ -0,0 +1,255 @@
+from nmigen import *
+
+# Per-frame statistics of a pixel stream.
+#
+# Histograms of the sum of the colors (y) and of r, g and b are built in block RAM,
+# with 32 or 64 bins. The mean, min and max of each are also kept.
+# There are two banks of histograms: at frame_done the banks are swapped, the new
+# one is cleared, and the means are worked out with a serial divider, during vertical blanking.
+# updated is set for a cycle when the results for the last frame are ready.
+#
+# The histograms of the last frame are read with hist_sel (0 y, 1 r, 2 g, 3 b)
+# and hist_bin, with hist_data valid the next cycle.
+class FrameStats(Elaboratable):
+    def __init__(self, bins=32, hist_width=20):
+        assert bins in (32, 64)
+
+        # parameters
+        self.bins       = bins
+        self.hist_width = hist_width
+        self.bin_bits   = (bins - 1).bit_length()
+
+        # inputs
+        self.valid      = Signal()
+        self.r          = Signal(5)
+        self.g          = Signal(6)
+        self.b          = Signal(5)
+        self.frame_done = Signal()
+        self.hist_sel   = Signal(2)
+        self.hist_bin   = Signal(self.bin_bits)
+
+        # outputs
+        self.hist_data  = Signal(hist_width)
+        self.updated    = Signal()
+        self.mean_y     = Signal(8)
+        self.mean_r     = Signal(8)
+        self.mean_g     = Signal(8)
+        self.mean_b     = Signal(8)
+        self.min_y      = Signal(7)
+        self.max_y      = Signal(7)
+        self.min_r      = Signal(5)
+        self.max_r      = Signal(5)
+        self.min_g      = Signal(6)
+        self.max_g      = Signal(6)
+        self.min_b      = Signal(5)
+        self.max_b      = Signal(5)
+
+    def elaborate(self, platform):
+        m = Module()
+
+        bb = self.bin_bits
+
+        y = Signal(7)
+        m.d.comb += y.eq(self.r + self.g + self.b)
+
+        values = [y, self.r, self.g, self.b]
+
+        # Bin for a value, scaling it to the number of bins
+        def bin_of(v):
+            if len(v) >= bb:
+                return v[len(v) - bb:]
+            else:
+                return v << (bb - len(v))
+
+        old_done = Signal()
+        done     = Signal()
+        bank     = Signal()
+        clearing = Signal()
+        clr      = Signal(bb)
+
+        m.d.sync += old_done.eq(self.frame_done)
+        m.d.comb += done.eq(self.frame_done & ~old_done)
+
+        with m.If(done):
+            m.d.sync += [
+                bank.eq(~bank),
+                clearing.eq(1),
+                clr.eq(0)
+            ]
+        with m.Elif(clearing):
+            m.d.sync += clr.eq(clr + 1)
+            with m.If(clr == self.bins - 1):
+                m.d.sync += clearing.eq(0)
+
+        # Histograms, incremented the cycle after the read.
+        # The read ports are transparent, so a pixel in the same bin as the last one sees its write.
+        hist_reads = []
+        v1 = Signal()
+        m.d.sync += v1.eq(self.valid & ~clearing)
+
+        for i, v in enumerate(values):
+            mem = Memory(width=self.hist_width, depth=2 * self.bins)
+            m.submodules["hr" + str(i)] = hr = mem.read_port()
+            m.submodules["hw" + str(i)] = hw = mem.write_port()
+            m.submodules["ho" + str(i)] = ho = mem.read_port()
+
+            b1 = Signal(bb, name="bin" + str(i))
+            m.d.sync += b1.eq(bin_of(v))
+
+            m.d.comb += [
+                hr.addr.eq(Cat(bin_of(v), bank)),
+                ho.addr.eq(Cat(self.hist_bin, ~bank))
+            ]
+
+            with m.If(clearing):
+                m.d.comb += [
+                    hw.addr.eq(Cat(clr, bank)),
+                    hw.data.eq(0),
+                    hw.en.eq(1)
+                ]
+            with m.Else():
+                m.d.comb += [
+                    hw.addr.eq(Cat(b1, bank)),
+                    hw.data.eq(hr.data + 1),
+                    hw.en.eq(v1)
+                ]
+
+            hist_reads.append(ho.data)
+
+        m.d.comb += self.hist_data.eq(Array(hist_reads)[self.hist_sel])
+
+        # Sums, min and max for this frame
+        count = Signal(20)
+        sums  = [Signal(28, name="sum" + str(i)) for i in range(4)]
+        mins  = [Signal(len(v), name="min" + str(i)) for i, v in enumerate(values)]
+        maxs  = [Signal(len(v), name="max" + str(i)) for i, v in enumerate(values)]
+        outs_min = [self.min_y, self.min_r, self.min_g, self.min_b]
+        outs_max = [self.max_y, self.max_r, self.max_g, self.max_b]
+
+        with m.If(done):
+            m.d.sync += count.eq(0)
+            for i, v in enumerate(values):
+                m.d.sync += [
+                    sums[i].eq(0),
+                    mins[i].eq(2**len(v) - 1),
+                    maxs[i].eq(0),
+                    outs_min[i].eq(mins[i]),
+                    outs_max[i].eq(maxs[i])
+                ]
+        with m.Elif(self.valid):
+            m.d.sync += count.eq(count + 1)
+            for i, v in enumerate(values):
+                m.d.sync += sums[i].eq(sums[i] + v)
+                with m.If(v < mins[i]):
+                    m.d.sync += mins[i].eq(v)
+                with m.If(v > maxs[i]):
+                    m.d.sync += maxs[i].eq(v)
+
+        # Means, by restoring division of each sum by the count, one quotient bit a cycle
+        l_sums  = Array(Signal(28, name="l_sum" + str(i)) for i in range(4))
+        l_count = Signal(20)
+        means   = Array([self.mean_y, self.mean_r, self.mean_g, self.mean_b])
+        ch      = Signal(2)
+        k       = Signal(3)
+        rem     = Signal(28)
+        div     = Signal(28)
+        q       = Signal(8)
+
+        m.d.sync += self.updated.eq(0)
+
+        with m.FSM():
+            with m.State("IDLE"):
+                with m.If(done):
+                    m.d.sync += [l_sums[i].eq(sums[i]) for i in range(4)]
+                    m.d.sync += [
+                        l_count.eq(count),
+                        rem.eq(sums[0]),
+                        div.eq(count << 7),
+                        ch.eq(0),
+                        k.eq(7),
+                        q.eq(0)
+                    ]
+                    m.next = "DIVIDE"
+            with m.State("DIVIDE"):
+                with m.If((rem >= div) & (l_count != 0)):
+                    m.d.sync += [
+                        rem.eq(rem - div),
+                        q.eq(Cat(C(1, 1), q))
+                    ]
+                with m.Else():
+                    m.d.sync += q.eq(Cat(C(0, 1), q))
+                m.d.sync += [
+                    div.eq(div >> 1),
+                    k.eq(k - 1)
+                ]
+                with m.If(k == 0):
+                    m.next = "NEXT"
+            with m.State("NEXT"):
+                m.d.sync += [
+                    means[ch].eq(q),
+                    ch.eq(ch + 1),
+                    rem.eq(l_sums[(ch + 1)[:2]]),
+                    div.eq(l_count << 7),
+                    k.eq(7),
+                    q.eq(0)
+                ]
+                with m.If(ch == 3):
+                    m.d.sync += self.updated.eq(1)
+                    m.next = "IDLE"
+                with m.Else():
+                    m.next = "DIVIDE"
+
+        return m
+
+# Auto exposure and auto white balance, from the frame statistics.
+#
+# After each frame, the brightness offset is moved a step towards making mean_y
+# equal to target, and, for white balance, the red and blue offsets are moved towards
+# making the means of the colors equal (green having an extra bit).
+# hyst is the error that is left alone.
+class AutoExposure(Elaboratable):
+    def __init__(self, target=60, hyst=4, limit=31):
+        # parameters
+        self.target     = target
+        self.hyst       = hyst
+        self.limit      = limit
+
+        # inputs
+        self.updated    = Signal()
+        self.mean_y     = Signal(8)
+        self.mean_r     = Signal(8)
+        self.mean_g     = Signal(8)
+        self.mean_b     = Signal(8)
+        self.ae         = Signal()
+        self.awb        = Signal()
+
+        # outputs
+        self.brightness = Signal(signed(7))
+        self.redness    = Signal(signed(7))
+        self.greenness  = Signal(signed(7))
+        self.blueness   = Signal(signed(7))
+
+    def elaborate(self, platform):
+        m = Module()
+
+        # Step towards the target, within the limit
+        def step(val, low, high):
+            with m.If(low & (val < self.limit)):
+                m.d.sync += val.eq(val + 1)
+            with m.Elif(high & (val > -self.limit)):
+                m.d.sync += val.eq(val - 1)
+
+        with m.If(self.updated):
+            with m.If(self.ae):
+                step(self.brightness,
+                     self.mean_y + self.hyst < self.target,
+                     self.mean_y > self.target + self.hyst)
+            with m.If(self.awb):
+                step(self.redness,
+                     (self.mean_r << 1) + self.hyst < self.mean_g,
+                     (self.mean_r << 1) > self.mean_g + self.hyst)
+                step(self.blueness,
+                     (self.mean_b << 1) + self.hyst < self.mean_g,
+                     (self.mean_b << 1) > self.mean_g + self.hyst)
+
+        return m
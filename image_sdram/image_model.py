@@ -0,0 +1,136 @@
+import numpy as np
+
+# Bit-exact NumPy model of ImageStream, for checking it in simulation (see image_stream_sim.py).
+#
+# Images are arrays of 5-bit red, 6-bit green and 5-bit blue, indexed [y, x], in the order
+# the camera sends them. The output is indexed by the output position, after any flips.
+
+# Kernels, as in conv3x3.py
+CONV_OFF = 0
+SOBEL_X  = 1
+SOBEL_Y  = 2
+SOBEL    = 3
+GAUSSIAN = 4
+SHARPEN  = 5
+BOX      = 6
+
+# The controls of ImageStream, and their reset values
+CONTROLS = {
+    "x_flip": 0, "y_flip": 0,
+    "mono": 0, "invert": 0, "filter": 0, "filt_thresh": 0,
+    "gamma": 0,
+    "redness": 0, "greenness": 0, "blueness": 0, "brightness": 0,
+    "kernel": CONV_OFF, "edge": 0, "edge_thresh": 0,
+    "border": 0
+}
+
+GAMMA32 = np.array([0, 0, 0, 0, 1, 1, 1, 2, 2, 3, 3, 4, 5, 5, 6, 7,
+                    8, 9, 10, 12, 13, 14, 16, 17, 19, 20, 22, 24, 25, 27, 29, 31])
+
+GAMMA64 = np.array([0, 0, 0, 0, 0, 0, 1, 1, 1, 1, 2, 2, 2, 3, 3, 4,
+                    4, 5, 5, 6, 6, 7, 8, 8, 9, 10, 11, 12, 12, 13, 14, 15,
+                    16, 17, 18, 19, 21, 22, 23, 24, 25, 27, 28, 29, 31, 32, 34, 35,
+                    37, 38, 40, 41, 43, 45, 46, 48, 50, 52, 53, 55, 57, 59, 61, 63])
+
+def color(c, r, g, b):
+    s = r + g + b
+    if c["mono"] or c["invert"]:
+        if c["invert"]:
+            return 0x1f - (s >> 2), 0x3f - (s >> 1), 0x1f - (s >> 2)
+        return s >> 2, s >> 1, s >> 2
+    if c["filter"]:
+        return np.where(r > c["filt_thresh"], 0x1f, 0), np.zeros_like(g), np.zeros_like(b)
+    return r, g, b
+
+def gamma(c, r, g, b):
+    if c["gamma"]:
+        return GAMMA32[r], GAMMA64[g], GAMMA32[b]
+    return r, g, b
+
+# The sums fit in AdjustStage, so they saturate
+def adjust(c, r, g, b):
+    t_r = r + c["redness"] + c["brightness"]
+    t_g = g + c["greenness"] + c["brightness"]
+    t_b = b + c["blueness"] + c["brightness"]
+    return np.clip(t_r, 0, 0x1f), np.clip(t_g, 0, 0x3f), np.clip(t_b, 0, 0x1f)
+
+# Horizontal edge detection, against the last pixel sent, which starts as 0
+def edge(c, r, g, b):
+    if not c["edge"]:
+        return r, g, b
+    s = (r + g + b).ravel()
+    p_s = np.concatenate(([0], s[:-1]))
+    d = np.abs(p_s - s)
+    e = ((d != 0) & (d > c["edge_thresh"])).reshape(r.shape)
+    return np.where(e, 0x1f, 0), np.zeros_like(g), np.zeros_like(b)
+
+# 3x3 windows of a plane, w[i][j] being the pixel at (y - 1 + i, x - 1 + j), with the edges padded
+def windows(p):
+    q = np.pad(p, 1, mode="edge")
+    h, w = p.shape
+    return [[q[i:i + h, j:j + w] for j in range(3)] for i in range(3)]
+
+def conv(c, r, g, b):
+    k = c["kernel"]
+    if k == CONV_OFF:
+        return edge(c, r, g, b)
+
+    h, w = r.shape
+    outs = []
+
+    if k in (SOBEL_X, SOBEL_Y, SOBEL):
+        l = windows(r + g + b)
+        gx = (l[0][2] + 2 * l[1][2] + l[2][2]) - (l[0][0] + 2 * l[1][0] + l[2][0])
+        gy = (l[2][0] + 2 * l[2][1] + l[2][2]) - (l[0][0] + 2 * l[0][1] + l[0][2])
+        mag = {SOBEL_X: np.abs(gx), SOBEL_Y: np.abs(gy), SOBEL: np.abs(gx) + np.abs(gy)}[k]
+        v = np.where(mag >= 512, 0x1f, (mag >> 4) & 0x1f)
+        outs = [v, (v << 1) | (v >> 4), v]
+    else:
+        for p, bits in ((r, 5), (g, 6), (b, 5)):
+            q = windows(p)
+            if k == GAUSSIAN:
+                corners = q[0][0] + q[0][2] + q[2][0] + q[2][2]
+                sides = q[0][1] + q[1][0] + q[1][2] + q[2][1]
+                o = (corners + 2 * sides + 4 * q[1][1]) >> 4
+            elif k == SHARPEN:
+                t = 5 * q[1][1] - (q[0][1] + q[1][0] + q[1][2] + q[2][1])
+                o = np.clip(t, 0, (1 << bits) - 1)
+            elif k == BOX:
+                s = sum(q[i][j] for i in range(3) for j in range(3))
+                o = (s * 57 >> 9) & ((1 << bits) - 1)
+            else:
+                o = p
+            outs.append(o)
+
+    # The edges of the image are passed through
+    edges = np.zeros((h, w), dtype=bool)
+    edges[0, :] = edges[-1, :] = edges[:, 0] = edges[:, -1] = True
+    return tuple(np.where(edges, p, o) for p, o in zip((r, g, b), outs))
+
+def flip(c, r, g, b):
+    planes = (r, g, b)
+    if c["y_flip"]:
+        planes = tuple(p[::-1, :] for p in planes)
+    if c["x_flip"]:
+        planes = tuple(p[:, ::-1] for p in planes)
+    return planes
+
+def overlay(c, r, g, b):
+    if not c["border"]:
+        return r, g, b
+    h, w = r.shape
+    y, x = np.mgrid[0:h, 0:w]
+    e = (x < 2) | (x >= w - 2) | (y < 2) | (y >= h - 2)
+    return np.where(e, 0, r), np.where(e, 0, g), np.where(e, 0x1f, b)
+
+# The output of ImageStream for an image, as red, green and blue planes, indexed by output position.
+# The pixel stages and the kernel work in the order the pixels are sent, so the flips are applied after them.
+def image_stream(r, g, b, controls={}):
+    c = dict(CONTROLS)
+    c.update(controls)
+
+    planes = tuple(np.asarray(p, dtype=np.int64) for p in (r, g, b))
+    for stage in (color, gamma, adjust, conv, flip, overlay):
+        planes = stage(c, *planes)
+
+    return planes
@@ -0,0 +1,379 @@
+from nmigen import *
+
+from pixel_stream import *
+from conv3x3 import *
+
+# Horizontal and vertical flip
+class FlipStage(Stage):
+    def __init__(self, res_x=320, res_y=240):
+        super().__init__()
+
+        # parameters
+        self.res_x  = res_x
+        self.res_y  = res_y
+
+        # inputs
+        self.x_flip = Signal()
+        self.y_flip = Signal()
+
+    def process(self, m, ce):
+        i = self.i
+        with m.If(ce):
+            m.d.sync += [
+                self.o.x.eq(Mux(self.x_flip, self.res_x - 1 - i.x, i.x)),
+                self.o.y.eq(Mux(self.y_flip, self.res_y - 1 - i.y, i.y))
+            ]
+
+# Monochrome, invert and the red filter
+class ColorStage(Stage):
+    def __init__(self):
+        super().__init__()
+
+        # inputs
+        self.mono        = Signal()
+        self.invert      = Signal()
+        self.filter      = Signal()
+        self.filt_thresh = Signal(signed(7))
+
+    def process(self, m, ce):
+        i = self.i
+        o = self.o
+
+        # Sum of colors
+        s = Signal(7)
+        m.d.comb += s.eq(i.r + i.g + i.b)
+
+        with m.If(ce):
+            with m.If(self.mono | self.invert):
+                m.d.sync += [
+                    o.r.eq(Mux(self.invert, 0x1f - s[2:], s[2:])),
+                    o.g.eq(Mux(self.invert, 0x3f - s[1:], s[1:])),
+                    o.b.eq(Mux(self.invert, 0x1f - s[2:], s[2:]))
+                ]
+            with m.Elif(self.filter):
+                m.d.sync += [
+                    o.r.eq(Mux(i.r > self.filt_thresh, 0x1f, 0)),
+                    o.g.eq(0),
+                    o.b.eq(0)
+                ]
+
+# Gamma correction, with small tables in logic
+class GammaStage(Stage):
+    def __init__(self):
+        super().__init__()
+
+        # inputs
+        self.gamma = Signal()
+
+    def process(self, m, ce):
+        gamma32 = [0, 0, 0, 0, 1, 1, 1, 2, 2, 3, 3, 4, 5, 5, 6, 7,
+                   8, 9, 10, 12, 13, 14, 16, 17, 19, 20, 22, 24, 25, 27, 29, 31]
+
+        gamma64 = [0, 0, 0, 0, 0, 0, 1, 1, 1, 1, 2, 2, 2, 3, 3, 4,
+                   4, 5, 5, 6, 6, 7, 8, 8, 9, 10, 11, 12, 12, 13, 14, 15,
+                   16, 17, 18, 19, 21, 22, 23, 24, 25, 27, 28, 29, 31, 32, 34, 35,
+                   37, 38, 40, 41, 43, 45, 46, 48, 50, 52, 53, 55, 57, 59, 61, 63]
+
+        gr_tab = Memory(width=5, depth=32, init=gamma32)
+        m.submodules.gr = gr = gr_tab.read_port(domain="comb")
+
+        gg_tab = Memory(width=6, depth=64, init=gamma64)
+        m.submodules.gg = gg = gg_tab.read_port(domain="comb")
+
+        gb_tab = Memory(width=5, depth=32, init=gamma32)
+        m.submodules.gb = gb = gb_tab.read_port(domain="comb")
+
+        m.d.comb += [
+            gr.addr.eq(self.i.r),
+            gg.addr.eq(self.i.g),
+            gb.addr.eq(self.i.b)
+        ]
+
+        with m.If(ce & self.gamma):
+            m.d.sync += [
+                self.o.r.eq(gr.data),
+                self.o.g.eq(gg.data),
+                self.o.b.eq(gb.data)
+            ]
+
+# Color and brightness offsets, with saturation
+class AdjustStage(Stage):
+    def __init__(self):
+        super().__init__()
+
+        # inputs
+        self.redness    = Signal(signed(7))
+        self.greenness  = Signal(signed(7))
+        self.blueness   = Signal(signed(7))
+        self.brightness = Signal(signed(7))
+
+    def process(self, m, ce):
+        i = self.i
+
+        t_r = Signal(signed(9))
+        t_g = Signal(signed(9))
+        t_b = Signal(signed(9))
+
+        m.d.comb += [
+            t_r.eq(i.r + self.redness + self.brightness),
+            t_g.eq(i.g + self.greenness + self.brightness),
+            t_b.eq(i.b + self.blueness + self.brightness)
+        ]
+
+        with m.If(ce):
+            m.d.sync += [
+                self.o.r.eq(Mux(t_r > 0x1f, 0x1f, Mux(t_r < 0, 0, t_r))),
+                self.o.g.eq(Mux(t_g > 0x3f, 0x3f, Mux(t_g < 0, 0, t_g))),
+                self.o.b.eq(Mux(t_b > 0x1f, 0x1f, Mux(t_b < 0, 0, t_b)))
+            ]
+
+# 3x3 kernels on the last three lines, and the simple horizontal edge detection.
+#
+# This has two registered steps: the line buffer reads, and the output.
+# The camera may send each x and y more than once when it is being scaled down:
+# with a kernel selected, only new positions are used, a new line starts when y changes,
+# and the output is for the middle of the window, one line and two pixels behind.
+# Nothing is output until the line above the input line is in the buffer.
+#
+# With a kernel selected, the last line of a frame is still in the buffer at done, so a line of
+# blank pixels, and two on the line after it, are sent in after it, one every 4 cycles, about as
+# fast as the camera sends them. The input is held off meanwhile, in vertical blanking,
+# and done is passed on when the last line is out.
+class KernelStage(Elaboratable):
+    def __init__(self, res_x=320, res_y=240):
+        # parameters
+        self.res_x       = res_x
+        self.res_y       = res_y
+
+        # streams
+        self.i           = PixelStream()
+        self.o           = PixelStream()
+
+        # inputs
+        self.kernel      = Signal(3)
+        self.edge        = Signal()
+        self.edge_thresh = Signal(signed(7))
+
+    def elaborate(self, platform):
+        m = Module()
+
+        i = self.i
+        o = self.o
+
+        ce  = Signal()
+        acc = Signal()
+        on  = Signal()
+
+        # Input, from the stream or the flush
+        s        = PixelStream()
+        flushing = Signal()
+
+        m.d.comb += [
+            ce.eq(o.ready | ~o.valid),
+            i.ready.eq(ce & ~flushing),
+            acc.eq(s.valid & ce),
+            on.eq(self.kernel != CONV_OFF)
+        ]
+
+        # Line buffer
+        buffer = Memory(width=16, depth=self.res_x * 3)
+        m.submodules.ra = ra = buffer.read_port(transparent=False)
+        m.submodules.rb = rb = buffer.read_port(transparent=False)
+        m.submodules.w = w = buffer.write_port()
+
+        cl = Signal(2, reset=0)
+        pl = Signal(2, reset=2)
+        ppl = Signal(2, reset=1)
+
+        # Line pointers for this pixel, moved on at the start of a line
+        n_cl = Signal(2)
+        n_pl = Signal(2)
+        n_ppl = Signal(2)
+
+        l_x = Signal(10)
+        l_y = Signal(10)
+        mid_y = Signal(10) # Line above the input line
+        new_px = Signal()
+        new_line = Signal()
+        first = Signal(reset=1) # No pixels yet, so l_y is not a line
+        lines = Signal(2, reset=0) # Lines started, up to 2
+        n_lines = Signal(2)
+        cols = Signal(2, reset=0) # Window shifts so far, up to 2, as it is empty at first
+
+        m.d.comb += [
+            new_line.eq((s.y != l_y) | first),
+            n_lines.eq(Mux(new_line & (lines != 2), lines + 1, lines)),
+            new_px.eq((s.x != l_x) | new_line),
+            n_cl.eq(Mux(new_line, Mux(cl == 2, 0, cl + 1), cl)),
+            n_pl.eq(Mux(new_line, cl, pl)),
+            n_ppl.eq(Mux(new_line, pl, ppl))
+        ]
+
+        with m.If(acc):
+            m.d.sync += [
+                l_x.eq(s.x),
+                l_y.eq(s.y),
+                first.eq(0),
+                lines.eq(n_lines),
+                ppl.eq(n_ppl),
+                pl.eq(n_pl),
+                cl.eq(n_cl)
+            ]
+            with m.If(new_line):
+                m.d.sync += mid_y.eq(l_y)
+
+        # Flush of the last line, res_x + 2 blank pixels, and then done
+        f_n   = Signal(range(self.res_x + 2))
+        f_y   = Signal(10)
+        f_div = Signal(2)
+        drain = Signal(2)
+
+        with m.FSM():
+            with m.State("IDLE"):
+                m.d.comb += [d.eq(v) for d, v in zip(s.payload(), i.payload())] + [s.valid.eq(i.valid)]
+                with m.If(i.done):
+                    m.d.sync += [
+                        f_n.eq(0),
+                        f_y.eq(l_y + 1),
+                        f_div.eq(0)
+                    ]
+                    with m.If(on & (lines == 2)):
+                        m.next = "FLUSH"
+                    with m.Else():
+                        m.next = "DONE"
+            with m.State("FLUSH"):
+                m.d.comb += [
+                    flushing.eq(1),
+                    s.valid.eq(f_div == 0),
+                    s.x.eq(Mux(f_n >= self.res_x, f_n - self.res_x, f_n)),
+                    s.y.eq(Mux(f_n >= self.res_x, f_y + 1, f_y))
+                ]
+                m.d.sync += f_div.eq(f_div + 1)
+                with m.If(acc):
+                    m.d.sync += f_n.eq(f_n + 1)
+                    with m.If(f_n == self.res_x + 1):
+                        m.d.sync += drain.eq(0)
+                        m.next = "DRAIN"
+            with m.State("DRAIN"):
+                # The last pixel is out two cycles after it goes in
+                m.d.comb += flushing.eq(1)
+                m.d.sync += drain.eq(drain + 1)
+                with m.If(drain == 1):
+                    m.next = "DONE"
+            with m.State("DONE"):
+                # The next frame starts with an empty buffer
+                m.d.comb += [
+                    flushing.eq(1),
+                    o.done.eq(1)
+                ]
+                m.d.sync += [
+                    first.eq(1),
+                    lines.eq(0),
+                    cols.eq(0)
+                ]
+                m.next = "IDLE"
+
+        # Write pixel to current line, and read the pixels above it
+        m.d.comb += [
+            w.addr.eq(n_cl * self.res_x + s.x),
+            w.data.eq(Cat(s.b, s.g, s.r)),
+            w.en.eq(acc & new_px),
+            ra.addr.eq(n_ppl * self.res_x + s.x),
+            rb.addr.eq(n_pl * self.res_x + s.x),
+            ra.en.eq(ce),
+            rb.en.eq(ce)
+        ]
+
+        # Step 1: the pixel, while the reads are done
+        v1 = Signal()
+        p1 = PixelStream()
+        y1 = Signal(10) # Line of the middle row
+        s1 = Signal(7)
+
+        with m.If(ce):
+            m.d.sync += [v1.eq(s.valid & ((new_px & (n_lines == 2)) | ~on)), y1.eq(Mux(new_line, l_y, mid_y))] + \
+                        [d.eq(v) for d, v in zip(p1.payload(), s.payload())]
+
+        m.d.comb += s1.eq(p1.r + p1.g + p1.b)
+
+        # Window, with the position of each column
+        m.submodules.conv = conv = Conv3x3()
+
+        wx = [Signal(10) for c in range(3)]
+        wy = [Signal(10) for c in range(3)]
+        shift = Signal()
+
+        m.d.comb += [
+            shift.eq(ce & v1 & on),
+            conv.shift.eq(shift),
+            conv.top.eq(ra.data),
+            conv.mid.eq(rb.data),
+            conv.bot.eq(Cat(p1.b, p1.g, p1.r)),
+            conv.kernel.eq(self.kernel),
+            conv.bypass.eq((wx[1] == 0) | (wx[1] == self.res_x - 1) | (wy[1] == 0) | (wy[1] == self.res_y - 1))
+        ]
+
+        with m.If(shift):
+            with m.If(cols != 2):
+                m.d.sync += cols.eq(cols + 1)
+            m.d.sync += [
+                wx[0].eq(wx[1]), wx[1].eq(wx[2]), wx[2].eq(p1.x),
+                wy[0].eq(wy[1]), wy[1].eq(wy[2]), wy[2].eq(y1)
+            ]
+
+        # Previous sum for edge detection
+        p_s = Signal(7)
+
+        with m.If(ce & v1):
+            m.d.sync += p_s.eq(s1)
+
+        # Step 2: the output
+        with m.If(ce):
+            m.d.sync += o.valid.eq(v1 & (~on | (cols == 2)))
+            with m.If(on):
+                # The window before this shift
+                m.d.sync += [
+                    o.x.eq(wx[1]),
+                    o.y.eq(wy[1]),
+                    o.r.eq(conv.o_r),
+                    o.g.eq(conv.o_g),
+                    o.b.eq(conv.o_b)
+                ]
+            with m.Else():
+                m.d.sync += [d.eq(s) for d, s in zip(o.payload(), p1.payload())]
+                with m.If(self.edge):
+                    with m.If(((p_s > s1) & ((p_s - s1) > self.edge_thresh)) | ((p_s < s1) & ((s1 - p_s) > self.edge_thresh))):
+                        m.d.sync += [
+                            o.r.eq(0x1f),
+                            o.g.eq(0),
+                            o.b.eq(0)
+                        ]
+                    with m.Else():
+                        m.d.sync += [
+                            o.r.eq(0),
+                            o.g.eq(0),
+                            o.b.eq(0)
+                        ]
+
+        return m
+
+# Blue border
+class OverlayStage(Stage):
+    def __init__(self, res_x=320, res_y=240):
+        super().__init__()
+
+        # parameters
+        self.res_x  = res_x
+        self.res_y  = res_y
+
+        # inputs
+        self.border = Signal()
+
+    def process(self, m, ce):
+        i = self.i
+        with m.If(ce & self.border & ((i.x < 2) | (i.x >= self.res_x - 2) | (i.y < 2) | (i.y >= self.res_y - 2))):
+            m.d.sync += [
+                self.o.r.eq(0),
+                self.o.g.eq(0),
+                self.o.b.eq(0x1f)
+            ]
@@ -1,248 +1,117 @@
 from nmigen import *
 from nmigen.build import Platform
 
+from pixel_stream import *
+from image_stages import *
+from blobs import *
+
+# Processes a stream of camera pixels, with a pipeline of stages connected by
+# valid/ready PixelStreams: flip, color, gamma, adjust, kernel and overlay.
+#
+# The controls are the signals of the stages. Stages can be removed from, or added to,
+# the stages list before elaboration; each one needs PixelStreams i and o.
+# The output stream is always ready, as the camera cannot wait.
 class ImageStream(Elaboratable):
     def __init__(self, res_x = 320, res_y = 480):
         self.res_x       = res_x
         self.res_y       = res_y
+
+        # stages
+        self.flip        = FlipStage(res_x, res_y)
+        self.color       = ColorStage()
+        self.gamma_lut   = GammaStage()
+        self.adjust      = AdjustStage()
+        self.kern        = KernelStage(res_x, res_y)
+        self.overlay     = OverlayStage(res_x, res_y)
+        self.stages      = [self.flip, self.color, self.gamma_lut, self.adjust, self.kern, self.overlay]
+
+        # inputs
         self.valid       = Signal()
         self.i_x         = Signal(10)
         self.i_y         = Signal(10)
         self.i_r         = Signal(5)
         self.i_g         = Signal(6)
         self.i_b         = Signal(5)
+        self.frame_done  = Signal()
+
+        # outputs
         self.ready       = Signal(16)
         self.o_x         = Signal(10)
         self.o_y         = Signal(9)
         self.o_r         = Signal(5)
         self.o_g         = Signal(6)
         self.o_b         = Signal(5)
-        self.filt_thresh = Signal(signed(7))
-        self.edge_thresh = Signal(signed(7))
-        self.edge        = Signal()
-        self.x_flip      = Signal()
-        self.y_flip      = Signal()
-        self.mono        = Signal()
-        self.invert      = Signal()
-        self.gamma       = Signal()
-        self.filter      = Signal()
-        self.border      = Signal()
         self.p_x         = Signal(10)
         self.p_y         = Signal(10)
-        self.redness     = Signal(signed(7))
-        self.greenness   = Signal(signed(7))
-        self.blueness    = Signal(signed(7))
-        self.brightness  = Signal(signed(7))
+        self.o_frame_done = Signal() # After the last pixel of the frame is out
+
+        # controls
+        self.x_flip      = self.flip.x_flip
+        self.y_flip      = self.flip.y_flip
+        self.mono        = self.color.mono
+        self.invert      = self.color.invert
+        self.filter      = self.color.filter
+        self.filt_thresh = self.color.filt_thresh
+        self.gamma       = self.gamma_lut.gamma
+        self.redness     = self.adjust.redness
+        self.greenness   = self.adjust.greenness
+        self.blueness    = self.adjust.blueness
+        self.brightness  = self.adjust.brightness
+        self.kernel      = self.kern.kernel
+        self.edge        = self.kern.edge
+        self.edge_thresh = self.kern.edge_thresh
+        self.border      = self.overlay.border
+
+        # blobs of red over filt_thresh
+        self.blobs       = Blobs(n=4)
 
     def elaborate(self, platform):
         m = Module()
 
-        gamma32 = [0, 0, 0, 0, 1, 1, 1, 2, 2, 3, 3, 4, 5, 5, 6, 7,
-                   8, 9, 10, 12, 13, 14, 16, 17, 19, 20, 22, 24, 25, 27, 29, 31]
-
-        gamma64 = [0, 0, 0, 0, 0, 0, 1, 1, 1, 1, 2, 2, 2, 3, 3, 4,
-                   4, 5, 5, 6, 6, 7, 8, 8, 9, 10, 11, 12, 12, 13, 14, 15,
-                   16, 17, 18, 19, 21, 22, 23, 24, 25, 27, 28, 29, 31, 32, 34, 35,
-                   37, 38, 40, 41, 43, 45, 46, 48, 50, 52, 53, 55, 57, 59, 61, 63]
-
-        gr_tab = Memory(width=5, depth=32,init=gamma32)
-        m.submodules.gr = gr = gr_tab.read_port()
-
-        gg_tab = Memory(width=6, depth=64,init=gamma64)
-        m.submodules.gg = gg = gg_tab.read_port()
-
-        gb_tab = Memory(width=5, depth=32,init=gamma32)
-        m.submodules.gb = gb = gb_tab.read_port()
-
-        # Apply x_flip and yflip
-        c_x = Signal(10)
-        c_y = Signal(10)
-
-        m.d.comb += [
-            c_x.eq(Mux(self.x_flip, self.res_x - 1 - self.i_x, self.i_x)),
-            c_y.eq(Mux(self.y_flip, self.res_y - 1 - self.i_y, self.i_y))
-        ]
-
-        # Line buffer
-        buffer = Memory(width=16, depth=self.res_x * 3)
-        m.submodules.r = r = buffer.read_port()
-        m.submodules.w = w = buffer.write_port()
-
-        cl = Signal(2, reset=0)
-        pl = Signal(2, reset=2)
-        ppl = Signal(2, reset=1)
-
-        above = Signal(16)
+        for i, stage in enumerate(self.stages):
+            m.submodules["stage" + str(i)] = stage
 
-        # Save current pixel
-        p_r = Signal(5)
-        p_g = Signal(6)
-        p_r = Signal(5)
-
-        # Sum of colors and previous sum
-        s = Signal(7)
-        p_s = Signal(7)
+        first = self.stages[0].i
+        last  = self.stages[-1].o
 
         m.d.comb += [
-            s.eq(self.i_r + self.i_g + self.i_b)
+            first.valid.eq(self.valid),
+            first.done.eq(self.frame_done),
+            first.x.eq(self.i_x),
+            first.y.eq(self.i_y),
+            first.r.eq(self.i_r),
+            first.g.eq(self.i_g),
+            first.b.eq(self.i_b),
+            last.ready.eq(1),
+            self.ready.eq(last.valid),
+            self.o_x.eq(last.x),
+            self.o_y.eq(last.y),
+            self.o_r.eq(last.r),
+            self.o_g.eq(last.g),
+            self.o_b.eq(last.b),
+            self.o_frame_done.eq(last.done)
         ]
 
-        m.d.sync += [
-            # Default ready to false
-            self.ready.eq(0),
-            p_s.eq(s)
-        ]
+        for a, b in zip(self.stages, self.stages[1:]):
+            m.d.comb += a.o.connect(b.i)
 
-        # When at end of line, update line pointers
-        with m.If((c_x == self.res_x - 1) & (self.valid)):
-            m.d.sync += [
-                ppl.eq(pl),
-                pl.eq(cl),
-                cl.eq(Mux(cl == 2, 0, cl + 1))
-            ]
-
-        # Current pixel with optional convert to monochrome and optional invert
-        c_r = Signal(5)
-        c_g = Signal(6)
-        c_b = Signal(5)
-
-        with m.If(self.mono | self.invert):
-            m.d.comb += [
-                c_r.eq(Mux(self.invert, 0x1f - s[2:], s[2:])),
-                c_g.eq(Mux(self.invert, 0x3f - s[1:], s[1:])),
-                c_b.eq(Mux(self.invert, 0x1f - s[2:], s[2:]))
-            ]
-        with m.Elif(self.filter):
-            with m.If((self.i_r > self.filt_thresh)):
-                m.d.comb += [
-                    c_r.eq(0x1f),
-                    c_g.eq(0),
-                    c_b.eq(0)
-                ]
-            with m.Else():
-                m.d.comb += [
-                    c_r.eq(0),
-                    c_g.eq(0),
-                    c_b.eq(0)
-                ]
-        with m.Else():
-            m.d.comb += [
-                c_r.eq(self.i_r),
-                c_g.eq(self.i_g),
-                c_b.eq(self.i_b)
-            ]
-
-        # Calculate laser mouse pointer
-        min_x = Signal(10)
-        max_x = Signal(10)
-        min_y = Signal(10)
-        max_y = Signal(10)
-
-        with m.If((self.i_x == 0) & (self.i_y == 0)):
-            m.d.sync += [
-                min_x.eq(0),
-                min_y.eq(0),
-                max_x.eq(0),
-                max_y.eq(0)
-            ]
-
-        with m.If(self.i_r > self.filt_thresh):
-            with m.If ((min_x == 0) | (c_x < min_x)):
-                m.d.sync += min_x.eq(c_x)
-            with m.If((max_x == 0) | (c_x > max_x)):
-                m.d.sync += max_x.eq(c_x)
-            with m.If((min_y == 0) | (c_y < min_y)):
-                m.d.sync += min_y.eq(c_y)
-            with m.If((max_y == 0) | (c_y > max_y)):
-                m.d.sync += max_y.eq(c_y)
+        # Blobs of the filtered color, from the flipped input
+        c = self.flip.o if self.flip in self.stages else first
 
-        m.d.comb += [
-            self.p_x.eq(min_x + ((max_x - min_x) >> 1)),
-            self.p_y.eq(min_y + ((max_y - min_y) >> 1))
-        ]
-
-        # Apply optional gamma correction
-        g_r = Signal(5)
-        g_g = Signal(6)
-        g_b = Signal(5)
+        m.submodules.blobs = blobs = self.blobs
 
         m.d.comb += [
-            gr.addr.eq(c_r),
-            gg.addr.eq(c_g),
-            gb.addr.eq(c_b),
+            blobs.valid.eq(c.valid & c.ready),
+            blobs.x.eq(c.x),
+            blobs.y.eq(c.y),
+            blobs.hit.eq(c.r > self.filt_thresh),
+            blobs.frame_done.eq(self.frame_done)
         ]
 
-        with m.If(self.gamma):
-            m.d.comb += [
-                g_r.eq(gr.data),
-                g_g.eq(gg.data),
-                g_b.eq(gb.data)
-            ]
-        with m.Else():
-            m.d.comb += [
-                g_r.eq(c_r),
-                g_g.eq(c_g),
-                g_b.eq(c_b)
-            ]
-
-        # New values with val added or subtracted
-        n_r = Signal(signed(6))
-        n_g = Signal(signed(7))
-        n_b = Signal(signed(6))
-        t_r = Signal(signed(6))
-        t_g = Signal(signed(7))
-        t_b = Signal(signed(6))
-
+        # Laser mouse pointer, at the centre of the largest blob
         m.d.comb += [
-            t_r.eq(g_r + self.redness + self.brightness),
-            t_g.eq(g_g + self.greenness + self.brightness),
-            t_b.eq(g_b + self.blueness + self.brightness),
-            n_r.eq(Mux(t_r > 0x1f, 0x1f, Mux(t_r < 0, 0, t_r))),
-            n_g.eq(Mux(t_g > 0x3f, 0x3f, Mux(t_g < 0, 0, t_g))),
-            n_b.eq(Mux(t_b > 0x1f, 0x1f, Mux(t_b < 0, 0, t_b))),
+            self.p_x.eq(blobs.largest_cx),
+            self.p_y.eq(blobs.largest_cy)
         ]
 
-        # Process pixel when valid set, and set ready
-        with m.If(self.valid):
-            m.d.sync += [
-                self.ready.eq(1),
-                # Set output x and y with horizontal and vertical flip
-                self.o_x.eq(c_x),
-                self.o_y.eq(c_y),
-                # Copy input pixel by default
-                self.o_r.eq(n_r),
-                self.o_g.eq(n_g),
-                self.o_b.eq(n_b),
-                # Write pixel to current line
-                w.addr.eq(cl * self.res_x + c_x),
-                w.data.eq(Cat(self.i_b, self.i_g, self.i_r)),
-                # Get the pixel above the current one
-                r.addr.eq(pl * self.res_x + c_x),
-                above.eq(r.data)
-            ]
-
-            # Simple edge detection
-            with m.If(self.edge):
-                with m.If(((p_s > s) & ((p_s - s) > self.edge_thresh)) | ((p_s < s) & ((s - p_s) > self.edge_thresh))):
-                    m.d.sync += [
-                        self.o_r.eq(0x1f),
-                        self.o_g.eq(0),
-                        self.o_b.eq(0)
-                    ]
-                with m.Else():
-                    m.d.sync += [
-                        self.o_r.eq(0),
-                        self.o_g.eq(0),
-                        self.o_b.eq(0)
-                    ]
-
-            # Draw a border
-            with m.If(self.border & ((c_x < 2) | (c_x >= self.res_x - 2) | (c_y < 2) | (c_y >= self.res_y - 2))):
-                m.d.sync += [
-                    self.o_r.eq(0),
-                    self.o_g.eq(0),
-                    self.o_b.eq(0x1f)
-                ]
-
         return m
-
@@ -0,0 +1,192 @@
+import argparse
+import time
+from multiprocessing import Pool
+
+import numpy as np
+
+from nmigen import *
+from nmigen.sim import Simulator, Settle
+
+from image_stream import *
+import image_model
+
+# Streams an image through ImageStream in simulation, and checks the output
+# against the NumPy model in image_model.py, pixel for pixel.
+#
+# Images can be binary PPM files, or PNG if PIL is installed; with no image a
+# test pattern is used. --sweep runs each mode in a separate process.
+
+# Reads an image as RGB565 planes
+def read_image(name):
+    if name.lower().endswith((".ppm", ".pnm")):
+        with open(name, "rb") as f:
+            data = f.read()
+        fields = []
+        pos = 0
+        # Magic, width, height and maxval, with comments
+        while len(fields) < 4:
+            while data[pos:pos + 1].isspace():
+                pos += 1
+            if data[pos:pos + 1] == b"#":
+                pos = data.index(b"\n", pos)
+                continue
+            end = pos
+            while not data[end:end + 1].isspace():
+                end += 1
+            fields.append(data[pos:end])
+            pos = end
+        assert fields[0] == b"P6" and int(fields[3]) == 255, "Only 8-bit binary PPM is supported"
+        w, h = int(fields[1]), int(fields[2])
+        rgb = np.frombuffer(data[pos + 1:pos + 1 + w * h * 3], dtype=np.uint8).reshape(h, w, 3)
+    else:
+        try:
+            from PIL import Image
+        except ImportError:
+            raise SystemExit("PIL is needed for " + name + ", or use a PPM file")
+        rgb = np.array(Image.open(name).convert("RGB"))
+
+    rgb = rgb.astype(np.int64)
+    return rgb[:, :, 0] >> 3, rgb[:, :, 1] >> 2, rgb[:, :, 2] >> 3
+
+# Gradients with some noise, so every stage has something to do
+def test_pattern(w, h, seed=1):
+    y, x = np.mgrid[0:h, 0:w]
+    noise = np.random.RandomState(seed).randint(0, 8, size=(h, w))
+    r = (x * 31 // max(w - 1, 1) + noise) & 0x1f
+    g = (y * 63 // max(h - 1, 1) + noise) & 0x3f
+    b = ((x + y) * 31 // max(w + h - 2, 1)) & 0x1f
+    return r, g, b
+
+# Runs an image through ImageStream, and returns the output planes and the simulation time
+def simulate(r, g, b, controls):
+    h, w = r.shape
+
+    m = Module()
+    m.submodules.ims = ims = ImageStream(res_x=w, res_y=h)
+
+    out = {}
+
+    def process():
+        for name, val in controls.items():
+            yield getattr(ims, name).eq(val)
+
+        # One frame, then frame_done, and the output until the end of the frame comes out
+        order = [(x, y) for y in range(h) for x in range(w)]
+
+        i = 0
+        while True:
+            yield ims.frame_done.eq(i == len(order))
+            if i < len(order):
+                x, y = order[i]
+                yield ims.valid.eq(1)
+                yield ims.i_x.eq(x)
+                yield ims.i_y.eq(y)
+                yield ims.i_r.eq(int(r[y, x]))
+                yield ims.i_g.eq(int(g[y, x]))
+                yield ims.i_b.eq(int(b[y, x]))
+            else:
+                yield ims.valid.eq(0)
+            i += 1
+            yield
+            yield Settle()
+            if (yield ims.ready):
+                pos = ((yield ims.o_x), (yield ims.o_y))
+                assert pos not in out, "Pixel {} sent twice".format(pos)
+                out[pos] = ((yield ims.o_r), (yield ims.o_g), (yield ims.o_b))
+            if (yield ims.o_frame_done):
+                break
+
+    sim = Simulator(m)
+    sim.add_clock(4e-8)
+    sim.add_sync_process(process)
+
+    start = time.time()
+    sim.run()
+    elapsed = time.time() - start
+
+    planes = [np.full((h, w), -1, dtype=np.int64) for i in range(3)]
+    for (x, y), p in out.items():
+        assert x < w and y < h, "Pixel {} is outside the frame".format((x, y))
+        for c in range(3):
+            planes[c][y, x] = p[c]
+
+    return planes, elapsed
+
+# Simulates one set of controls, and compares with the model
+def check(args):
+    r, g, b, controls = args
+
+    got, elapsed = simulate(r, g, b, controls)
+    want = image_model.image_stream(r, g, b, controls)
+
+    bad = np.zeros(r.shape, dtype=bool)
+    for c in range(3):
+        bad |= got[c] != want[c]
+
+    first = None
+    if bad.any():
+        y, x = np.argwhere(bad)[0]
+        first = (x, y, tuple(int(p[y, x]) for p in got), tuple(int(p[y, x]) for p in want))
+
+    return controls, int(bad.sum()), first, r.size / elapsed
+
+# Each mode on its own, and some combinations
+SWEEP = [
+    {},
+    {"x_flip": 1, "y_flip": 1},
+    {"mono": 1},
+    {"invert": 1},
+    {"filter": 1, "filt_thresh": 12},
+    {"gamma": 1},
+    {"redness": 5, "greenness": -9, "blueness": 20, "brightness": -3},
+    {"redness": 63, "brightness": 63},
+    {"redness": -64, "greenness": -64, "brightness": -64},
+    {"edge": 1, "edge_thresh": 6},
+    {"kernel": image_model.SOBEL_X},
+    {"kernel": image_model.SOBEL_Y},
+    {"kernel": image_model.SOBEL},
+    {"kernel": image_model.GAUSSIAN},
+    {"kernel": image_model.SHARPEN},
+    {"kernel": image_model.BOX},
+    {"kernel": image_model.SOBEL, "y_flip": 1},
+    {"gamma": 1, "brightness": 7, "kernel": image_model.GAUSSIAN, "border": 1},
+    {"border": 1}
+]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("image", nargs="?", help="PPM or PNG image, or a test pattern if not given")
+    parser.add_argument("--size", default="32x24", help="Size of the test pattern")
+    parser.add_argument("--sweep", action="store_true", help="Run all the modes")
+    parser.add_argument("--jobs", type=int, default=None, help="Processes for the sweep")
+    parser.add_argument("--set", action="append", default=[], metavar="NAME=VALUE",
+                        help="Set an ImageStream control, e.g. --set kernel=3")
+    args = parser.parse_args()
+
+    if args.image:
+        r, g, b = read_image(args.image)
+    else:
+        w, h = (int(v) for v in args.size.split("x"))
+        r, g, b = test_pattern(w, h)
+
+    if args.sweep:
+        runs = SWEEP
+    else:
+        controls = {}
+        for s in args.set:
+            name, val = s.split("=")
+            assert name in image_model.CONTROLS, "Unknown control " + name
+            controls[name] = int(val, 0)
+        runs = [controls]
+
+    with Pool(args.jobs) as pool:
+        results = pool.map(check, [(r, g, b, c) for c in runs])
+
+    failed = 0
+    for controls, bad, first, rate in results:
+        print("{:60s} {:6d} bad, {:8.0f} pixels/s".format(str(controls), bad, rate))
+        if first:
+            failed += 1
+            print("    first at ({}, {}): got {}, expected {}".format(*first))
+
+    print("{} of {} failed".format(failed, len(results)))
@@ -0,0 +1,231 @@
+from nmigen import *
+
+# Motion detection, by comparing each pixel with the same pixel of the previous frame in SDRAM.
+#
+# The previous frame is read a line ahead of the camera, with burst reads, into a
+# two line buffer in block RAM: line y is kept in half y[0], so the line being fetched never
+# overwrites the one being compared. Reads are done in fetch_domain; req is held until
+# the reads are done, and the owner sets ack when one is accepted and data_valid for each
+# word that is returned for it.
+#
+# A pixel has moved when the sum of its colors differs from the previous frame's by more than
+# thresh. The mask is output a cycle after the pixel, with its position. The moving pixels of
+# each tile of 2**tile_bits square are counted in block RAM, with two banks that are swapped at
+# frame_done; the counts for the last frame are read with tile_sel, valid the next cycle.
+# Pixels that the camera repeats are counted each time.
+# The previous frame must be RGB565.
+class MotionDetect(Elaboratable):
+    def __init__(self, res_x=320, res_y=240, burst=4, tile_bits=5, fetch_domain="sync"):
+        assert res_x % burst == 0
+
+        # parameters
+        self.res_x        = res_x
+        self.res_y        = res_y
+        self.burst        = burst
+        self.tile_bits    = tile_bits
+        self.fetch_domain = fetch_domain
+        self.tx_bits      = ((res_x - 1) >> tile_bits).bit_length()
+        self.ty_bits      = ((res_y - 1) >> tile_bits).bit_length()
+
+        # inputs
+        self.valid        = Signal()
+        self.x            = Signal(10)
+        self.y            = Signal(10)
+        self.r            = Signal(5)
+        self.g            = Signal(6)
+        self.b            = Signal(5)
+        self.thresh       = Signal(7)
+        self.frame_done   = Signal()
+        self.prev_base    = Signal(20) # Previous frame in SDRAM
+        self.ack          = Signal()
+        self.data_valid   = Signal()
+        self.data         = Signal(16)
+        self.tile_sel     = Signal(self.tx_bits + self.ty_bits)
+
+        # outputs
+        self.req          = Signal()
+        self.addr         = Signal(20)
+        self.o_valid      = Signal()
+        self.o_x          = Signal(10)
+        self.o_y          = Signal(10)
+        self.motion       = Signal()
+        self.tile_count   = Signal(2 * tile_bits + 3)
+        self.total        = Signal(20) # Moving pixels in the last frame
+        self.updated      = Signal()
+
+    def elaborate(self, platform):
+        m = Module()
+
+        fetch = m.d[self.fetch_domain]
+        res_x = self.res_x
+
+        # Previous frame lines
+        buffer = Memory(width=16, depth=2 * res_x)
+        m.submodules.r = r = buffer.read_port(transparent=False)
+        m.submodules.w = w = buffer.write_port(domain=self.fetch_domain)
+
+        # Line wanted next, and the lines in the buffer, tagged with the frame they are from
+        l_y     = Signal(10)
+        first_y = Signal(10)
+        want_y  = Signal(10)
+        start   = Signal(reset=1) # Waiting for the first line of a frame
+        down    = Signal(reset=1) # Lines come in increasing y
+        frame   = Signal()
+        tags    = Array(Signal(11, name="tag" + str(i)) for i in range(2))
+        loaded  = Array(Signal(name="loaded" + str(i)) for i in range(2))
+
+        old_done = Signal()
+        done     = Signal()
+
+        m.d.sync += old_done.eq(self.frame_done)
+        m.d.comb += done.eq(self.frame_done & ~old_done)
+
+        with m.If(done):
+            # The next frame starts where this one did
+            m.d.sync += [
+                frame.eq(~frame),
+                want_y.eq(first_y),
+                start.eq(1)
+            ]
+        with m.Elif(self.valid & (start | (self.y != l_y))):
+            m.d.sync += [
+                l_y.eq(self.y),
+                start.eq(0),
+                want_y.eq(Mux(down, self.y + 1, self.y - 1))
+            ]
+            with m.If(start):
+                m.d.sync += first_y.eq(self.y)
+            with m.Else():
+                m.d.sync += down.eq(self.y > l_y)
+
+        # Burst reads of the wanted line
+        f_y     = Signal(10)
+        f_frame = Signal()
+        f_left  = Signal(range(res_x // self.burst + 1))
+        f_idx   = Signal(range(res_x))
+
+        m.d.comb += [
+            self.req.eq(f_left != 0),
+            w.addr.eq(f_y[0] * res_x + f_idx),
+            w.data.eq(self.data)
+        ]
+
+        with m.If(self.ack):
+            fetch += [
+                self.addr.eq(self.addr + self.burst),
+                f_left.eq(f_left - 1)
+            ]
+
+        with m.FSM(domain=self.fetch_domain):
+            with m.State("IDLE"):
+                with m.If((want_y < self.res_y) & ~(loaded[want_y[0]] & (tags[want_y[0]] == Cat(want_y, frame)))):
+                    fetch += [
+                        f_y.eq(want_y),
+                        f_frame.eq(frame),
+                        f_left.eq(res_x // self.burst),
+                        f_idx.eq(0),
+                        self.addr.eq(self.prev_base + want_y * res_x),
+                        loaded[want_y[0]].eq(0)
+                    ]
+                    m.next = "FETCH"
+            with m.State("FETCH"):
+                with m.If(self.data_valid):
+                    m.d.comb += w.en.eq(1)
+                    fetch += f_idx.eq(f_idx + 1)
+                    with m.If(f_idx == res_x - 1):
+                        fetch += [
+                            tags[f_y[0]].eq(Cat(f_y, f_frame)),
+                            loaded[f_y[0]].eq(1)
+                        ]
+                        m.next = "IDLE"
+
+        # Compare with the previous frame, while it is read
+        s1 = Signal(7)
+        v1 = Signal()
+        ok = Signal()
+
+        m.d.comb += [
+            r.addr.eq(self.y[0] * res_x + self.x),
+            r.en.eq(1)
+        ]
+
+        m.d.sync += [
+            v1.eq(self.valid),
+            ok.eq(loaded[self.y[0]] & (tags[self.y[0]] == Cat(self.y, frame))),
+            s1.eq(self.r + self.g + self.b),
+            self.o_x.eq(self.x),
+            self.o_y.eq(self.y)
+        ]
+
+        p_s  = Signal(7)
+        diff = Signal(7)
+
+        m.d.comb += [
+            p_s.eq(r.data[11:16] + r.data[5:11] + r.data[0:5]),
+            diff.eq(Mux(s1 > p_s, s1 - p_s, p_s - s1)),
+            self.o_valid.eq(v1),
+            self.motion.eq(v1 & ok & (diff > self.thresh))
+        ]
+
+        # Moving pixels per tile, incremented the cycle after the read
+        bank     = Signal()
+        clearing = Signal()
+        clr      = Signal(self.tx_bits + self.ty_bits)
+        total    = Signal(20)
+
+        tb = self.tile_bits
+
+        with m.If(done):
+            m.d.sync += [
+                bank.eq(~bank),
+                clearing.eq(1),
+                clr.eq(0),
+                self.total.eq(total),
+                total.eq(0)
+            ]
+        with m.Elif(clearing):
+            m.d.sync += clr.eq(clr + 1)
+            with m.If(clr.all()):
+                m.d.sync += clearing.eq(0)
+
+        with m.If(self.motion & ~done):
+            m.d.sync += total.eq(total + 1)
+
+        m.d.sync += self.updated.eq(done)
+
+        counts = Memory(width=len(self.tile_count), depth=2 ** (len(clr) + 1))
+        m.submodules.cr = cr = counts.read_port()
+        m.submodules.cw = cw = counts.write_port()
+        m.submodules.co = co = counts.read_port()
+
+        tile = Signal(len(clr))
+        t1   = Signal(len(clr))
+        m1   = Signal()
+
+        m.d.comb += tile.eq(Cat(self.o_x[tb:tb + self.tx_bits], self.o_y[tb:tb + self.ty_bits]))
+
+        m.d.sync += [
+            t1.eq(tile),
+            m1.eq(self.motion & ~clearing)
+        ]
+
+        m.d.comb += [
+            cr.addr.eq(Cat(tile, bank)),
+            co.addr.eq(Cat(self.tile_sel, ~bank)),
+            self.tile_count.eq(co.data)
+        ]
+
+        with m.If(clearing):
+            m.d.comb += [
+                cw.addr.eq(Cat(clr, bank)),
+                cw.data.eq(0),
+                cw.en.eq(1)
+            ]
+        with m.Else():
+            m.d.comb += [
+                cw.addr.eq(Cat(t1, bank)),
+                cw.data.eq(cr.data + 1),
+                cw.en.eq(m1)
+            ]
+
+        return m
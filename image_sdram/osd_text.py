@@ -0,0 +1,113 @@
+import argparse
+import serial
+
+# Writes text and settings to the text OSD over the uart.
+# Each write is 3 bytes: address high, address low and data.
+# Addresses from 0x800 set the CLUT for the palette frame buffer formats.
+# 0x408 selects the convolution kernel, 0x409 turns on auto exposure and white balance,
+# 0x40A is the motion detection threshold (0 for off), and 0x40B grabs frames, see frame_grab.py.
+# 0x40C to 0x411 and 0x600 to 0x7FF access the camera, see cam_regs.py, 0x412 sends
+# back a histogram of the last frame, 0x413 one of its blobs, and 0x414 its motion in each tile.
+
+COLS = 32
+
+KERNELS = ["off", "sobel_x", "sobel_y", "sobel", "gaussian", "sharpen", "box"]
+
+def write(ser, addr, data):
+    ser.write(bytes([addr >> 8, addr & 0xFF, data]))
+
+HISTS = ["y", "r", "g", "b"]
+
+BLOB_FIELDS = ["count", "overflows", "largest", "active", "area",
+               "min_x", "min_y", "max_x", "max_y", "cx", "cy"]
+
+# Results are sent back as items of a few bytes, low byte first
+def read_items(ser, addr, sel, count, size, what):
+    write(ser, addr, sel)
+    data = ser.read(count * size)
+    if len(data) != count * size:
+        raise SystemExit("Read {} of {} {} bytes".format(len(data), count * size, what))
+    return [int.from_bytes(data[i:i + size], "little") for i in range(0, len(data), size)]
+
+def read_hist(ser, sel, bins=32):
+    return read_items(ser, 0x412, sel, bins, 3, "histogram")
+
+def read_blob(ser, n):
+    return dict(zip(BLOB_FIELDS, read_items(ser, 0x413, n, len(BLOB_FIELDS), 3, "blob")))
+
+# Moving pixels in each 32x32 tile, as rows of 10 tiles; the camera sends 16 tiles a row
+def read_tiles(ser):
+    counts = read_items(ser, 0x414, 0, 16 * 8, 2, "motion tile")
+    return [counts[y * 16:y * 16 + 10] for y in range(8)]
+
+def write_text(ser, row, col, text, inverse=False):
+    for i, c in enumerate(text.upper()):
+        write(ser, row * COLS + col + i, (ord(c) & 0x3F) | (0x80 if inverse else 0))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("port", help="Serial port, e.g. /dev/ttyACM0")
+    parser.add_argument("--baud", type=int, default=1000000)
+    parser.add_argument("--text", help="Text to write")
+    parser.add_argument("--row", type=int, default=0)
+    parser.add_argument("--col", type=int, default=0)
+    parser.add_argument("--inverse", action="store_true", help="Write the text in inverse video")
+    parser.add_argument("--clear", action="store_true", help="Clear the text")
+    parser.add_argument("--pos", type=int, nargs=2, metavar=("X", "Y"), help="Position in units of 8 pixels")
+    parser.add_argument("--fg", type=lambda v: int(v, 0), help="Foreground color, RGB332")
+    parser.add_argument("--bg", type=lambda v: int(v, 0), help="Background color, RGB332")
+    parser.add_argument("--on", dest="on", action="store_const", const=True, help="Turn the text OSD on")
+    parser.add_argument("--off", dest="on", action="store_const", const=False, help="Turn the text OSD off")
+    parser.add_argument("--clut", type=lambda v: int(v, 0), nargs=2, metavar=("INDEX", "RGB565"), help="Set a palette entry")
+    parser.add_argument("--opaque", dest="opaque", action="store_const", const=True, help="Draw the background color")
+    parser.add_argument("--transparent", dest="opaque", action="store_const", const=False, help="Do not draw the background color")
+    parser.add_argument("--kernel", choices=KERNELS, help="Convolution kernel")
+    parser.add_argument("--auto", choices=["off", "ae", "awb", "both"], help="Auto exposure and white balance")
+    parser.add_argument("--motion", type=int, help="Motion detection threshold, 0 for off")
+    parser.add_argument("--hist", choices=HISTS, help="Print a histogram of the last frame")
+    parser.add_argument("--blobs", action="store_true", help="Print the blobs of the last frame")
+    parser.add_argument("--tiles", action="store_true", help="Print the motion in each tile of the last frame")
+    args = parser.parse_args()
+
+    ser = serial.Serial(args.port, args.baud, timeout=1)
+
+    if args.clear:
+        for i in range(0x200):
+            write(ser, i, 0x20)
+    if args.text:
+        write_text(ser, args.row, args.col, args.text, args.inverse)
+    if args.pos:
+        write(ser, 0x400, args.pos[0])
+        write(ser, 0x401, args.pos[1])
+    if args.fg is not None:
+        write(ser, 0x402, args.fg)
+    if args.bg is not None:
+        write(ser, 0x403, args.bg)
+    if args.clut:
+        write(ser, 0x800 + args.clut[0] * 2, args.clut[1] & 0xFF)
+        write(ser, 0x801 + args.clut[0] * 2, args.clut[1] >> 8)
+    if args.kernel:
+        write(ser, 0x408, KERNELS.index(args.kernel))
+    if args.auto:
+        write(ser, 0x409, ["off", "ae", "awb", "both"].index(args.auto))
+    if args.motion is not None:
+        write(ser, 0x40A, args.motion)
+    # The flags are written together, so the one not given goes back to on or transparent
+    if args.on is not None or args.opaque is not None:
+        write(ser, 0x404, (0 if args.on is False else 1) | (0 if args.opaque else 2))
+    if args.hist:
+        for i, n in enumerate(read_hist(ser, HISTS.index(args.hist))):
+            print("{:2}: {}".format(i, n))
+    if args.blobs:
+        for n in range(4):
+            b = read_blob(ser, n)
+            if n == 0:
+                print("{} blobs, largest {}, {} runs with no free slot".format(b["count"], b["largest"], b["overflows"]))
+            if b["active"]:
+                print("{}: area {}, x {}-{}, y {}-{}, centroid {},{}".format(
+                      n, b["area"], b["min_x"], b["max_x"], b["min_y"], b["max_y"], b["cx"], b["cy"]))
+    if args.tiles:
+        for row in read_tiles(ser):
+            print(" ".join("{:4}".format(n) for n in row))
+
+    ser.close()
@@ -7,17 +7,32 @@ class OV7670ConfigState(IntEnum):
     SEND_CMD = 1
     DONE     = 2
     TIMER    = 3
+    VERIFY   = 4
+    COMPARE  = 5
 
+# Sends the register writes in the ROM to the camera, until ffff; fff0 waits 10ms.
+#
+# With verify set, each register is read back after it is written, except the reset
+# of COM7, and errors counts the registers that did not match, with the last of them
+# in err_addr, err_data and err_rdata.
 class OV7670Config(Elaboratable):
     def __init__(self):
         self.sccb_ready = Signal()
+        self.sccb_rdata = Signal(8)
         self.rom_data   = Signal(16)
         self.start      = Signal()
+        self.verify     = Signal()
         self.rom_addr   = Signal(8, reset=0)
         self.done       = Signal(reset=0)
+        self.busy       = Signal()
         self.sccb_addr  = Signal(8, reset=0)
         self.sccb_data  = Signal(8, reset=0)
         self.sccb_start = Signal(reset=0)
+        self.sccb_read  = Signal(reset=0)
+        self.errors     = Signal(8, reset=0)
+        self.err_addr   = Signal(8, reset=0)
+        self.err_data   = Signal(8, reset=0)
+        self.err_rdata  = Signal(8, reset=0)
        
     def elaborate(self, platform):
         fsm_state        = Signal(3, reset=OV7670ConfigState.IDLE)
@@ -26,13 +41,16 @@ class OV7670Config(Elaboratable):
 
         m = Module()
 
+        m.d.comb += self.busy.eq(fsm_state != OV7670ConfigState.IDLE)
+
         with m.Switch(fsm_state):
             with m.Case(OV7670ConfigState.IDLE):
                 m.d.sync += self.rom_addr.eq(0)
                 with m.If(self.start):
                     m.d.sync += [
                         fsm_state.eq(OV7670ConfigState.SEND_CMD),
-                        self.done.eq(0)
+                        self.done.eq(0),
+                        self.errors.eq(0)
                     ]
             with m.Case(OV7670ConfigState.SEND_CMD):
                 with m.Switch(self.rom_data):
@@ -49,13 +67,36 @@ class OV7670Config(Elaboratable):
                         with m.If(self.sccb_ready):
                             m.d.sync += [
                                 fsm_state.eq(OV7670ConfigState.TIMER),
-                                fsm_return_state.eq(OV7670ConfigState.SEND_CMD),
                                 timer.eq(0), # one cycle delay
                                 self.rom_addr.eq(self.rom_addr + 1),
                                 self.sccb_addr.eq(self.rom_data[8:]),
                                 self.sccb_data.eq(self.rom_data[0:8]),
-                                self.sccb_start.eq(1)
+                                self.sccb_start.eq(1),
+                                self.sccb_read.eq(0)
                             ]
+                            with m.If(self.verify & ~((self.rom_data[8:] == 0x12) & self.rom_data[7])):
+                                m.d.sync += fsm_return_state.eq(OV7670ConfigState.VERIFY)
+                            with m.Else():
+                                m.d.sync += fsm_return_state.eq(OV7670ConfigState.SEND_CMD)
+            with m.Case(OV7670ConfigState.VERIFY):
+                with m.If(self.sccb_ready):
+                    m.d.sync += [
+                        fsm_state.eq(OV7670ConfigState.TIMER),
+                        fsm_return_state.eq(OV7670ConfigState.COMPARE),
+                        timer.eq(0),
+                        self.sccb_start.eq(1),
+                        self.sccb_read.eq(1)
+                    ]
+            with m.Case(OV7670ConfigState.COMPARE):
+                with m.If(self.sccb_ready):
+                    m.d.sync += fsm_state.eq(OV7670ConfigState.SEND_CMD)
+                    with m.If(self.sccb_rdata != self.sccb_data):
+                        m.d.sync += [
+                            self.errors.eq(self.errors + (self.errors != 0xff)),
+                            self.err_addr.eq(self.sccb_addr),
+                            self.err_data.eq(self.sccb_data),
+                            self.err_rdata.eq(self.sccb_rdata)
+                        ]
             with m.Case(OV7670ConfigState.DONE):
                 m.d.sync += [
                     fsm_state.eq(OV7670ConfigState.IDLE),
@@ -0,0 +1,73 @@
+import numpy as np
+
+# Simulation model of the video outputs of an OV7670 camera, sending RGB565.
+#
+# Each pixel is two bytes on p_data, red and the top of green first, with href high for
+# the active part of each line. vsync is high for v_sync lines at the start of each frame,
+# followed by v_back lines and then the active lines, and v_front lines after them.
+# The defaults are the camera's VGA timing, counted in PCLKs: 784 pixel times a line,
+# 640 of them active, and 510 lines a frame.
+#
+# frames is a function from the frame number to red, green and blue planes, indexed [y, x].
+# process() is a simulator process in a domain clocked like PCLK, but with the opposite phase,
+# as the camera changes its outputs on the falling edge.
+class OV7670Model:
+    def __init__(self, frames, width=640, height=480, h_blank=288, v_sync=3, v_back=17, v_front=10):
+        self.frames  = frames
+        self.width   = width
+        self.height  = height
+        self.h_blank = h_blank
+        self.v_sync  = v_sync
+        self.v_back  = v_back
+        self.v_front = v_front
+        self.line    = 2 * width + h_blank
+
+    # The bytes of each line of a frame
+    def frame_bytes(self, n):
+        r, g, b = (np.asarray(p, dtype=np.int64)[:self.height, :self.width] for p in self.frames(n))
+        hi = (r << 3) | (g >> 3)
+        lo = ((g & 7) << 5) | b
+        return np.stack([hi, lo], axis=2).reshape(self.height, 2 * self.width).tolist()
+
+    def process(self, href, vsync, p_data, n_frames):
+        def wait(n):
+            for i in range(n):
+                yield
+
+        for f in range(n_frames):
+            lines = self.frame_bytes(f)
+
+            yield vsync.eq(1)
+            yield from wait(self.v_sync * self.line)
+            yield vsync.eq(0)
+            yield from wait(self.v_back * self.line)
+
+            for line in lines:
+                yield href.eq(1)
+                for byte in line:
+                    yield p_data.eq(byte)
+                    yield
+                yield href.eq(0)
+                yield from wait(self.h_blank)
+
+            yield from wait(self.v_front * self.line)
+
+        # Start the next frame, so the last one is finished
+        yield vsync.eq(1)
+        yield from wait(self.line)
+
+# Synthetic frames: color bars with a white square moving across them
+def color_bars(width, height):
+    bars = [(31, 63, 31), (31, 63, 0), (0, 63, 31), (0, 63, 0),
+            (31, 0, 31), (31, 0, 0), (0, 0, 31), (0, 0, 0)]
+
+    def frames(n):
+        y, x = np.mgrid[0:height, 0:width]
+        bar = x * 8 // width
+        planes = [np.array([c[i] for c in bars])[bar] for i in range(3)]
+        size = max(height // 8, 1)
+        sx = (n * size) % max(width - size, 1)
+        square = (x >= sx) & (x < sx + size) & (y >= height // 2 - size // 2) & (y < height // 2 + size // 2)
+        return tuple(np.where(square, m, p) for p, m in zip(planes, (31, 63, 31)))
+
+    return frames
@@ -0,0 +1,102 @@
+from nmigen import *
+
+# Frame buffer pixel formats.
+# RGB332, PAL8 and PAL4 pack 2, 2 and 4 pixels into each 16-bit SDRAM word,
+# the leftmost pixel in the low bits.
+RGB565 = 0
+RGB332 = 1
+PAL8   = 2
+PAL4   = 3
+
+PIXELS_PER_WORD = {RGB565: 1, RGB332: 2, PAL8: 2, PAL4: 4}
+
+def is_palette(fmt):
+    return fmt in (PAL8, PAL4)
+
+# Expands an RGB332 value to RGB565
+def expand332(v):
+    r = v[5:8]
+    g = v[2:5]
+    b = v[:2]
+    return Cat(Cat(b[1], b, b), Cat(g, g), Cat(r[1:], r))
+
+# The default palettes: PAL8 starts as RGB332 and PAL4 as 16 grey levels
+def default_palette(fmt):
+    def rgb565(r, g, b):
+        return (r << 11) | (g << 5) | b
+
+    if fmt == PAL8:
+        return [rgb565(((i >> 5) << 2) | (i >> 6), ((i >> 2) & 7) * 9, (i & 3) * 10 + ((i & 3) > 1))
+                for i in range(256)]
+    else:
+        return [rgb565(i * 2 + (i >> 3), i * 4 + (i >> 2), i * 2 + (i >> 3)) for i in range(16)]
+
+# Converts RGB565 pixels from the camera to the frame buffer format and packs them into words.
+# Palette pixels are indexed as RGB332 for PAL8 and by brightness for PAL4,
+# to match the default palettes.
+# A word is written when all its pixels have arrived, in either direction.
+class PixelPacker(Elaboratable):
+    def __init__(self, fmt=RGB565, res_x=320):
+        # parameters
+        self.fmt   = fmt
+        self.res_x = res_x
+
+        # inputs
+        self.valid = Signal()
+        self.x     = Signal(10)
+        self.y     = Signal(9)
+        self.r     = Signal(5)
+        self.g     = Signal(6)
+        self.b     = Signal(5)
+
+        # outputs
+        self.we    = Signal()
+        self.addr  = Signal(20) # Word address in the frame
+        self.data  = Signal(16)
+
+    def elaborate(self, platform):
+        m = Module()
+
+        ppw   = PIXELS_PER_WORD[self.fmt]
+        bits  = 16 // ppw
+        shift = (ppw - 1).bit_length()
+
+        val = Signal(bits)
+
+        if self.fmt == RGB565:
+            m.d.comb += val.eq(Cat(self.b, self.g, self.r))
+        elif self.fmt in (RGB332, PAL8):
+            m.d.comb += val.eq(Cat(self.b[3:], self.g[3:], self.r[2:]))
+        else:
+            m.d.comb += val.eq((self.r + self.g + self.b)[3:])
+
+        if ppw == 1:
+            m.d.comb += [
+                self.we.eq(self.valid),
+                self.addr.eq(self.y * self.res_x + self.x),
+                self.data.eq(val)
+            ]
+        else:
+            word   = Signal(16)
+            filled = Signal(ppw)
+            lane   = Signal(shift)
+
+            m.d.comb += lane.eq(self.x[:shift])
+
+            m.d.sync += self.we.eq(0)
+
+            with m.If(self.valid):
+                m.d.sync += [
+                    self.addr.eq((self.y * self.res_x + self.x) >> shift),
+                    word.word_select(lane, bits).eq(val),
+                    filled.eq(filled | (1 << lane))
+                ]
+                with m.If((filled | (1 << lane)).all()):
+                    m.d.sync += [
+                        self.we.eq(1),
+                        filled.eq(0)
+                    ]
+
+            m.d.comb += self.data.eq(word)
+
+        return m
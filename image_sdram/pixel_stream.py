@@ -0,0 +1,57 @@
+from nmigen import *
+
+# A stream of RGB565 pixels, with their position as sideband.
+# A pixel moves from source to sink in a cycle when valid and ready are both set.
+# done is set for a cycle after the last pixel of a frame, whatever ready is.
+class PixelStream:
+    def __init__(self):
+        self.valid = Signal()
+        self.ready = Signal()
+        self.done  = Signal()
+        self.x     = Signal(10)
+        self.y     = Signal(10)
+        self.r     = Signal(5)
+        self.g     = Signal(6)
+        self.b     = Signal(5)
+
+    def payload(self):
+        return [self.x, self.y, self.r, self.g, self.b]
+
+    # Statements to connect this source to a sink
+    def connect(self, sink):
+        return [sink.valid.eq(self.valid), sink.done.eq(self.done), self.ready.eq(sink.ready)] + \
+               [d.eq(s) for d, s in zip(sink.payload(), self.payload())]
+
+# A pipeline stage with a registered output.
+#
+# The stage moves on (ce) when its output is empty or being taken, and then
+# copies the input to the output. Subclasses change the output in process(),
+# with sync statements under m.If(ce), which override the copy.
+# done is passed on a cycle later, like a pixel that is not held up.
+class Stage(Elaboratable):
+    def __init__(self):
+        self.i = PixelStream()
+        self.o = PixelStream()
+
+    def process(self, m, ce):
+        pass
+
+    def elaborate(self, platform):
+        m = Module()
+
+        ce = Signal()
+
+        m.d.comb += [
+            ce.eq(self.o.ready | ~self.o.valid),
+            self.i.ready.eq(ce)
+        ]
+
+        m.d.sync += self.o.done.eq(self.i.done)
+
+        with m.If(ce):
+            m.d.sync += [self.o.valid.eq(self.i.valid)] + \
+                        [d.eq(s) for d, s in zip(self.o.payload(), self.i.payload())]
+
+        self.process(m, ce)
+
+        return m
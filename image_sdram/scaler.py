@@ -0,0 +1,225 @@
+from nmigen import *
+
+from pixel_format import *
+
+# Streaming scaler from a src_x by src_y image to the display resolution of a VGATiming.
+#
+# Source lines are written into a ring of 4 line buffers, line n going into slot n % 4.
+# The scaler reads lines `line` and `line` + 1, so lines up to `line` + 3 can be written
+# without disturbing the display.
+#
+# The ratios are source pixels per display pixel, with 16 fraction bits,
+# and default to scaling the source to fill the display.
+# Nearest works for any ratio; bilinear is for upscaling, ratios up to 1.0.
+#
+# The output for beam position x is ready when the beam is at x, so it can go straight to
+# the VGA i_r, i_g and i_b inputs. The output pixels are RGB565.
+#
+# The line buffers hold frame buffer words in format fmt (see pixel_format.py).
+# Palette formats look the pixels up in a CLUT of RGB565 entries, which is written a
+# byte at a time with clut_addr = index * 2 + byte, low byte first. This adds a cycle of latency.
+class Scaler(Elaboratable):
+    def __init__(self, timing, src_x=320, src_y=240, write_domain="sync", fmt=RGB565):
+        # parameters
+        self.timing       = timing
+        self.src_x        = src_x
+        self.src_y        = src_y
+        self.write_domain = write_domain
+        self.fmt          = fmt
+        self.words        = src_x // PIXELS_PER_WORD[fmt] # words per line
+        self.latency      = 4 if is_palette(fmt) else 3
+
+        # inputs
+        self.x        = Signal(11)
+        self.y        = Signal(11)
+        self.bilinear = Signal()
+        self.step_x   = Signal(24, reset=(src_x << 16) // timing.x)
+        self.step_y   = Signal(24, reset=(src_y << 16) // timing.y)
+        # Line buffer write
+        self.w_slot   = Signal(2)
+        self.w_idx    = Signal(range(self.words))
+        self.w_data   = Signal(16)
+        self.w_en     = Signal()
+        # CLUT write
+        self.clut_addr = Signal(9)
+        self.clut_data = Signal(8)
+        self.clut_we   = Signal()
+
+        # outputs
+        self.line     = Signal(range(src_y)) # Source line at the top of the current display line
+        self.o_r      = Signal(5)
+        self.o_g      = Signal(6)
+        self.o_b      = Signal(5)
+
+    def elaborate(self, platform):
+        m = Module()
+
+        t = self.timing
+        frame_x = t.x + t.h_front_porch + t.h_sync_pulse + t.h_back_porch
+        frame_y = t.y + t.v_front_porch + t.v_sync_pulse + t.v_back_porch
+
+        # Two read ports, one for each of the lines being interpolated
+        ppw   = PIXELS_PER_WORD[self.fmt]
+        bits  = 16 // ppw
+        shift = (ppw - 1).bit_length()
+
+        lb = Memory(width=16, depth=4 * self.words)
+        m.submodules.ra = ra = lb.read_port()
+        m.submodules.rb = rb = lb.read_port()
+        m.submodules.w = w = lb.write_port(domain=self.write_domain)
+
+        m.d.comb += [
+            w.addr.eq(self.w_slot * self.words + self.w_idx),
+            w.data.eq(self.w_data),
+            w.en.eq(self.w_en)
+        ]
+
+        # Vertical position, updated at the start of horizontal blanking for the next line
+        vacc = Signal(24)
+        sy   = Signal(8)
+        sy1  = Signal(8)
+        fy   = Signal(4)
+
+        # It stays at zero through vertical blanking, ready for the next frame
+        with m.If(self.x == t.x):
+            with m.If(self.y >= t.y - 1):
+                m.d.sync += vacc.eq(0)
+            with m.Else():
+                m.d.sync += vacc.eq(vacc + self.step_y)
+
+        m.d.comb += [
+            sy.eq(vacc[16:]),
+            sy1.eq(Mux(sy == self.src_y - 1, sy, sy + 1)),
+            fy.eq(vacc[12:16]),
+            self.line.eq(sy)
+        ]
+
+        # Stage 1: source x of the pixel `latency` cycles ahead of the beam, and read address
+        xl   = Signal(11)
+        hacc = Signal(24)
+        sx   = Signal(10)
+        sx_p = Signal(10)
+        rx   = Signal(10)
+        pre  = Signal()
+        adv  = Signal()
+
+        m.d.comb += [
+            xl.eq(Mux(self.x >= frame_x - self.latency, self.x - (frame_x - self.latency), self.x + self.latency)),
+            pre.eq(xl >= t.x),
+            sx.eq(hacc[16:]),
+            adv.eq(pre | (sx != sx_p)),
+            # Bilinear reads one pixel ahead and keeps the previous one
+            rx.eq(Mux(self.bilinear & ~pre & (sx != self.src_x - 1), sx + 1, sx)),
+            ra.addr.eq(sy[:2] * self.words + (rx >> shift)),
+            rb.addr.eq(sy1[:2] * self.words + (rx >> shift))
+        ]
+
+        m.d.sync += sx_p.eq(sx)
+
+        with m.If(pre):
+            m.d.sync += hacc.eq(0)
+        with m.Else():
+            m.d.sync += hacc.eq(hacc + self.step_x)
+
+        # Delays a stage 1 signal to stage 2
+        def delay(sig, n):
+            for i in range(n):
+                r = Signal(len(sig))
+                m.d.sync += r.eq(sig)
+                sig = r
+            return sig
+
+        # Unpack the pixel from the word, and look it up in the CLUT for palette formats
+        pix_a = Signal(16)
+        pix_b = Signal(16)
+        lane  = delay(rx[:shift], 1) if shift else None
+
+        def unpack(data):
+            return data.word_select(lane, bits) if shift else data
+
+        if self.fmt == RGB565:
+            m.d.comb += [
+                pix_a.eq(ra.data),
+                pix_b.eq(rb.data)
+            ]
+        elif self.fmt == RGB332:
+            m.d.comb += [
+                pix_a.eq(expand332(unpack(ra.data))),
+                pix_b.eq(expand332(unpack(rb.data)))
+            ]
+        else:
+            clut = Memory(width=16, depth=2**bits, init=default_palette(self.fmt))
+            m.submodules.ca = ca = clut.read_port()
+            m.submodules.cb = cb = clut.read_port()
+            m.submodules.cw = cw = clut.write_port(granularity=8)
+
+            m.d.comb += [
+                ca.addr.eq(unpack(ra.data)),
+                cb.addr.eq(unpack(rb.data)),
+                pix_a.eq(ca.data),
+                pix_b.eq(cb.data),
+                cw.addr.eq(self.clut_addr[1:]),
+                cw.data.eq(Repl(self.clut_data, 2)),
+                cw.en.eq(Mux(self.clut_we, Mux(self.clut_addr[0], 0b10, 0b01), 0))
+            ]
+
+        # Stage 2: horizontal interpolation
+        d = self.latency - 2
+        adv2   = delay(adv, d)
+        fx2    = delay(hacc[12:16], d)
+        last_a = Signal(16)
+        last_b = Signal(16)
+        left_a = Signal(16)
+        left_b = Signal(16)
+        l_a    = Signal(16)
+        l_b    = Signal(16)
+        top    = Signal(16)
+        bot    = Signal(16)
+
+        m.d.sync += [
+            last_a.eq(pix_a),
+            last_b.eq(pix_b)
+        ]
+
+        m.d.comb += [
+            l_a.eq(Mux(adv2, last_a, left_a)),
+            l_b.eq(Mux(adv2, last_b, left_b))
+        ]
+
+        m.d.sync += [
+            left_a.eq(l_a),
+            left_b.eq(l_b)
+        ]
+
+        def lerp(a, b, f):
+            return (a * (16 - f) + b * f) >> 4
+
+        def lerp565(a, b, f):
+            return Cat(lerp(a[:5], b[:5], f)[:5], lerp(a[5:11], b[5:11], f)[:6], lerp(a[11:], b[11:], f)[:5])
+
+        with m.If(self.bilinear):
+            m.d.sync += [
+                top.eq(lerp565(l_a, pix_a, fx2)),
+                bot.eq(lerp565(l_b, pix_b, fx2))
+            ]
+        with m.Else():
+            m.d.sync += [
+                top.eq(pix_a),
+                bot.eq(pix_a)
+            ]
+
+        # Stage 3: vertical interpolation
+        out = Signal(16)
+
+        with m.If(self.bilinear):
+            m.d.sync += out.eq(lerp565(top, bot, fy))
+        with m.Else():
+            m.d.sync += out.eq(top)
+
+        m.d.comb += [
+            self.o_b.eq(out[:5]),
+            self.o_g.eq(out[5:11]),
+            self.o_r.eq(out[11:])
+        ]
+
+        return m
@@ -17,20 +17,38 @@ class SCCBState(IntEnum):
     DONE         = 11
     TIMER        = 12
 
+# Writes, or with read set reads, a camera register over SCCB.
+#
+# freq is the SIOC frequency, up to 400kHz for the OV7670. After each transfer, the bus
+# is free for a SIOC period before the next one starts.
+#
+# A read is a write of the register address, then a read of the data, which is in
+# rdata when ready goes high again. siod_in is set while the camera drives siod,
+# for its data and acknowledge bits; siod_i is sampled for the data.
 class SCCB(Elaboratable):
-    def __init__(self):
+    def __init__(self, freq=100000):
+        # parameters
+        self.freq    = freq
+
+        # inputs
         self.start   = Signal()
+        self.read    = Signal()
         self.address = Signal(8)
         self.data    = Signal(8)
+        self.siod_i  = Signal()
+
+        # outputs
         self.ready   = Signal(reset=1)
+        self.rdata   = Signal(8)
         self.sioc_oe = Signal(reset=0)
         self.siod_oe = Signal(reset=0)
+        self.siod_in = Signal(reset=0)
 
     def elaborate(self, platform):
         m = Module()
         
         camera_addr = 0x42
-        sccb_freq   = 100000
+        sccb_freq   = self.freq
 
         fsm_state        = Signal(4, reset=0)
         fsm_return_state = Signal(4, reset=0)
@@ -40,23 +58,29 @@ class SCCB(Elaboratable):
         byte_counter     = Signal(2, reset=0)
         tx_byte          = Signal(8, reset=0)
         byte_index       = Signal(4, reset=0)
+        reading          = Signal()
+        phase            = Signal() # the read phase of a read
+        rx_byte          = Signal() # the byte is read from the camera
 
         delay1 = int(platform.default_clk_frequency / (4 * sccb_freq))
-        delay2 = int((2 * platform.default_clk_frequency) / sccb_freq)
+        delay2 = int(platform.default_clk_frequency / sccb_freq)
 
         with m.Switch(fsm_state):
             with m.Case(SCCBState.IDLE):
                 m.d.sync += [
                     byte_index.eq(0),
                     byte_counter.eq(0),
+                    phase.eq(0),
                     self.sioc_oe.eq(0),
-                    self.siod_oe.eq(0)
+                    self.siod_oe.eq(0),
+                    self.siod_in.eq(0)
                 ]
                 with m.If(self.start):
                     m.d.sync += [
                         fsm_state.eq(SCCBState.START_SIGNAL),
                         latched_address.eq(self.address),
                         latched_data.eq(self.data),
+                        reading.eq(self.read),
                         self.ready.eq(0)
                     ]
                 with m.Else():
@@ -72,17 +96,19 @@ class SCCB(Elaboratable):
             with m.Case(SCCBState.LOAD_BYTE):
                 m.d.sync += [
                     byte_counter.eq(byte_counter + 1),
-                    byte_index.eq(0)
+                    byte_index.eq(0),
+                    rx_byte.eq(phase & (byte_counter == 1))
                 ]
-                with m.If(byte_counter == 3):
+                # Each phase of a read has two bytes, and a write has three
+                with m.If(byte_counter == Mux(reading, 2, 3)):
                     m.d.sync += fsm_state.eq(SCCBState.END_SIGNAL_1)
                 with m.Else():
                     m.d.sync += fsm_state.eq(SCCBState.TX_BYTE_1)
                 with m.Switch(byte_counter):
                     with m.Case(0):
-                        m.d.sync += tx_byte.eq(camera_addr)
+                        m.d.sync += tx_byte.eq(Mux(phase, camera_addr | 1, camera_addr))
                     with m.Case(1):
-                        m.d.sync += tx_byte.eq(latched_address)
+                        m.d.sync += tx_byte.eq(Mux(phase, 0xff, latched_address))
                     with m.Case(2):
                         m.d.sync += tx_byte.eq(latched_data)
                     with m.Default():
@@ -98,7 +124,9 @@ class SCCB(Elaboratable):
                 m.d.sync += [
                     fsm_state.eq(SCCBState.TIMER),
                     fsm_return_state.eq(SCCBState.TX_BYTE_3),
-                    timer.eq(delay1)
+                    timer.eq(delay1),
+                    # Released for the data bits read, and the acknowledge of bytes sent
+                    self.siod_in.eq(Mux(rx_byte, byte_index != 8, byte_index == 8))
                 ]
                 with m.If(byte_index == 8):
                     m.d.sync += self.siod_oe.eq(0)
@@ -116,6 +144,8 @@ class SCCB(Elaboratable):
                     tx_byte.eq(tx_byte << 1),
                     byte_index.eq(byte_index + 1)
                 ]
+                with m.If(rx_byte & (byte_index != 8)):
+                    m.d.sync += self.rdata.eq(Cat(self.siod_i, self.rdata[:7]))
                 with m.If(byte_index == 8):
                     m.d.sync += fsm_state.eq(SCCBState.LOAD_BYTE)
                 with m.Else():
@@ -132,7 +162,8 @@ class SCCB(Elaboratable):
                     fsm_state.eq(SCCBState.TIMER),
                     fsm_return_state.eq(SCCBState.END_SIGNAL_3),
                     timer.eq(delay1),
-                    self.siod_oe.eq(1)
+                    self.siod_oe.eq(1),
+                    self.siod_in.eq(0)
                 ]
             with m.Case(SCCBState.END_SIGNAL_3):
                 m.d.sync += [
@@ -151,10 +182,17 @@ class SCCB(Elaboratable):
             with m.Case(SCCBState.DONE):
                 m.d.sync += [
                     fsm_state.eq(SCCBState.TIMER),
-                    fsm_return_state.eq(SCCBState.IDLE),
                     timer.eq(delay2),
-                    byte_counter.eq(0)                    
+                    byte_counter.eq(0)
                 ]
+                # After the address of a read, start again for the data
+                with m.If(reading & ~phase):
+                    m.d.sync += [
+                        fsm_return_state.eq(SCCBState.START_SIGNAL),
+                        phase.eq(1)
+                    ]
+                with m.Else():
+                    m.d.sync += fsm_return_state.eq(SCCBState.IDLE)
             with m.Case(SCCBState.TIMER):
                 with m.If(timer == 0):
                     m.d.sync += [
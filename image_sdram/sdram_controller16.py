@@ -4,7 +4,10 @@ from nmigen.build import Pins, Attrs
 from sdram16 import Sdram
 
 class sdram_controller(Elaboratable):
-    def __init__(self):
+    def __init__(self, burst_length=1):
+        # parameters
+        self.burst_length = burst_length
+
         # inputs
         self.address   = Signal(20) # word address
         self.req_read  = Signal()
@@ -14,7 +17,9 @@ class sdram_controller(Elaboratable):
         self.sync      = Signal()
 
         # outputs
-        self.data_out  = Signal(16)
+        self.data_out   = Signal(16)
+        self.data_valid = Signal()
+        self.ack        = Signal()
     
     def elaborate(self, platform):
         m = Module()
@@ -37,7 +42,7 @@ class sdram_controller(Elaboratable):
         sdram = platform.request("sdram", dir=dir_dict)
 
         # Create the controller
-        m.submodules.ctrl = ctrl = Sdram()
+        m.submodules.ctrl = ctrl = Sdram(burst_length=self.burst_length)
 
         m.d.comb += [
             # Set the chip output pins
@@ -59,7 +64,9 @@ class sdram_controller(Elaboratable):
             ctrl.sync.eq(self.sync),
             ctrl.ds.eq(C(0b11,2)),
             # Set output pins
-            self.data_out.eq(ctrl.dout)
+            self.data_out.eq(ctrl.dout),
+            self.data_valid.eq(ctrl.dout_valid),
+            self.ack.eq(ctrl.ack)
         ]
 
         # Set dq to input or output depending on sd_data_dir
@@ -0,0 +1,150 @@
+from nmigen import *
+
+from readhex import readhex
+
+# Converts ASCII text to the character codes of the font, which has the 64 characters
+# from 0x20 to 0x5F, with upper case letters only.
+def to_chars(s):
+    return [ord(c) & 0x3F for c in s.upper()]
+
+# Text overlay with cols by rows characters of 8x8 pixels.
+#
+# The character buffer and the registers are written with addr, data and we:
+# addresses below 0x400 are characters, row * cols + col, and bit 7 of a character
+# shows it in inverse video. The registers are at 0x400:
+#   0x400 x position in units of 8 pixels
+#   0x401 y position in units of 8 pixels
+#   0x402 foreground color, RGB332
+#   0x403 background color, RGB332
+#   0x404 flags: bit 0 on, bit 1 transparent background
+#
+# Each character cell needs one read of the character buffer, two cycles ahead of the beam,
+# and one read of the font, one cycle ahead. The output is registered, like OSD.
+class TextOSD(Elaboratable):
+    def __init__(self, cols=32, rows=16, font="charrom.mem", text=""):
+        assert cols & (cols - 1) == 0 and rows & (rows - 1) == 0
+        assert cols * rows <= 0x400
+
+        # parameters
+        self.cols = cols
+        self.rows = rows
+        self.font = font
+        self.text = text
+
+        # inputs
+        self.i_r  = Signal(4)
+        self.i_g  = Signal(4)
+        self.i_b  = Signal(4)
+        self.x    = Signal(10)
+        self.y    = Signal(10)
+        self.addr = Signal(11)
+        self.data = Signal(8)
+        self.we   = Signal()
+
+        # outputs
+        self.o_r  = Signal(4)
+        self.o_g  = Signal(4)
+        self.o_b  = Signal(4)
+
+    def elaborate(self, platform):
+        m = Module()
+
+        cbits = (self.cols - 1).bit_length()
+        rbits = (self.rows - 1).bit_length()
+
+        text = to_chars(self.text)
+        text = text + [0x20] * (self.cols * self.rows - len(text))
+
+        tb = Memory(width=8, depth=self.cols * self.rows, init=text)
+        m.submodules.tr = tr = tb.read_port()
+        m.submodules.tw = tw = tb.write_port()
+
+        fm = Memory(width=8, depth=512, init=readhex(self.font))
+        m.submodules.fr = fr = fm.read_port()
+
+        # Registers
+        x_pos  = Signal(7, reset=1)
+        y_pos  = Signal(7, reset=1)
+        fg     = Signal(8, reset=0xFF)
+        bg     = Signal(8, reset=0x00)
+        on     = Signal(reset=1)
+        transp = Signal(reset=1)
+
+        m.d.comb += [
+            tw.addr.eq(self.addr),
+            tw.data.eq(self.data),
+            tw.en.eq(self.we & ~self.addr[10])
+        ]
+
+        with m.If(self.we & self.addr[10]):
+            with m.Switch(self.addr[:3]):
+                with m.Case(0):
+                    m.d.sync += x_pos.eq(self.data)
+                with m.Case(1):
+                    m.d.sync += y_pos.eq(self.data)
+                with m.Case(2):
+                    m.d.sync += fg.eq(self.data)
+                with m.Case(3):
+                    m.d.sync += bg.eq(self.data)
+                with m.Case(4):
+                    m.d.sync += [
+                        on.eq(self.data[0]),
+                        transp.eq(self.data[1])
+                    ]
+
+        # Position relative to the window, for the beam and two cycles ahead of it
+        cx = Signal(11)
+        cy = Signal(11)
+        xa = Signal(11)
+
+        m.d.comb += [
+            cx.eq(self.x - Cat(C(0, 3), x_pos)),
+            cy.eq(self.y - Cat(C(0, 3), y_pos)),
+            xa.eq(cx + 2),
+            tr.addr.eq(Cat(xa[3:3 + cbits], cy[3:3 + rbits])),
+            fr.addr.eq(Cat(cy[:3], tr.data[:6]))
+        ]
+
+        inv   = Signal()
+        shift = Signal(8)
+        cinv  = Signal()
+        bit   = Signal()
+        load  = Signal()
+
+        m.d.comb += load.eq(cx[:3] == 0)
+
+        # Inverse flag goes with the font read
+        m.d.sync += inv.eq(tr.data[7])
+
+        with m.If(load):
+            m.d.sync += [
+                shift.eq(fr.data << 1),
+                cinv.eq(inv)
+            ]
+        with m.Else():
+            m.d.sync += shift.eq(shift << 1)
+
+        m.d.comb += bit.eq(Mux(load, fr.data[7] ^ inv, shift[7] ^ cinv))
+
+        # Copy color by default
+        m.d.sync += [
+            self.o_r.eq(self.i_r),
+            self.o_g.eq(self.i_g),
+            self.o_b.eq(self.i_b)
+        ]
+
+        with m.If(on & (cx < self.cols * 8) & (cy < self.rows * 8)):
+            with m.If(bit):
+                m.d.sync += [
+                    self.o_r.eq(Cat(fg[5], fg[5:8])),
+                    self.o_g.eq(Cat(fg[2], fg[2:5])),
+                    self.o_b.eq(Cat(fg[:2], fg[:2]))
+                ]
+            with m.Elif(~transp):
+                m.d.sync += [
+                    self.o_r.eq(Cat(bg[5], bg[5:8])),
+                    self.o_g.eq(Cat(bg[2], bg[2:5])),
+                    self.o_b.eq(Cat(bg[:2], bg[:2]))
+                ]
+
+        return m
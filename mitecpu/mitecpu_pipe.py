@@ -0,0 +1,113 @@
+from nmigen import *
+from nmigen_boards.blackice_mx import *
+
+from readhex import readhex
+
+# Pipelined version of MiteCPU, with all memory reads on the rising edge of the clock.
+#
+# There are three stages: fetch reads the instruction, operand reads the data at the
+# instruction's address plus index, and execute runs the instruction. One instruction
+# completes each cycle. A taken bl is resolved in execute, so the two instructions after
+# it are dropped. index is forwarded from execute to the next instruction's address,
+# and a st to the address that the next instruction reads is forwarded to it.
+#
+# With delay_bits set, the pipeline steps once every 2**delay_bits cycles, to see the
+# result on the leds; with 0, it runs at the full clock rate.
+class PipelinedMiteCPU(Elaboratable):
+    def __init__(self, delay_bits=22):
+        # parameters
+        self.delay_bits = delay_bits
+
+    def elaborate(self, platform):
+        leds   = Cat([platform.request("led", i) for i in range(4)])
+
+        # Read in program and print it in hex
+        prog = readhex()
+        print(" ".join(hex(n) for n in prog))
+
+        # Code and data storage
+        code = Memory(width=11, depth=256, init=prog)
+        data = Memory(width=8, depth=256)
+
+        m = Module()
+
+        m.submodules.cr = cr = code.read_port(transparent=False)
+        m.submodules.dr = dr = data.read_port(transparent=False)
+        m.submodules.dw = dw = data.write_port()
+
+        # Registers and other signals
+        pc      = Signal(8,  reset=0) # Address of the instruction being fetched
+        o_valid = Signal(reset=0)     # Operand stage has an instruction
+        o_instr = Signal(11)          # Instruction in the operand stage
+        o_addr  = Signal(8)           # Its data address
+        e_valid = Signal(reset=0)     # Execute stage has an instruction
+        e_instr = Signal(11, reset=0) # Instruction in the execute stage
+        e_addr  = Signal(8)           # Its data address
+        fwd     = Signal()            # Its operand is the one just stored
+        acc     = Signal(8,  reset=0) # Accumulator
+        op      = Signal(8)           # The operand
+        index   = Signal(8)           # Index for the instruction in the operand stage
+        taken   = Signal()            # Branch taken
+        step    = Signal()            # Advance the pipeline
+
+        # Delay counter to execute slowly and see result on leds
+        if self.delay_bits:
+            delay = Signal(self.delay_bits)
+            m.d.sync += delay.eq(delay + 1)
+            m.d.comb += step.eq(delay == 0)
+        else:
+            m.d.comb += step.eq(1)
+
+        opcode = e_instr[8:]
+
+        m.d.comb += [
+            # Fetch
+            cr.addr.eq(pc),
+            cr.en.eq(step),
+            o_instr.eq(cr.data),
+
+            # Operand, indexed by the instruction being executed
+            index.eq(Mux(e_valid & (opcode == 5), op, 0)),
+            o_addr.eq(o_instr[:8] + index),
+            dr.addr.eq(o_addr),
+            dr.en.eq(step),
+
+            # Execute
+            op.eq(Mux(fwd, acc, dr.data)),
+            taken.eq(e_valid & (opcode == 4) & acc[7]),
+            dw.addr.eq(e_addr),
+            dw.data.eq(acc),
+            dw.en.eq(step & e_valid & (opcode == 3))
+        ]
+
+        with m.If(step):
+            m.d.sync += [
+                pc.eq(Mux(taken, e_instr[:8], pc + 1)),
+                o_valid.eq(~taken),
+                e_valid.eq(o_valid & ~taken),
+                e_instr.eq(o_instr),
+                e_addr.eq(o_addr),
+                fwd.eq(dw.en & (e_addr == o_addr))
+            ]
+
+            # Decode and execute current instruction
+            with m.If(e_valid):
+                with m.Switch(opcode):
+                    with m.Case("000"):
+                        m.d.sync += acc.eq(acc + op)
+                    with m.Case("001"):
+                        m.d.sync += acc.eq(acc - op)
+                    with m.Case("110"):
+                        m.d.sync += acc.eq(acc & op)
+                    with m.Case("010"):
+                        m.d.sync += acc.eq(e_instr[:8])
+                    with m.Case("011"):
+                        # data[0] is leds
+                        with m.If(e_instr[:8] == 0):
+                            m.d.sync += leds.eq(acc)
+
+        return m
+
+if __name__ == "__main__":
+    platform = BlackIceMXPlatform()
+    platform.build(PipelinedMiteCPU(), do_program=True)
@@ -4,6 +4,10 @@ from nmigen_boards.blackice_mx import *
 
 from oled_init import *
 
+# Shows VGA style input on an SSD1331.
+# Scanlines are double buffered in block RAM, and each frame is sent as one burst:
+# the column and row window, then all the pixels. The output only waits at the start
+# of a line, until the input has finished writing it.
 class OLED_VGA(Elaboratable):
     def __init__(self, color_bits=8):
         self.i_clk_en = Signal()
@@ -21,8 +25,9 @@ class OLED_VGA(Elaboratable):
     def elaborate(self, platform: Platform) -> Module:
         m = Module()
 
-        # Constants
-        C_last_init_send_as_data = C(1, 16)
+        # Window for a whole frame: column 0 to 95, row 0 to 63
+        window = Array(C(b, 8) for b in [OLED_INIT.SET_COLUMN_ADDRESS.value, 0x00, 0x5F,
+                                         OLED_INIT.SET_ROW_ADDRESS.value, 0x00, 0x3F])
 
         # Internal signals
         R_reset_cnt = Signal(2, reset=0)
@@ -33,11 +38,26 @@ class OLED_VGA(Elaboratable):
         # (0)           -- spi clock cycle
         R_spi_data = Signal(8)
         R_dc       = Signal(reset=0) # 0 = command, 1 = data
-        R_x        = Signal(7, reset=1)
-        R_y        = Signal(6, reset=1)
+        R_run      = Signal(reset=0) # Initialization done
+        R_cmd      = Signal(3, reset=0) # Window command byte, len(window) when sending pixels
+        R_x        = Signal(7, reset=0)
+        R_y        = Signal(6, reset=0)
         R_x_in     = Signal(7)
         R_y_in     = Signal(6)
-        R_scanline = Array(Signal(8) for _ in range(96))
+        line_ready = Signal()
+
+        # Two scanlines in block RAM: the input writes one while the other is sent
+        scanlines = Memory(width=8, depth=256)
+        m.submodules.rp = rp = scanlines.read_port()
+        m.submodules.wp = wp = scanlines.write_port()
+
+        m.d.comb += [
+            rp.addr.eq(Cat(R_x, R_y[0])),
+            wp.addr.eq(Cat(R_x_in, R_y_in[0])),
+            wp.data.eq(self.i_pixel),
+            # Line R_y is complete when the input has moved on to the next one
+            line_ready.eq(R_y_in == (R_y + 1)[:6])
+        ]
 
         # Track signal's pixel coordinates and buffer one line.
         with m.If(self.i_clk_pixel_ena):
@@ -48,7 +68,7 @@ class OLED_VGA(Elaboratable):
                     m.d.sync += R_x_in.eq(0)
                 with m.Else():
                     with m.If(self.i_blank == 0):
-                        m.d.sync += R_scanline[R_x_in].eq(self.i_pixel)
+                        m.d.comb += wp.en.eq(1)
 
                         # If R_x_in == 95
                         with m.If(R_x_in == 0b101_1111):
@@ -59,33 +79,44 @@ class OLED_VGA(Elaboratable):
 
         with m.If(R_reset_cnt[-2:] != 0b10):
             m.d.sync += R_reset_cnt.eq(R_reset_cnt + 1)
-        with m.Elif(R_init_cnt[4:] != len(oled_init_seq)):
-            # Load new byte (either from init sequence or next pixel).
-            with m.If(R_init_cnt[:4] == 0):
-                with m.If(R_y_in == R_y):
-                    m.d.sync += R_init_cnt.eq(R_init_cnt + 1)
-                    with m.If(R_dc == 0):
-                        # Init sequence.
-                        m.d.sync += R_spi_data.eq(oled_init_seq[R_init_cnt[4:]])
-                    with m.Else():
-                        m.d.sync += R_spi_data.eq(R_scanline[R_x])
-                        # Tracks XY pixel coordinates currently written to SPI display.
-                        with m.If(R_x == 0b101_1111): # If R_x = 95
-                            m.d.sync += R_x.eq(0)
-                            m.d.sync += R_y.eq(R_y + 1)
-                        with m.Else():
-                            m.d.sync += R_x.eq(R_x + 1)
-            with m.Else():
-                with m.If(self.i_clk_en == 1):
-                    m.d.sync += R_init_cnt.eq(R_init_cnt + 1)
-                    with m.If(R_init_cnt[0] == 0): # Shift one bit to the right.
-                        m.d.sync += R_spi_data.eq(Cat(0b0, R_spi_data[:-1]))
-
-        # Send last N bytes as data.
-        with m.If(R_init_cnt[4:] == ((len(oled_init_seq) - 1) - (C_last_init_send_as_data - 1))):
-            m.d.sync += R_dc.eq(1)
-        with m.If(R_init_cnt[4:] == (len(oled_init_seq) - 1)):
-            m.d.sync += R_init_cnt[4:].eq((len(oled_init_seq) - 1) - (C_last_init_send_as_data - 1))
+        with m.Elif(R_init_cnt[:4] == 0):
+            # Load new byte (from init sequence, window command or next pixel).
+            with m.If(~R_run):
+                # Init sequence.
+                m.d.sync += [
+                    R_init_cnt.eq(R_init_cnt + 1),
+                    R_spi_data.eq(oled_init_seq[R_init_cnt[4:]])
+                ]
+                with m.If(R_init_cnt[4:] == len(oled_init_seq) - 1):
+                    m.d.sync += R_run.eq(1)
+            with m.Elif(R_cmd != len(window)):
+                # Set the window at the start of each frame, so the display stays in step.
+                m.d.sync += [
+                    R_init_cnt.eq(R_init_cnt + 1),
+                    R_spi_data.eq(window[R_cmd]),
+                    R_dc.eq(0),
+                    R_cmd.eq(R_cmd + 1)
+                ]
+            with m.Elif((R_x != 0) | line_ready):
+                # Pixels are streamed without stopping within a line.
+                m.d.sync += [
+                    R_init_cnt.eq(R_init_cnt + 1),
+                    R_spi_data.eq(rp.data),
+                    R_dc.eq(1)
+                ]
+                # Tracks XY pixel coordinates currently written to SPI display.
+                with m.If(R_x == 0b101_1111): # If R_x = 95
+                    m.d.sync += R_x.eq(0)
+                    m.d.sync += R_y.eq(R_y + 1)
+                    with m.If(R_y == 0b11_1111): # End of frame
+                        m.d.sync += R_cmd.eq(0)
+                with m.Else():
+                    m.d.sync += R_x.eq(R_x + 1)
+        with m.Else():
+            with m.If(self.i_clk_en == 1):
+                m.d.sync += R_init_cnt.eq(R_init_cnt + 1)
+                with m.If(R_init_cnt[0] == 0): # Shift one bit to the right.
+                    m.d.sync += R_spi_data.eq(Cat(0b0, R_spi_data[:-1]))
 
         m.d.comb += [
             self.o_spi_resn.eq(~R_reset_cnt[-2]),
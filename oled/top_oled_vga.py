@@ -1,8 +1,14 @@
+import os
+import sys
+
 from nmigen import *
 from nmigen.build import *
 from nmigen_boards.blackice_mx import *
 
-from vga import VGA
+# Use the shared video package in the top level directory
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from video_common import VGA
 from oled_vga import *
 
 oled_pmod = [
@@ -65,9 +71,7 @@ class Top_OLED_VGA(Elaboratable):
             resolution_y      = 64,
             vsync_front_porch = 1,
             vsync_pulse       = 1,
-            vsync_back_porch  = 1,
-            bits_x            = 12,
-            bits_y            = 8
+            vsync_back_porch  = 1
         ))
         m.d.comb += [
             vga.i_clk_en.eq(1),
@@ -41,12 +41,11 @@ class CamTest(Elaboratable):
         m.submodules.camread = camread
 
         # Add ST7789 submodule
-        st7789 = ST7789(150000)
+        st7789 = ST7789(150000, full_rate=True)
         m.submodules.st7789 = st7789
 
         # OLED
-        oled  = platform.request("oled")
-        oled_clk  = oled.oled_clk
+        oled  = platform.request("oled", dir={"oled_clk": "-"})
         oled_mosi = oled.oled_mosi
         oled_dc   = oled.oled_dc
         oled_resn = oled.oled_resn
@@ -57,12 +56,20 @@ class CamTest(Elaboratable):
         m.submodules.r = r = buffer.read_port()
         m.submodules.w = w = buffer.write_port()
         
+        # SPI clock from an SB_IO in DDR output mode, for one bit per clock
+        m.submodules.oled_clk = Instance("SB_IO",
+            p_PIN_TYPE     = C(0b010000, 6),
+            p_IO_STANDARD  = "SB_LVCMOS",
+            io_PACKAGE_PIN = oled.oled_clk.io,
+            i_OUTPUT_CLK   = ClockSignal(),
+            i_D_OUT_0      = st7789.spi_clk_ddr[0],
+            i_D_OUT_1      = st7789.spi_clk_ddr[1])
+
         # Camera config
         camconfig = CamConfig()
         m.submodules.camconfig = camconfig
 
         m.d.comb += [
-            oled_clk .eq(st7789.spi_clk),
             oled_mosi.eq(st7789.spi_mosi),
             oled_dc  .eq(st7789.spi_dc),
             oled_resn.eq(st7789.spi_resn),
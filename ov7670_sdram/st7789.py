@@ -1,7 +1,6 @@
 from nmigen import *
-from readhex import readhex
+from nmigen.utils import bits_for
 
-C_CLK_MHZ      = 25
 C_COLOR_BITS   = 16
 C_X_SIZE       = 240
 C_Y_SIZE       = 240
@@ -12,19 +11,66 @@ C_CLK_POLARITY = 1
 C_NOP          = 0
 C_INIT_FILE    = "st7789_linit.mem"
 C_INIT_SIZE    = 38
+C_Y_OFFSET     = 80 # First row, as set by RASET in the init file
 
+# Window states
+W_IDLE         = 0
+W_CMD          = 1
+W_PIXELS       = 2
+W_LAST         = 3
+
+def readhex(filename):
+    f = open(filename,"r")
+    l = []
+    while True:
+        s = f.readline()
+        if s:
+            if s[0] != "/":
+                l.append(int(s,16))
+        else:
+            break
+    f.close()
+    return l
+
+# With windowed=False, pixels are sent continuously after initialization, for the whole display.
+# With windowed=True, nothing is sent until win_start is set, and then the rectangle from
+# (win_x0, win_y0) to (win_x1, win_y1) is written, using CASET, RASET and RAMWR.
+# win_busy is set until the rectangle has been sent.
+#
+# With full_rate=False, spi_clk is generated in the fabric at half the clock rate.
+# With full_rate=True, a bit is sent every clock: spi_clk is not used, and spi_clk_ddr
+# goes to the D_OUT_0 and D_OUT_1 inputs of an SB_IO in DDR output mode, clocked by the
+# same clock. spi_mosi, spi_dc and spi_csn are registered to line up with the SB_IO register.
+#
+# The SPI clock does not have to be sync: use a DomainRenamer and set clk_freq,
+# which is used for the delays, if it is not the platform default clock.
+# The ST7789 takes up to 62.5MHz.
+#
+# The pixel is latched when its first byte is loaded, and next_pixel is set then, so the
+# next color is needed a whole pixel time later.
 class ST7789(Elaboratable):
-    def __init__(self, reset_delay):
+    def __init__(self, reset_delay, reset_period=100000, windowed=False, full_rate=False, clk_freq=None):
         self.color          = Signal(C_COLOR_BITS)
         self.x              = Signal(C_X_BITS)
         self.y              = Signal(C_Y_BITS)
         self.next_pixel     = Signal()
         self.spi_csn        = Signal()
         self.spi_clk        = Signal()
+        self.spi_clk_ddr    = Signal(2)
         self.spi_mosi       = Signal()
         self.spi_dc         = Signal()
         self.spi_resn       = Signal()
+        self.win_x0         = Signal(C_X_BITS)
+        self.win_y0         = Signal(C_Y_BITS)
+        self.win_x1         = Signal(C_X_BITS)
+        self.win_y1         = Signal(C_Y_BITS)
+        self.win_start      = Signal()
+        self.win_busy       = Signal()
         self.reset_delay    = reset_delay
+        self.reset_period   = reset_period
+        self.windowed       = windowed
+        self.full_rate      = full_rate
+        self.clk_freq       = clk_freq
 
     # Used for simulation
     def ports(self):
@@ -34,40 +80,93 @@ class ST7789(Elaboratable):
     def elaborate(self, platform):
         m = Module()
 
-        index        = Signal(11, reset = 0)
+        C_CLK_MHZ = int((self.clk_freq or platform.default_clk_frequency) / 1000000)
+
+        # Bits of index that count clocks in a byte
+        b = 3 if self.full_rate else 4
+
+        index        = Signal(7 + b, reset = 0)
         data         = Signal(8,  reset = C_NOP)
         dc           = Signal(1,  reset = 1)
         byte_toggle  = Signal(1,  reset = 0)
         init         = Signal(1,  reset = 1)
         num_args     = Signal(5,  reset = 0)
-        delay_cnt    = Signal(28, reset = self.reset_delay * C_CLK_MHZ)
+        delay_cnt    = Signal(bits_for(self.reset_delay * C_CLK_MHZ), reset = self.reset_delay * C_CLK_MHZ)
+        reset_cnt    = Signal(bits_for(self.reset_period * C_CLK_MHZ), reset = self.reset_period * C_CLK_MHZ)
         arg          = Signal(6,  reset = 1)
         delay_set    = Signal(1,  reset = 0)
         last_cmd     = Signal(8,  reset = 0)
-        resn         = Signal(1,  reset = 0)
+        resn         = Signal(1,  reset = 1)
         clken        = Signal(1,  reset = 0)
         next_byte    = Signal(8)
+        x0           = Signal(C_X_BITS)
+        y0           = Signal(C_Y_BITS)
+        x1           = Signal(C_X_BITS)
+        y1           = Signal(C_Y_BITS)
+        pending      = Signal(1,  reset = 0)
+        wstate       = Signal(2,  reset = W_IDLE)
+        cmd          = Signal(4,  reset = 0)
+        pixel_lo     = Signal(8)
+        last_pixel   = Signal(1,  reset = 0)
 
         init_data = readhex(C_INIT_FILE)
         oled_init = Memory(width=8, depth=C_INIT_SIZE, init = init_data)
         
         m.d.comb += [
              self.spi_resn.eq(resn),
-             self.spi_csn.eq(~clken),
-             self.spi_dc.eq(dc),
-             self.spi_clk.eq(((index[0] ^ ~C_CLK_PHASE) | ~clken) ^ ~C_CLK_POLARITY),
-             self.spi_mosi.eq(data[7]),
-             next_byte.eq(oled_init[index[4:]])
+             next_byte.eq(oled_init[index[b:]])
+        ]
+
+        if self.full_rate:
+            # Clock low for the first half of each bit, and idle high
+            m.d.comb += self.spi_clk_ddr.eq(Cat(~clken, C(1, 1)))
+            m.d.sync += [
+                self.spi_csn.eq(~clken),
+                self.spi_dc.eq(dc),
+                self.spi_mosi.eq(data[7])
+            ]
+        else:
+            m.d.comb += [
+                self.spi_csn.eq(~clken),
+                self.spi_dc.eq(dc),
+                self.spi_clk.eq(((index[0] ^ ~C_CLK_PHASE) | ~clken) ^ ~C_CLK_POLARITY),
+                self.spi_mosi.eq(data[7])
+            ]
+
+        # Window commands: CASET x0 x1, RASET y0 y1, RAMWR
+        y0_row = Signal(9)
+        y1_row = Signal(9)
+        m.d.comb += [
+            y0_row.eq(y0 + C_Y_OFFSET),
+            y1_row.eq(y1 + C_Y_OFFSET),
+            self.win_busy.eq(pending | (wstate != W_IDLE))
         ]
+        cmd_data = Array([C(0x2A, 8), C(0, 8), x0, C(0, 8), x1,
+                          C(0x2B, 8), y0_row[8:], y0_row[:8], y1_row[8:], y1_row[:8],
+                          C(0x2C, 8), C(0, 8), C(0, 8), C(0, 8), C(0, 8), C(0, 8)])
 
-        with m.If(delay_cnt[-1] == 0): # Delay
+        with m.If(self.win_start & ~self.win_busy):
+            m.d.sync += [
+                x0.eq(self.win_x0),
+                y0.eq(self.win_y0),
+                x1.eq(self.win_x1),
+                y1.eq(self.win_y1),
+                pending.eq(1)
+            ]
+
+        with m.If(reset_cnt >  0): # Reset period
+            m.d.sync += [
+                reset_cnt.eq(reset_cnt - 1),
+                resn.eq(0)
+            ]
+        with m.Elif(delay_cnt > 0): # Delay
             m.d.sync += [
                 delay_cnt.eq(delay_cnt - 1),
                 resn.eq(1)
             ]
-        with m.If(index[4:] != C_INIT_SIZE):
+        with m.Elif(index[b:] != C_INIT_SIZE):
             m.d.sync += index.eq(index+1)
-            with m.If(index[0:4] == 0): # Start of byte
+            with m.If(index[0:b] == 0): # Start of byte
                 with m.If(init): # Still initialization
                     m.d.sync += [
                         dc.eq(0),
@@ -104,35 +203,101 @@ class ST7789(Elaboratable):
                             delay_set.eq(0),
                             arg.eq(0)
                         ]
-                with m.Else(): # Send pixels and set x, y and next_pixel
-                    m.d.sync += [
-                        dc.eq(1),
-                        byte_toggle.eq(~byte_toggle),
-                        clken.eq(1)
-                    ]
-                    with m.If(byte_toggle):
+                with m.Else():
+                    if not self.windowed: # Send pixels and set x, y and next_pixel
                         m.d.sync += [
-                            data.eq(self.color[0:8]),
-                            self.next_pixel.eq(1)
+                            dc.eq(1),
+                            byte_toggle.eq(~byte_toggle),
+                            clken.eq(1),
+                            index[b:].eq(0)
                         ]
-                        with m.If(self.x == C_X_SIZE - 1):
-                            m.d.sync += self.x.eq(0)
-                            with m.If(self.y == C_Y_SIZE -1):
-                                m.d.sync += self.y.eq(0)
-                            with m.Else():
-                               m.d.sync += self.y.eq(self.y + 1)
+                        with m.If(byte_toggle):
+                            m.d.sync += data.eq(pixel_lo)
                         with m.Else():
-                            m.d.sync += self.x.eq(self.x + 1)
-                    with m.Else():
-                        m.d.sync += data.eq(self.color[8:])
+                            m.d.sync += [
+                                data.eq(self.color[8:]),
+                                pixel_lo.eq(self.color[0:8]),
+                                self.next_pixel.eq(1)
+                            ]
+                            with m.If(self.x == C_X_SIZE - 1):
+                                m.d.sync += self.x.eq(0)
+                                with m.If(self.y == C_Y_SIZE -1):
+                                    m.d.sync += self.y.eq(0)
+                                with m.Else():
+                                   m.d.sync += self.y.eq(self.y + 1)
+                            with m.Else():
+                                m.d.sync += self.x.eq(self.x + 1)
+                    else: # Send windows
+                        m.d.sync += index[b:].eq(0)
+                        with m.Switch(wstate):
+                            with m.Case(W_IDLE):
+                                m.d.sync += [
+                                    data.eq(C_NOP),
+                                    clken.eq(0)
+                                ]
+                                with m.If(pending):
+                                    m.d.sync += [
+                                        pending.eq(0),
+                                        cmd.eq(0),
+                                        wstate.eq(W_CMD)
+                                    ]
+                            with m.Case(W_CMD): # CASET, RASET and RAMWR with their arguments
+                                m.d.sync += [
+                                    data.eq(cmd_data[cmd]),
+                                    dc.eq(~((cmd == 0) | (cmd == 5) | (cmd == 10))),
+                                    clken.eq(1),
+                                    cmd.eq(cmd + 1)
+                                ]
+                                with m.If(cmd == 10):
+                                    m.d.sync += [
+                                        self.x.eq(x0),
+                                        self.y.eq(y0),
+                                        byte_toggle.eq(0),
+                                        last_pixel.eq(0),
+                                        wstate.eq(W_PIXELS)
+                                    ]
+                            with m.Case(W_PIXELS):
+                                m.d.sync += [
+                                    dc.eq(1),
+                                    byte_toggle.eq(~byte_toggle)
+                                ]
+                                with m.If(byte_toggle):
+                                    m.d.sync += data.eq(pixel_lo)
+                                    with m.If(last_pixel):
+                                        m.d.sync += wstate.eq(W_LAST)
+                                with m.Else():
+                                    m.d.sync += [
+                                        data.eq(self.color[8:]),
+                                        pixel_lo.eq(self.color[0:8]),
+                                        self.next_pixel.eq(1)
+                                    ]
+                                    with m.If(self.x == x1):
+                                        m.d.sync += self.x.eq(x0)
+                                        with m.If(self.y == y1):
+                                            m.d.sync += last_pixel.eq(1)
+                                        with m.Else():
+                                            m.d.sync += self.y.eq(self.y + 1)
+                                    with m.Else():
+                                        m.d.sync += self.x.eq(self.x + 1)
+                            with m.Case(W_LAST): # Last byte has been sent
+                                m.d.sync += [
+                                    data.eq(C_NOP),
+                                    clken.eq(0),
+                                    wstate.eq(W_IDLE)
+                                ]
             with m.Else(): # Shift out byte
                 m.d.sync += self.next_pixel.eq(0)
-                with m.If(index[0] == 0):
+                if self.full_rate:
                     m.d.sync += data.eq(Cat(0b0,data[0:7]))
+                else:
+                    with m.If(index[0] == 0):
+                        m.d.sync += data.eq(Cat(0b0,data[0:7]))
         with m.Else(): # Initialization done, start sending pixels
+            # No byte is loaded in this cycle, so stop the clock
             m.d.sync += [
                 init.eq(0),
-                index[4:].eq(0)
+                clken.eq(0),
+                index[b:].eq(0)
             ]        
         
         return m
@@ -10,6 +10,7 @@ from camconfig import *
 from pll import PLL
 
 from sdram_controller16 import sdram_controller
+from display_dma import DisplayDMA
 
 oled_pmod = [
     Resource("oled", 0,
@@ -77,8 +78,8 @@ class CamTest(Elaboratable):
         m.d.comb += ResetSignal().eq(~reset.all() | btn2)
         m.d.comb += ClockSignal().eq(div[1])
 
-        # Add the SDRAM controller
-        m.submodules.mem = mem = sdram_controller()
+        # Add the SDRAM controller, reading bursts of 4 words
+        m.submodules.mem = mem = sdram_controller(burst_length=4)
 
         # Add CamRead submodule
         camread = CamRead()
@@ -111,7 +112,6 @@ class CamTest(Elaboratable):
             camread.href.eq(ov7670.cam_HREF),
             camread.vsync.eq(ov7670.cam_VSYNC),
             camread.p_clock.eq(ov7670.cam_PCLK),
-            st7789.color.eq(mem.data_out),
             camconfig.start.eq(btn1),
             ov7670.cam_SIOC.eq(camconfig.sioc),
             ov7670.cam_SIOD.eq(camconfig.siod),
@@ -120,8 +120,14 @@ class CamTest(Elaboratable):
         # FIFO for camera input, can be just a few pixels with LCD screen
         m.submodules.fifo = fifo = SyncFIFOBuffered(width=16,depth=3)
 
-        # SDRAM read and write addresses
-        raddr = Signal(20)
+        # Display DMA, streaming the frame from SDRAM to the LCD, in the SDRAM domain.
+        # It is reset with the ST7789, so the frame starts at the first pixel again. The button
+        # is held for much longer than a burst, so no words are still arriving when it is released.
+        dma_reset = Signal()
+        m.d.comb += dma_reset.eq(~reset.all() | btn2)
+        m.submodules.dma = dma = DomainRenamer("sdram")(ResetInserter(dma_reset)(DisplayDMA(width=240, height=240, burst=4)))
+
+        # SDRAM write address
         waddr = Signal(20, reset=0)
 
         # Co-ordinates in SDRAM buffer
@@ -136,14 +142,10 @@ class CamTest(Elaboratable):
         mem_wen       = Signal()
         r_mem_wen     = Signal()
         sdram_sync    = Signal()
-        r_next_pixel  = Signal()
-        r2_next_pixel = Signal()
 
         m.d.sync += [
             mem_wen.eq(fifo_ren),               # Write to memory the cycle after reading fifo
-            r_mem_wen.eq(mem_wen),              # Cycle after is when we update SDRAM buffer co-ordinates
-            r_next_pixel.eq(st7789.next_pixel), # Cycle after requesting next pixel
-            r2_next_pixel.eq(r_next_pixel)      # Cycle after that is when we do the read of SDRAM
+            r_mem_wen.eq(mem_wen)               # Cycle after is when we update SDRAM buffer co-ordinates
         ]
 
         # Sync SDRAM buffer co-ordinate with camera frame
@@ -173,17 +175,20 @@ class CamTest(Elaboratable):
         # Read from FIFO, and write to SDRAM
         m.d.comb += [
             # Sync SDRAM clock to every other cycle of sync domain
-            # Note that st7789 driver takes 32 cycles per pixel and stays in sync
             sdram_sync.eq(~div[2]),
             mem.sync.eq(sdram_sync),
             mem.init.eq(~pll.locked),   # Use pll not locked as signal to initialise SDRAM
             # Select 240 x 240 frame
             fifo_wen.eq(camread.pixel_valid & camread.col[0] & camread.row[0] & (camread.row < 480)),
-            # Avoid fifo read when next pixel is requested
-            fifo_ren.eq(~sdram_sync & fifo.r_rdy & ~r_next_pixel),
-            # Do read rather than write when next pixel is requested (2 cycles later)
-            mem_ren.eq(sdram_sync & r2_next_pixel),
-            mem.req_read.eq(mem_ren),   # Always read when pixel requested
+            fifo_ren.eq(~sdram_sync & fifo.r_rdy),
+            # Camera writes come first, and the display DMA reads in the other slots
+            mem_ren.eq(dma.req & ~mem_wen),
+            mem.req_read.eq(mem_ren),
+            dma.ack.eq(mem.ack & mem_ren),
+            dma.data_valid.eq(mem.data_valid),
+            dma.data.eq(mem.data_out),
+            dma.next_pixel.eq(st7789.next_pixel),
+            st7789.color.eq(dma.color),
             mem.data_in.eq(fifo.r_data),
             mem.req_write.eq(mem_wen), 
             # Write camera pixels to the FIFO
@@ -193,10 +198,10 @@ class CamTest(Elaboratable):
             # Read from the FIFO when ready to write to SDRAM
             fifo.r_en.eq(fifo_ren),
             # Set the SDRAM read and write addresses
-            raddr.eq((st7789.y * 240) + st7789.x),
             waddr.eq((y * 240) + (239 - x)),
-            mem.address.eq(Mux(mem_ren, raddr, waddr)),
-            leds16.eq(mem.data_out)
+            mem.address.eq(Mux(mem_ren, dma.addr, waddr)),
+            # Show the number of times the LCD has found the DMA FIFO empty
+            leds16.eq(dma.underflows)
         ]
 
         return m
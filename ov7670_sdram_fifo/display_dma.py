@@ -0,0 +1,81 @@
+from nmigen import *
+from nmigen.lib.fifo import SyncFIFOBuffered
+
+# Streams a width by height frame from SDRAM to the LCD, in the same order as the
+# ST7789 sends pixels, so the LCD does not need an SDRAM read at a fixed time for each pixel.
+#
+# Bursts of burst words are read whenever there is room for them in the FIFO,
+# counting the words that have been requested but have not arrived yet.
+# req is held until ack, and the words then arrive with data_valid.
+#
+# color is the head of the FIFO, and is popped on each rising edge of next_pixel.
+# If the FIFO is empty then, underflows is incremented and the word is dropped
+# when it arrives, so the picture stays in place.
+#
+# Use a DomainRenamer to run it in the SDRAM domain.
+class DisplayDMA(Elaboratable):
+    def __init__(self, width=240, height=240, burst=4, depth=32):
+        assert (width * height) % burst == 0
+        assert depth >= 2 * burst
+
+        # parameters
+        self.width      = width
+        self.height     = height
+        self.burst      = burst
+        self.depth      = depth
+
+        # inputs
+        self.next_pixel = Signal()
+        self.ack        = Signal()
+        self.data_valid = Signal()
+        self.data       = Signal(16)
+
+        # outputs
+        self.req        = Signal()
+        self.addr       = Signal(20)
+        self.color      = Signal(16)
+        self.underflows = Signal(16)
+
+    def elaborate(self, platform):
+        m = Module()
+
+        m.submodules.fifo = fifo = SyncFIFOBuffered(width=16, depth=self.depth)
+
+        in_flight = Signal(range(self.depth + 1)) # Words requested but not arrived
+        owed      = Signal(8)                     # Pixels sent without a word from the FIFO
+        old_np    = Signal()
+        np_edge   = Signal()
+        pop       = Signal()
+        start     = Signal()
+
+        m.d.sync += old_np.eq(self.next_pixel)
+
+        m.d.comb += [
+            np_edge.eq(self.next_pixel & ~old_np),
+            # Request a burst if it will fit
+            self.req.eq(fifo.level + in_flight + self.burst <= self.depth),
+            start.eq(self.req & self.ack),
+            fifo.w_data.eq(self.data),
+            fifo.w_en.eq(self.data_valid),
+            pop.eq(fifo.r_rdy & (np_edge | (owed != 0))),
+            fifo.r_en.eq(pop),
+            self.color.eq(fifo.r_data)
+        ]
+
+        m.d.sync += in_flight.eq(in_flight + Mux(start, self.burst, 0) - self.data_valid)
+
+        with m.If(start):
+            with m.If(self.addr == self.width * self.height - self.burst):
+                m.d.sync += self.addr.eq(0)
+            with m.Else():
+                m.d.sync += self.addr.eq(self.addr + self.burst)
+
+        with m.If(np_edge & ~fifo.r_rdy):
+            m.d.sync += [
+                owed.eq(owed + 1),
+                self.underflows.eq(self.underflows + 1)
+            ]
+        with m.Elif(pop & ~np_edge):
+            m.d.sync += owed.eq(owed - 1)
+
+        return m
@@ -1,8 +1,11 @@
 from nmigen import *
 
-# SDRAM controller with 16-bit reads and writes
+# SDRAM controller with 16-bit reads and writes.
+# Reads are bursts of burst_length words (1, 2 or 4), returned on consecutive
+# sdram clocks with dout_valid set. Writes are always single words.
 class Sdram(Elaboratable):
-    def __init__(self):
+    def __init__(self, burst_length=1):
+        assert burst_length in (1, 2, 4)
 
         # Chip interface
         self.sd_data_in  = Signal(16)
@@ -27,6 +30,11 @@ class Sdram(Elaboratable):
         self.ds          = Signal(2)
         self.oe          = Signal()
         self.we          = Signal()
+        self.ack         = Signal() # Set when oe and we are sampled
+        self.dout_valid  = Signal()
+
+        # Configuration
+        self.burst_length = burst_length
 
     def elaborate(self, platform):
 
@@ -34,7 +42,7 @@ class Sdram(Elaboratable):
 
         # Configure SDRAM access
         RASCAS_DELAY   = C(2,3)
-        BURST_LENGTH   = C(0,3)
+        BURST_LENGTH   = C(self.burst_length.bit_length() - 1, 3)
         ACCESS_TYPE    = C(0,1)
         CAS_LATENCY    = C(2,3)
         OP_MODE        = C(0,2)
@@ -87,9 +95,10 @@ class Sdram(Elaboratable):
             self.sd_data_dir.eq(mode[1]),
         ]
 
-        addr_r   = Signal(11)
-        ds_r     = Signal(2)
-        old_sync = Signal()
+        addr_r    = Signal(11)
+        ds_r      = Signal(2)
+        old_sync  = Signal()
+        burst_cnt = Signal(2)
 
         with m.If(stage.any()):
             m.d.sdram += stage.eq(stage+1)
@@ -150,14 +159,33 @@ class Sdram(Elaboratable):
                 with m.Else():
                     m.d.sdram += self.sd_dqm.eq(C(0b00,2))
 
+            # Reads keep DQM low until the end of the burst, as it masks data two clocks later
             with m.If(stage == STATE_HIGHZ):
-                m.d.sdram += [
-                    self.sd_dqm.eq(C(0b11,2)),
-                    mode[1].eq(0)
-                ]
+                m.d.sdram += mode[1].eq(0)
+                with m.If(mode[1]):
+                    m.d.sdram += self.sd_dqm.eq(C(0b11,2))
+
+            m.d.comb += self.ack.eq(stage == STATE_CMD_START)
 
             with m.If((stage == STATE_READ) & (mode != 0)):
-                m.d.sdram += self.dout.eq(self.sd_data_in)
+                m.d.sdram += [
+                    self.dout.eq(self.sd_data_in),
+                    self.dout_valid.eq(mode[0]),
+                    burst_cnt.eq(Mux(mode[0], self.burst_length - 1, 0))
+                ]
+                if self.burst_length == 1:
+                    m.d.sdram += self.sd_dqm.eq(C(0b11,2))
+            with m.Elif(burst_cnt != 0):
+                # Rest of the read burst
+                m.d.sdram += [
+                    self.dout.eq(self.sd_data_in),
+                    self.dout_valid.eq(1),
+                    burst_cnt.eq(burst_cnt - 1)
+                ]
+                with m.If(burst_cnt == 1):
+                    m.d.sdram += self.sd_dqm.eq(C(0b11,2))
+            with m.Else():
+                m.d.sdram += self.dout_valid.eq(0)
 
         return m
 
@@ -1,10 +1,14 @@
+import os
+import sys
+
 from nmigen import *
 from nmigen.build import *
 from nmigen_boards.blackice_mx import *
 
-from vga import VGA
-from vga_timings import *
-from pll import *
+# Use the shared video package in the top level directory
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from video_common import *
 
 vga_pmod = [
     Resource("vga", 0,
@@ -46,16 +50,7 @@ class Pong(Elaboratable):
             quada = encoder_pins.quadrature
             quadb = encoder_pins.in_phase
 
-            # Constants
-            pixel_f     = self.timing.pixel_freq
-            hsync_front_porch = self.timing.h_front_porch
-            hsync_pulse_width = self.timing.h_sync_pulse
-            hsync_back_porch  = self.timing.h_back_porch
-            vsync_front_porch = self.timing.v_front_porch
-            vsync_pulse_width = self.timing.v_sync_pulse
-            vsync_back_porch  = self.timing.v_back_porch
-
-            m.submodules.pll = pll = PLL(freq_in_mhz=int(platform.default_clk_frequency / 1000000), freq_out_mhz=int(pixel_f / 1000000), domain_name="pixel")
+            m.submodules.pll = pll = PLL.for_timing(self.timing, freq_in_mhz=int(platform.default_clk_frequency / 1000000))
 
             m.domains.pixel = cd_pixel = pll.domain
             m.d.comb += pll.clk_pin.eq(ClockSignal())
@@ -68,18 +63,7 @@ class Pong(Elaboratable):
             vga_vsync = Signal()
             vga_blank = Signal()
 
-            m.submodules.vga = vga = VGA(
-                resolution_x      = self.timing.x,
-                hsync_front_porch = hsync_front_porch,
-                hsync_pulse       = hsync_pulse_width,
-                hsync_back_porch  = hsync_back_porch,
-                resolution_y      = self.timing.y,
-                vsync_front_porch = vsync_front_porch,
-                vsync_pulse       = vsync_pulse_width,
-                vsync_back_porch  = vsync_back_porch,
-                bits_x            = 16, # Play around with the sizes because sometimes
-                bits_y            = 16  # a smaller/larger value will make it pass timing.
-            )
+            m.submodules.vga = vga = VGA.from_timing(self.timing)
 
             border  = Signal()
             paddle  = Signal()
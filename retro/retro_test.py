@@ -1,12 +1,15 @@
 import argparse
+import os
+import sys
 
 from nmigen import *
 from nmigen.build import *
 from nmigen_boards.ulx3s import *
 
-from vga2dvid import VGA2DVID
-from vga import VGA
-from vga_timings import *
+# Use the shared video package in the top level directory
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from video_common import VGA, VGA2DVID, VGATiming, vga_timings
 from ecp5pll import ECP5PLL
 
 from spi_osd import SpiOsd
@@ -126,12 +129,6 @@ class Top(Elaboratable):
 
             # Constants
             pixel_f           = self.timing.pixel_freq
-            hsync_front_porch = self.timing.h_front_porch
-            hsync_pulse_width = self.timing.h_sync_pulse
-            hsync_back_porch  = self.timing.h_back_porch
-            vsync_front_porch = self.timing.v_front_porch
-            vsync_pulse_width = self.timing.v_sync_pulse
-            vsync_back_porch  = self.timing.v_back_porch
 
             # Clock generator.
             m.domains.sync  = cd_sync  = ClockDomain("sync")
@@ -205,18 +202,7 @@ class Top(Elaboratable):
             with m.If(cpu.RW & (cpu.Addr == 0x2002)):
                 m.d.sync += cpu.IRQ.eq(0)
 
-            m.submodules.vga = vga = VGA(
-                resolution_x      = self.timing.x,
-                hsync_front_porch = hsync_front_porch,
-                hsync_pulse       = hsync_pulse_width,
-                hsync_back_porch  = hsync_back_porch,
-                resolution_y      = self.timing.y,
-                vsync_front_porch = vsync_front_porch,
-                vsync_pulse       = vsync_pulse_width,
-                vsync_back_porch  = vsync_back_porch,
-                bits_x            = 16, # Play around with the sizes because sometimes
-                bits_y            = 16  # a smaller/larger value will make it pass timing.
-            )
+            m.submodules.vga = vga = VGA.from_timing(self.timing)
 
             # Use 1Kb of RAM
             ram = Memory(width=8, depth=1024)
@@ -0,0 +1,81 @@
+from nmigen import *
+
+# Tracks which tiles of the frame buffer have changed, and sends them to the display.
+# Set we with the x and y of each pixel written to the frame buffer.
+# Dirty tiles are scanned in order, and each one is sent as a window to an ST7789
+# with windowed=True, when it is not busy. A tile written while it is being sent
+# is marked dirty again, so it is sent again.
+class DirtyTiles(Elaboratable):
+    def __init__(self, tile=16, width=240, height=240):
+        assert width % tile == 0 and height % tile == 0
+
+        # parameters
+        self.tile     = tile
+        self.tiles_x  = width // tile
+        self.tiles_y  = height // tile
+
+        # inputs
+        self.x        = Signal(8)
+        self.y        = Signal(8)
+        self.we       = Signal()
+        self.busy     = Signal()
+        self.all      = Signal() # Mark every tile dirty
+
+        # outputs
+        self.win_x0   = Signal(8)
+        self.win_y0   = Signal(8)
+        self.win_x1   = Signal(8)
+        self.win_y1   = Signal(8)
+        self.win_start = Signal()
+        self.pending   = Signal() # Set while any tile is dirty
+
+    def elaborate(self, platform):
+        m = Module()
+
+        tiles = self.tiles_x * self.tiles_y
+        shift = (self.tile - 1).bit_length()
+
+        dirty = Signal(tiles, reset=2**tiles - 1)
+        set_  = Signal(tiles)
+        clr   = Signal(tiles)
+
+        # Tile being scanned
+        tx    = Signal(range(self.tiles_x))
+        ty    = Signal(range(self.tiles_y))
+        idx   = Signal(range(tiles))
+
+        m.d.comb += [
+            idx.eq(ty * self.tiles_x + tx),
+            self.pending.eq(dirty.any()),
+            self.win_x0.eq(tx << shift),
+            self.win_y0.eq(ty << shift),
+            self.win_x1.eq((tx << shift) + self.tile - 1),
+            self.win_y1.eq((ty << shift) + self.tile - 1)
+        ]
+
+        with m.If(self.we):
+            m.d.comb += set_.eq(1 << ((self.y >> shift) * self.tiles_x + (self.x >> shift)))
+
+        # Send the scanned tile if it is dirty, otherwise move on
+        with m.If(dirty.bit_select(idx, 1)):
+            with m.If(~self.busy):
+                m.d.comb += [
+                    self.win_start.eq(1),
+                    clr.eq(1 << idx)
+                ]
+        with m.Else():
+            with m.If(tx == self.tiles_x - 1):
+                m.d.sync += tx.eq(0)
+                with m.If(ty == self.tiles_y - 1):
+                    m.d.sync += ty.eq(0)
+                with m.Else():
+                    m.d.sync += ty.eq(ty + 1)
+            with m.Else():
+                m.d.sync += tx.eq(tx + 1)
+
+        with m.If(self.all):
+            m.d.sync += dirty.eq(2**tiles - 1)
+        with m.Else():
+            m.d.sync += dirty.eq((dirty & ~clr) | set_)
+
+        return m
@@ -0,0 +1,98 @@
+from nmigen import *
+from nmigen.build import *
+from nmigen_boards.blackice_mx import *
+
+from st7789 import *
+from dirty_tiles import DirtyTiles
+
+oled_pmod = [
+    Resource("oled", 0,
+            Subsignal("oled_clk", Pins("1", dir="o", conn=("pmod",5)), Attrs(IO_STANDARD="SB_LVCMOS")),
+            Subsignal("oled_mosi", Pins("2", dir="o", conn=("pmod",5)), Attrs(IO_STANDARD="SB_LVCMOS")),
+            Subsignal("oled_resn", Pins("9", dir="o", conn=("pmod",5)), Attrs(IO_STANDARD="SB_LVCMOS")),
+            Subsignal("oled_dc", Pins("7", dir="o", conn=("pmod",5)), Attrs(IO_STANDARD="SB_LVCMOS")),
+            Subsignal("oled_csn", Pins("8", dir="o", conn=("pmod",5)), Attrs(IO_STANDARD="SB_LVCMOS")))
+]
+
+# Moves a 16x16 block over the chequered pattern, and only sends the tiles that change.
+class ST7789DirtyTest(Elaboratable):
+    def elaborate(self, platform):
+        led = [platform.request("led", i) for i in range(4)]
+
+        # LCD/OLED Pmod
+        oled  = platform.request("oled")
+
+        m = Module()
+        m.submodules.st7789 = st7789 = ST7789(reset_delay=100000,reset_period=100000, windowed=True)
+        m.submodules.tiles = tiles = DirtyTiles()
+
+        x = Signal(8)
+        y = Signal(8)
+
+        m.d.comb += [
+            oled.oled_clk .eq(st7789.spi_clk),
+            oled.oled_mosi.eq(st7789.spi_mosi),
+            oled.oled_dc  .eq(st7789.spi_dc),
+            oled.oled_resn.eq(st7789.spi_resn),
+            oled.oled_csn .eq(st7789.spi_csn),
+            x.eq(st7789.x),
+            y.eq(st7789.y),
+            # Connect the tile tracker to the display
+            tiles.busy.eq(st7789.win_busy),
+            st7789.win_x0.eq(tiles.win_x0),
+            st7789.win_y0.eq(tiles.win_y0),
+            st7789.win_x1.eq(tiles.win_x1),
+            st7789.win_y1.eq(tiles.win_y1),
+            st7789.win_start.eq(tiles.win_start),
+            led[0].eq(tiles.pending)
+        ]
+
+        # Block position in tiles, moved every 50ms
+        bx    = Signal(4)
+        by    = Signal(4)
+        timer = Signal(range(int(platform.default_clk_frequency // 20)))
+        mark  = Signal(2)
+
+        m.d.sync += timer.eq(timer + 1)
+        with m.If(timer == int(platform.default_clk_frequency // 20) - 1):
+            m.d.sync += [
+                timer.eq(0),
+                mark.eq(1)
+            ]
+
+        # Mark the old and the new position of the block dirty
+        with m.If(mark == 1):
+            m.d.comb += [
+                tiles.x.eq(bx << 4),
+                tiles.y.eq(by << 4),
+                tiles.we.eq(1)
+            ]
+            m.d.sync += [
+                bx.eq(Mux(bx == 14, 0, bx + 1)),
+                mark.eq(2)
+            ]
+            with m.If(bx == 14):
+                m.d.sync += by.eq(Mux(by == 14, 0, by + 1))
+        with m.Elif(mark == 2):
+            m.d.comb += [
+                tiles.x.eq(bx << 4),
+                tiles.y.eq(by << 4),
+                tiles.we.eq(1)
+            ]
+            m.d.sync += mark.eq(0)
+
+        # Draw chequered pattern, with the block in white
+        with m.If((x[4:] == bx) & (y[4:] == by)):
+            m.d.comb += st7789.color.eq(0xFFFF)
+        with m.Elif(x[4] ^ y[4]):
+            m.d.comb += st7789.color.eq(x[3:8] << 6)
+        with m.Else():
+            m.d.comb += st7789.color.eq(y[3:8] << 11)
+
+        return m
+
+if __name__ == "__main__":
+    platform = BlackIceMXPlatform()
+    platform.add_resources(oled_pmod)
+
+    platform.build(ST7789DirtyTest(), do_program=True)
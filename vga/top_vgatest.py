@@ -1,11 +1,15 @@
+import os
+import sys
+
 from nmigen import *
 from nmigen.build import *
 from nmigen_boards.blackice_mx import *
 
 from blink import Blink
-from vga import VGA
-from vga_timings import *
-from pll import *
+# Use the shared video package in the top level directory
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from video_common import *
 
 vga_pmod = [
     Resource("vga", 0,
@@ -65,26 +69,17 @@ class TopVGATest(Elaboratable):
         if platform:
             clk_in = platform.request(platform.default_clk, dir='-')[0]
 
-            # Constants
-            pixel_f     = self.timing.pixel_freq
-            hsync_front_porch = self.timing.h_front_porch
-            hsync_pulse_width = self.timing.h_sync_pulse
-            hsync_back_porch  = self.timing.h_back_porch
-            vsync_front_porch = self.timing.v_front_porch
-            vsync_pulse_width = self.timing.v_sync_pulse
-            vsync_back_porch  = self.timing.v_back_porch
-
             # Clock generator.
             m.domains.sync = cd_sync = ClockDomain("sync")
             m.d.comb += ClockSignal().eq(clk_in)
 
-            m.submodules.pll = pll = PLL(freq_in_mhz=int(platform.default_clk_frequency / 1000000), freq_out_mhz=int(pixel_f / 1000000), domain_name="pixel")
+            m.submodules.pll = pll = PLL.for_timing(self.timing, freq_in_mhz=int(platform.default_clk_frequency / 1000000))
 
             m.domains.pixel = cd_pixel = pll.domain
             m.d.comb += pll.clk_pin.eq(clk_in)
 
             #platform.add_clock_constraint(cd_sync.clk, platform.default_clk_frequency)
-            platform.add_clock_constraint(cd_pixel.clk, pixel_f)
+            platform.add_clock_constraint(cd_pixel.clk, pll.freq_actual * 1e6)
 
             # VGA signal generator.
             vga_r = Signal(8)
@@ -94,18 +89,7 @@ class TopVGATest(Elaboratable):
             vga_vsync = Signal()
             vga_blank = Signal()
 
-            m.submodules.vga = vga = VGA(
-                resolution_x      = self.timing.x,
-                hsync_front_porch = hsync_front_porch,
-                hsync_pulse       = hsync_pulse_width,
-                hsync_back_porch  = hsync_back_porch,
-                resolution_y      = self.timing.y,
-                vsync_front_porch = vsync_front_porch,
-                vsync_pulse       = vsync_pulse_width,
-                vsync_back_porch  = vsync_back_porch,
-                bits_x            = 16, # Play around with the sizes because sometimes
-                bits_y            = 16  # a smaller/larger value will make it pass timing.
-            )
+            m.submodules.vga = vga = VGA.from_timing(self.timing)
             with m.If(vga.o_beam_y < 240):
                 m.d.comb += [
                     vga.i_r.eq(0xff),
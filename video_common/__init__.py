@@ -0,0 +1,6 @@
+# Video timing, VGA generator and pixel clock PLL shared by the VGA examples
+from .vga_timings import *
+from .vga import VGA
+from .pll import PLL, calc_freq_coefficients
+from .tmds_encoder import TMDSEncoder
+from .vga2dvid import VGA2DVID
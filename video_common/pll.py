@@ -6,6 +6,28 @@ from nmigen.lib.cdc import ResetSynchronizer
 from nmigen.cli import main
 
 
+coefficients = namedtuple('coefficients', 'divr divf divq')
+
+def calc_freq_coefficients(f_in, f_req):
+    # cribbed from Icestorm's icepll.
+    # Returns the coefficients and the nearest achievable frequency in MHz
+    assert 25 <= f_in <= 25 # was 13
+    assert 16 <= f_req <= 275
+    divf_range = 128        # see comments in icepll.cc
+    best_fout = float('inf')
+    for divr in range(16):
+        pfd = f_in / (divr + 1)
+        if 10 <= pfd <= 133:
+            for divf in range(divf_range):
+                vco = pfd * (divf + 1)
+                if 533 <= vco <= 1066:
+                    for divq in range(1, 7):
+                        fout = vco * 2**-divq
+                        if abs(fout - f_req) < abs(best_fout - f_req):
+                            best_fout = fout
+                            best = coefficients(divr, divf, divq)
+    return best, best_fout
+
 class PLL(Elaboratable):
 
     """
@@ -39,28 +61,16 @@ class PLL(Elaboratable):
         ]
         self.locked = Signal()
 
+    @classmethod
+    def for_timing(cls, timing, freq_in_mhz, domain_name='pixel'):
+        # PLL for the nearest achievable pixel clock of a VGATiming
+        return cls(freq_in_mhz, timing.pixel_freq / 1e6, domain_name)
+
     def _calc_freq_coefficients(self):
-        # cribbed from Icestorm's icepll.
-        f_in, f_req = self.freq_in, self.freq_out
-        assert 25 <= f_in <= 25 # was 13
-        assert 16 <= f_req <= 275
-        coefficients = namedtuple('coefficients', 'divr divf divq')
-        divf_range = 128        # see comments in icepll.cc
-        best_fout = float('inf')
-        for divr in range(16):
-            pfd = f_in / (divr + 1)
-            if 10 <= pfd <= 133:
-                for divf in range(divf_range):
-                    vco = pfd * (divf + 1)
-                    if 533 <= vco <= 1066:
-                        for divq in range(1, 7):
-                            fout = vco * 2**-divq
-                            if abs(fout - f_req) < abs(best_fout - f_req):
-                                best_fout = fout
-                                best = coefficients(divr, divf, divq)
-        if best_fout != f_req:
+        best, self.freq_actual = calc_freq_coefficients(self.freq_in, self.freq_out)
+        if self.freq_actual != self.freq_out:
             warnings.warn(
-                f'PLL: requested {f_req} MHz, got {best_fout} MHz)',
+                f'PLL: requested {self.freq_out} MHz, got {self.freq_actual} MHz)',
                 stacklevel=3)
         return best
 
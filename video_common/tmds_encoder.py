@@ -0,0 +1,112 @@
+from nmigen import *
+from nmigen.build import Platform
+
+
+# TMDS encoder for DVI, pipelined so that no stage has more than one
+# of the popcounts, the XOR/XNOR chain or the DC balance between registers.
+#
+# Stage 1: count the ones in the data
+# Stage 2: choose XOR or XNOR and generate q_m
+# Stage 3: count the ones in q_m
+# Stage 4: DC balance, or control code when blanking
+#
+# The control and blank inputs go through the same stages, so the
+# sync signals stay aligned with the pixel data. The encoded output
+# is LATENCY pixel clocks after the inputs.
+class TMDSEncoder(Elaboratable):
+    LATENCY = 4
+
+    def __init__(self):
+        self.i_data    = Signal(8)
+        self.i_c       = Signal(2)
+        self.i_blank   = Signal()
+        self.o_encoded = Signal(10)
+
+    def elaborate(self, platform: Platform) -> Module:
+        m = Module()
+
+        # Control codes for c = 0, 1, 2, 3
+        control = Array([
+            C(0b1101010100, 10),
+            C(0b0010101011, 10),
+            C(0b0101010100, 10),
+            C(0b1010101011, 10)
+        ])
+
+        # Stage 1
+        data1  = Signal(8)
+        n1d1   = Signal(4)
+        c1     = Signal(2)
+        blank1 = Signal()
+
+        m.d.pixel += [
+            data1.eq(self.i_data),
+            n1d1.eq(sum(self.i_data[i] for i in range(8))),
+            c1.eq(self.i_c),
+            blank1.eq(self.i_blank)
+        ]
+
+        # Stage 2
+        xnor   = Signal()
+        q_m    = Signal(9)
+        q_m2   = Signal(9)
+        c2     = Signal(2)
+        blank2 = Signal()
+
+        m.d.comb += [
+            xnor.eq((n1d1 > 4) | ((n1d1 == 4) & ~data1[0])),
+            q_m[0].eq(data1[0])
+        ]
+        for i in range(1, 8):
+            m.d.comb += q_m[i].eq(Mux(xnor, ~(q_m[i-1] ^ data1[i]), q_m[i-1] ^ data1[i]))
+        m.d.comb += q_m[8].eq(~xnor)
+
+        m.d.pixel += [
+            q_m2.eq(q_m),
+            c2.eq(c1),
+            blank2.eq(blank1)
+        ]
+
+        # Stage 3
+        n1q    = Signal(4)
+        q_m3   = Signal(9)
+        diff3  = Signal(signed(5)) # ones - zeros in q_m[0:8]
+        c3     = Signal(2)
+        blank3 = Signal()
+
+        m.d.comb += n1q.eq(sum(q_m2[i] for i in range(8)))
+
+        m.d.pixel += [
+            q_m3.eq(q_m2),
+            diff3.eq(Cat(C(0, 1), n1q) - 8),
+            c3.eq(c2),
+            blank3.eq(blank2)
+        ]
+
+        # Stage 4
+        cnt = Signal(signed(6)) # Running disparity
+
+        with m.If(blank3):
+            m.d.pixel += [
+                self.o_encoded.eq(control[c3]),
+                cnt.eq(0)
+            ]
+        with m.Elif((cnt == 0) | (diff3 == 0)):
+            m.d.pixel += self.o_encoded.eq(Cat(Mux(q_m3[8], q_m3[:8], ~q_m3[:8]), q_m3[8], ~q_m3[8]))
+            with m.If(q_m3[8]):
+                m.d.pixel += cnt.eq(cnt + diff3)
+            with m.Else():
+                m.d.pixel += cnt.eq(cnt - diff3)
+        with m.Elif((~cnt[-1] & ~diff3[-1]) | (cnt[-1] & diff3[-1])):
+            # Disparity and ones - zeros have the same sign, so invert
+            m.d.pixel += [
+                self.o_encoded.eq(Cat(~q_m3[:8], q_m3[8], C(1, 1))),
+                cnt.eq(cnt + Cat(C(0, 1), q_m3[8]) - diff3)
+            ]
+        with m.Else():
+            m.d.pixel += [
+                self.o_encoded.eq(Cat(q_m3[:8], q_m3[8], C(0, 1))),
+                cnt.eq(cnt - Cat(C(0, 1), ~q_m3[8]) + diff3)
+            ]
+
+        return m
@@ -1,6 +1,8 @@
 from nmigen import *
 from nmigen.build import Platform
 
+from .vga_timings import VGATiming
+
 
 # Generates a VGA picture from sequential bitmap data from pixel clock
 # synchronous FIFO.
@@ -12,6 +14,10 @@ from nmigen.build import Platform
 # period as soon as current pixel data is consumed.
 # The FIFO should be fast enough to fetch new data
 # for the new pixel.
+#
+# The beam counters are sized to fit the frame, unless bits_x and bits_y are given,
+# and all the counter comparisons are decoded a cycle early into registers,
+# so the only logic between registers is the counter increment.
 class VGA(Elaboratable):
     def __init__(self,
                  resolution_x      = 640,
@@ -22,10 +28,18 @@ class VGA(Elaboratable):
                  vsync_front_porch = 10,
                  vsync_pulse       = 2,
                  vsync_back_porch  = 33, #31,
-                 bits_x            = 10, # should fit resolution_x + hsync_front_porch + hsync_pulse + hsync_back_porch
-                 bits_y            = 10, # should fit resolution_y + vsync_front_porch + vsync_pulse + vsync_back_porch
+                 bits_x            = None, # defaults to fit resolution_x + hsync_front_porch + hsync_pulse + hsync_back_porch
+                 bits_y            = None, # defaults to fit resolution_y + vsync_front_porch + vsync_pulse + vsync_back_porch
                  dbl_x             = False,
                  dbl_y             = False):
+        frame_x = resolution_x + hsync_front_porch + hsync_pulse + hsync_back_porch
+        frame_y = resolution_y + vsync_front_porch + vsync_pulse + vsync_back_porch
+        if bits_x is None:
+            bits_x = (frame_x - 1).bit_length()
+        if bits_y is None:
+            bits_y = (frame_y - 1).bit_length()
+        assert frame_x <= 2**bits_x and frame_y <= 2**bits_y
+
         self.i_clk_en       = Signal()
         self.i_test_picture = Signal()
         self.i_r            = Signal(8)
@@ -54,21 +68,33 @@ class VGA(Elaboratable):
         self.bits_x           = bits_x
         self.bits_y           = bits_y
 
+    @classmethod
+    def from_timing(cls, timing: VGATiming):
+        return cls(
+            resolution_x      = timing.x,
+            hsync_front_porch = timing.h_front_porch,
+            hsync_pulse       = timing.h_sync_pulse,
+            hsync_back_porch  = timing.h_back_porch,
+            resolution_y      = timing.y,
+            vsync_front_porch = timing.v_front_porch,
+            vsync_pulse       = timing.v_sync_pulse,
+            vsync_back_porch  = timing.v_back_porch)
+
     def elaborate(self, platform: Platform) -> Module:
         m = Module()
 
         # Constants
-        C_hblank_on  = C(self.resolution_x - 1, unsigned(self.bits_x))
-        C_hsync_on   = C(self.resolution_x + self.hsync_front_port - 1, unsigned(self.bits_x))
-        C_hsync_off  = C(self.resolution_x + self.hsync_front_port + self.hsync_pulse - 1, unsigned(self.bits_x))
-        C_hblank_off = C(self.resolution_x + self.hsync_front_port + self.hsync_pulse + self.hsync_back_porch - 1, unsigned(self.bits_x))
+        C_hblank_on  = self.resolution_x - 1
+        C_hsync_on   = self.resolution_x + self.hsync_front_port - 1
+        C_hsync_off  = self.resolution_x + self.hsync_front_port + self.hsync_pulse - 1
+        C_hblank_off = self.resolution_x + self.hsync_front_port + self.hsync_pulse + self.hsync_back_porch - 1
         C_frame_x    = C_hblank_off
         # frame x = 640 + 16 + 96 + 48 = 800
 
-        C_vblank_on  = C(self.resolution_y - 1, unsigned(self.bits_y))
-        C_vsync_on   = C(self.resolution_y + self.vsync_front_port - 1, unsigned(self.bits_y))
-        C_vsync_off  = C(self.resolution_y + self.vsync_front_port + self.vsync_pulse - 1, unsigned(self.bits_y))
-        C_vblank_off = C(self.resolution_y + self.vsync_front_port + self.vsync_pulse + self.vsync_back_porch - 1, unsigned(self.bits_y))
+        C_vblank_on  = self.resolution_y - 1
+        C_vsync_on   = self.resolution_y + self.vsync_front_port - 1
+        C_vsync_off  = self.resolution_y + self.vsync_front_port + self.vsync_pulse - 1
+        C_vblank_off = self.resolution_y + self.vsync_front_port + self.vsync_pulse + self.vsync_back_porch - 1
         C_frame_y    = C_vblank_off
         # frame y = 480 + 10 + 2 + 33 = 525
         # refresh rate = pixel clock / (frame x * frame y) = 25 MHz / (800 * 525) = 59.52 Hz
@@ -88,17 +114,42 @@ class VGA(Elaboratable):
         R_vga_r       = Signal(8)
         R_vga_g       = Signal(8)
         R_vga_b       = Signal(8)
+        # Pre-decoded comparisons: each is set when the counter equals the constant
+        X_hblank_on   = Signal()
+        X_hsync_on    = Signal()
+        X_hsync_off   = Signal()
+        X_frame       = Signal()
+        Y_vblank_on   = Signal()
+        Y_vsync_on    = Signal()
+        Y_vsync_off   = Signal()
+        Y_frame       = Signal()
         # Test picture generation
         W             = Signal(8)
         A             = Signal(8)
         T             = Signal(8)
         Z             = Signal(6)
 
+        # None of the constants are zero, so after a wrap all the comparisons are false,
+        # otherwise the counter will equal a constant when it is one less now.
         with m.If(self.i_clk_en):
-            with m.If(CounterX == C_frame_x):
+            m.d.pixel += [
+                X_hblank_on.eq(CounterX == C_hblank_on - 1),
+                X_hsync_on.eq(CounterX == C_hsync_on - 1),
+                X_hsync_off.eq(CounterX == C_hsync_off - 1),
+                X_frame.eq(CounterX == C_frame_x - 1)
+            ]
+
+            with m.If(X_frame):
                 m.d.pixel += CounterX.eq(0)
 
-                with m.If(CounterY == C_frame_y):
+                m.d.pixel += [
+                    Y_vblank_on.eq(~Y_frame & (CounterY == C_vblank_on - 1)),
+                    Y_vsync_on.eq(~Y_frame & (CounterY == C_vsync_on - 1)),
+                    Y_vsync_off.eq(~Y_frame & (CounterY == C_vsync_off - 1)),
+                    Y_frame.eq(~Y_frame & (CounterY == C_frame_y - 1))
+                ]
+
+                with m.If(Y_frame):
                     m.d.pixel += CounterY.eq(0)
                 with m.Else():
                     m.d.pixel += CounterY.eq(CounterY + 1)
@@ -116,34 +167,34 @@ class VGA(Elaboratable):
         ]
 
         # Generate sync and blank.
-        with m.If(CounterX == C_hblank_on):
+        with m.If(X_hblank_on):
             m.d.pixel += [
                 R_blank_early.eq(1),
                 R_disp_early.eq(0)
             ]
-        with m.Elif(CounterX == C_hblank_off):
+        with m.Elif(X_frame):
             m.d.pixel += [
                 R_blank_early.eq(R_vblank),
                 R_disp_early.eq(R_vdisp)
             ]
-        with m.If(CounterX == C_hsync_on):
+        with m.If(X_hsync_on):
             m.d.pixel += R_hsync.eq(1)
-        with m.Elif(CounterX == C_hsync_off):
+        with m.Elif(X_hsync_off):
             m.d.pixel += R_hsync.eq(0)
 
-        with m.If(CounterY == C_vblank_on):
+        with m.If(Y_vblank_on):
             m.d.pixel += [
                 R_vblank.eq(1),
                 R_vdisp.eq(0)
             ]
-        with m.Elif(CounterY == C_vblank_off):
+        with m.Elif(Y_frame):
             m.d.pixel += [
                 R_vblank.eq(0),
                 R_vdisp.eq(1)
             ]
-        with m.If(CounterY == C_vsync_on):
+        with m.If(Y_vsync_on):
             m.d.pixel += R_vsync.eq(1)
-        with m.Elif(CounterY == C_vsync_off):
+        with m.Elif(Y_vsync_off):
             m.d.pixel += R_vsync.eq(0)
 
         # Test picture generator
@@ -189,6 +240,7 @@ class VGA(Elaboratable):
             self.o_vga_b.eq(R_vga_b),
             self.o_vga_hsync.eq(R_hsync),
             self.o_vga_vsync.eq(R_vsync),
+            self.o_vga_vblank.eq(R_vblank),
             self.o_vga_blank.eq(R_blank),
             self.o_vga_de.eq(R_disp),
         ]
@@ -1,9 +1,15 @@
 from nmigen import *
 from nmigen.build import Platform
 
-from tmds_encoder import TMDSEncoder
+from .tmds_encoder import TMDSEncoder
 
 
+# Encodes VGA signals as DVI. The TMDS encoders are pipelined, and blank, hsync and vsync
+# go through the same pipeline, so the outputs are TMDSEncoder.LATENCY pixel clocks
+# behind the inputs with sync and data still aligned.
+# With ddr=True, o_red, o_green, o_blue and o_clk carry 2 bits per shift clock,
+# bit 0 for the rising edge and bit 1 for the falling edge, for ODDRX1F on ECP5
+# or SB_IO with PIN_TYPE 0b010000 on iCE40.
 class VGA2DVID(Elaboratable):
     def __init__(self,
                  shift_clock_synchronizer = True,  # Try to get o_clk in sync with 'pixel'
@@ -46,10 +52,6 @@ class VGA2DVID(Elaboratable):
         encoded_green = Signal(10)
         encoded_blue  = Signal(10)
 
-        latched_red   = Signal(10, reset=0)
-        latched_green = Signal(10, reset=0)
-        latched_blue  = Signal(10, reset=0)
-
         shift_red   = Signal(10, reset=0)
         shift_green = Signal(10, reset=0)
         shift_blue  = Signal(10, reset=0)
@@ -113,26 +115,20 @@ class VGA2DVID(Elaboratable):
             encoded_blue.eq(u23.o_encoded),
         ]
 
-        m.d.pixel += [
-            latched_red.eq(encoded_red),
-            latched_green.eq(encoded_green),
-            latched_blue.eq(encoded_blue),
-        ]
-
         if (self.parallel):
             m.d.comb += [
-                self.o_red_par.eq(latched_red),
-                self.o_green_par.eq(latched_green),
-                self.o_blue_par.eq(latched_blue),
+                self.o_red_par.eq(encoded_red),
+                self.o_green_par.eq(encoded_green),
+                self.o_blue_par.eq(encoded_blue),
             ]
 
         # SDR
         if (self.serial and not self.ddr):
             with m.If(shift_clock[4:6] == SHIFT_CLOCK_INITIAL[4:6]):
                 m.d.shift += [
-                    shift_red.eq(latched_red),
-                    shift_green.eq(latched_green),
-                    shift_blue.eq(latched_blue)
+                    shift_red.eq(encoded_red),
+                    shift_green.eq(encoded_green),
+                    shift_blue.eq(encoded_blue)
                 ]
             with m.Else():
                 m.d.shift += [
@@ -154,9 +150,9 @@ class VGA2DVID(Elaboratable):
         if (self.serial and self.ddr):
             with m.If(shift_clock[4:6] == SHIFT_CLOCK_INITIAL[4:6]):
                 m.d.shift += [
-                    shift_red.eq(latched_red),
-                    shift_green.eq(latched_green),
-                    shift_blue.eq(latched_blue)
+                    shift_red.eq(encoded_red),
+                    shift_green.eq(encoded_green),
+                    shift_blue.eq(encoded_blue)
                 ]
             with m.Else():
                 m.d.shift += [